@@ -0,0 +1,258 @@
+# src/benchmarks/pipeline_benchmark.py
+"""
+Scaling benchmark for the end-to-end pipeline.
+
+Generates synthetic inputs at each requested size and times every stage
+(loader, rule engine, explanation with a stubbed LLM, SHAP on a small local
+sklearn model, assembly, reporting), recording wall time and peak RSS.
+Runs fully offline on a CPU-only machine.
+
+The loader stage streams the input through iter_validated_chunks, the
+loader the chunked and sharded runs use, so it is measured at every size.
+The in-memory stages after it hold the whole frame and only run up to
+--in-memory-max rows.
+
+Usage:
+    python -m src.benchmarks.pipeline_benchmark --sizes 10k,100k
+    python -m src.benchmarks.pipeline_benchmark --sizes 10k,100k,1m,10m --save-baseline
+    python -m src.benchmarks.pipeline_benchmark --threshold 0.25   # flag >25% slowdowns
+
+Exit code is 1 when any stage regresses beyond the threshold versus the baseline.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import multiprocessing
+from queue import Empty
+from datetime import datetime
+
+from src.metrics import RssSampler
+from src.data_loader.generate_synthetic_fraud_data import generate_synthetic_fraud_data
+
+BENCHMARK_DIR = os.path.join("data", "benchmarks")
+BASELINE_PATH = os.path.join(BENCHMARK_DIR, "baseline.json")
+DEFAULT_SIZES = "10k,100k,1m,10m"
+DEFAULT_THRESHOLD = 0.20
+DEFAULT_CHUNK_ROWS = 100_000
+IN_MEMORY_MAX_ROWS = 1_000_000
+STAGES = ["generate", "loader", "rules", "explanation", "shap", "assembly", "reporting"]
+SHAP_TRAIN_ROWS = 5000
+
+
+def parse_size(text: str) -> int:
+    text = text.strip().lower()
+    multiplier = {"k": 1_000, "m": 1_000_000}.get(text[-1], 1)
+    return int(float(text.rstrip("km")) * multiplier)
+
+
+# -----------------------------
+# Measurement helpers
+# -----------------------------
+def _measure(results: dict, stage: str, n_rows: int, func, *args, **kwargs):
+    with RssSampler() as sampler:
+        start = time.perf_counter()
+        value = func(*args, **kwargs)
+        seconds = time.perf_counter() - start
+    results[stage] = {
+        "seconds": round(seconds, 4),
+        "rows_per_second": round(n_rows / seconds, 1) if seconds > 0 else None,
+        "peak_rss_bytes": sampler.peak,
+    }
+    print(f"  {stage:<12} {seconds:>9.3f}s  {sampler.peak / 2**20:>8.1f} MiB")
+    return value
+
+
+def _stub_llm():
+    """
+    Replace the OpenAI call with a canned response so the explanation stage
+    runs offline and measures only local overhead.
+    """
+    os.environ.setdefault("OPENAI_API_KEY", "offline-benchmark")
+    import src.explanation.llm_narrative_openai as llm
+
+    class _Message:
+        content = "Stubbed explanation: transaction matches configured risk rules."
+
+    class _Response:
+        choices = [type("Choice", (), {"message": _Message()})()]
+
+    llm.client.chat.completions.create = lambda **kwargs: _Response()
+    return llm
+
+
+# -----------------------------
+# One size, isolated in its own process
+# -----------------------------
+def run_size(n_rows: int, workdir: str, seed: int = 42, chunk_rows: int = DEFAULT_CHUNK_ROWS,
+             in_memory_max: int = IN_MEMORY_MAX_ROWS) -> dict:
+    import matplotlib
+    matplotlib.use("Agg")
+    import pandas as pd
+    from sklearn.tree import DecisionTreeClassifier
+    from src.data_loader.load_fraud_output import iter_validated_chunks, ValidatedFrame
+    from src.explanation.feature_matrix import build_feature_matrix
+    from src.data_process.vizualization_reporting import generate_reports
+    from src.final.explained_dataset import (
+        llm_explanations, shap_top_features, assemble_explained_dataset, write_explained_dataset,
+    )
+
+    _stub_llm()
+    results = {}
+    print(f"Benchmark: {n_rows:,} rows")
+    csv_path = os.path.join(workdir, "raw.csv")
+
+    _measure(results, "generate", n_rows, generate_synthetic_fraud_data, csv_path, n_rows, seed=seed)
+
+    in_memory = n_rows <= in_memory_max
+
+    def loader():
+        chunks = []
+        for chunk in iter_validated_chunks(csv_path, chunk_rows):
+            # Chunks are only kept when the in-memory stages need the whole frame
+            if in_memory:
+                chunks.append(chunk)
+        return pd.concat(chunks, ignore_index=True) if chunks else None
+
+    df = _measure(results, "loader", n_rows, loader)
+    if not in_memory:
+        print(f"  in-memory stages skipped above {in_memory_max:,} rows (--in-memory-max)")
+        return results
+
+    frame = _measure(results, "rules", n_rows, ValidatedFrame.from_frame, df, validate=False)
+
+    explanations = _measure(results, "explanation", n_rows, llm_explanations, frame, max_workers=1)
+
+    encoder_path = os.path.join(workdir, "encoders.json")
+    features = build_feature_matrix(df, encoder_path=encoder_path)
+    train = slice(0, min(SHAP_TRAIN_ROWS, len(features)))
+    model = DecisionTreeClassifier(max_depth=6, random_state=0).fit(
+        features.values[train], df["fraud_prediction"].to_numpy()[train]
+    )
+    del features
+    shap_top = _measure(results, "shap", n_rows, shap_top_features, frame, model, top_n=5, encoder_path=encoder_path,
+                        cache_dir=os.path.join(workdir, "shap_cache"))
+
+    def assembly():
+        final = assemble_explained_dataset(frame, explanations, shap_top)
+        write_explained_dataset(final, os.path.join(workdir, "processed.csv"))
+        return final
+
+    final = _measure(results, "assembly", n_rows, assembly)
+    _measure(results, "reporting", n_rows, generate_reports, final, report_dir=os.path.join(workdir, "reports"))
+    return results
+
+
+def _run_size_subprocess(n_rows: int, seed: int, workdir: str, queue, chunk_rows: int, in_memory_max: int):
+    try:
+        queue.put(("ok", run_size(n_rows, workdir, seed, chunk_rows=chunk_rows, in_memory_max=in_memory_max)))
+    except Exception as e:
+        queue.put(("error", f"{type(e).__name__}: {e}"))
+
+
+def _wait_for_result(proc, result_queue, poll_seconds: float = 1.0):
+    """
+    Wait for a size's (status, payload), polling so a child that dies without
+    reporting (e.g. OOM-killed) is recorded as an error instead of hanging.
+    """
+    while True:
+        try:
+            return result_queue.get(timeout=poll_seconds)
+        except Empty:
+            if proc.is_alive():
+                continue
+        # The child exited; pick up a result it put just before exiting
+        try:
+            return result_queue.get(timeout=poll_seconds)
+        except Empty:
+            return "error", f"worker exited with code {proc.exitcode} without a result"
+
+
+# -----------------------------
+# Baseline comparison
+# -----------------------------
+def compare_to_baseline(results: dict, baseline: dict, threshold: float) -> list:
+    """
+    Return (size, stage, baseline_s, current_s) tuples for stages that got slower
+    than baseline * (1 + threshold).
+    """
+    regressions = []
+    for size, stages in results.items():
+        for stage, current in stages.items():
+            previous = baseline.get(size, {}).get(stage)
+            if not previous or not isinstance(current, dict):
+                continue
+            if current["seconds"] > previous["seconds"] * (1 + threshold):
+                regressions.append((size, stage, previous["seconds"], current["seconds"]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scaling benchmark for the fraud explanation pipeline.")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="Comma-separated row counts, e.g. 10k,100k,1m,10m")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Allowed slowdown before flagging")
+    parser.add_argument("--output-dir", default=BENCHMARK_DIR)
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS, help="Rows per loader chunk")
+    parser.add_argument("--in-memory-max", type=parse_size, default=IN_MEMORY_MAX_ROWS,
+                        help="Largest size that also runs the in-memory stages after the loader")
+    args = parser.parse_args(argv)
+
+    ctx = multiprocessing.get_context("spawn")
+    results = {}
+    for label in args.sizes.split(","):
+        n_rows = parse_size(label)
+        # Created here so the parent can clean up after a child that was killed
+        workdir = tempfile.mkdtemp(prefix="fraud_bench_")
+        result_queue = ctx.Queue()
+        proc = ctx.Process(target=_run_size_subprocess,
+                           args=(n_rows, args.seed, workdir, result_queue, args.chunk_rows, args.in_memory_max))
+        proc.start()
+        try:
+            status, payload = _wait_for_result(proc, result_queue)
+            proc.join()
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+        results[str(n_rows)] = payload if status == "ok" else {"error": payload}
+        if status != "ok":
+            print(f"  failed: {payload}")
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+    out_path = os.path.join(args.output_dir, f"results-{datetime.now():%Y%m%d-%H%M%S}.json")
+    with open(out_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Benchmark results saved at {out_path}")
+
+    regressions = []
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare_to_baseline(results, baseline, args.threshold)
+        for size, stage, before, after in regressions:
+            print(f"REGRESSION {stage} @ {int(size):,} rows: {before:.3f}s -> {after:.3f}s "
+                  f"(+{(after / before - 1) * 100:.0f}%)")
+        if not regressions:
+            print(f"No regressions beyond {args.threshold:.0%} versus {args.baseline}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved at {args.baseline}")
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+# src/benchmarks/profile_explained_dataset.py
+"""
+Pass-and-copy profile of create_final_explained_dataset.
+
+Runs the Tasks 1-5 library path once under cProfile on a synthetic input
+(stubbed LLM, one worker) and counts the calls made from src/ to the frame
+operations that copy or re-scan the data: DataFrame.copy, pd.concat,
+reset_index, row-wise DataFrame.apply, per-row rule evaluation and the
+vectorized rule pass. It also records the result frame's size, the
+tracemalloc peak of one run and the median wall time over --repeat runs.
+
+Functions that do not exist in the checked-out tree count as 0, so the same
+script can be run from a worktree of an older commit to get the "before"
+column:
+
+Usage:
+    python -m src.benchmarks.profile_explained_dataset --rows 20000 --output after.json
+    python -m src.benchmarks.profile_explained_dataset --rows 20000 --compare before.json
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import cProfile
+import pstats
+import inspect
+import argparse
+import tempfile
+import importlib
+import tracemalloc
+import numpy as np
+
+from src.data_loader.generate_synthetic_fraud_data import generate_synthetic_fraud_data
+from src.benchmarks.pipeline_benchmark import _stub_llm
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Label -> dotted path of the function whose calls from src/ are counted
+WATCHED_CALLS = {
+    "DataFrame.copy": "pandas.DataFrame.copy",
+    "pd.concat": "pandas.concat",
+    "DataFrame.reset_index": "pandas.DataFrame.reset_index",
+    "DataFrame.apply row pass": "pandas.DataFrame.apply",
+    "per-row rule evaluations": "src.explanation.prompts.generate_rule_based_reasons",
+    "vectorized rule pass": "src.explanation.rules.compute_reason_mask",
+}
+
+
+def _resolve(dotted: str):
+    """The function at a dotted path, or None if this tree does not have it."""
+    parts = dotted.split(".")
+    for split in range(len(parts) - 1, 0, -1):
+        try:
+            target = importlib.import_module(".".join(parts[:split]))
+        except ImportError:
+            continue
+        try:
+            for attr in parts[split:]:
+                target = getattr(target, attr)
+        except AttributeError:
+            return None
+        return target
+    return None
+
+
+def _profile_key(func) -> tuple:
+    code = func.__code__
+    return code.co_filename, code.co_firstlineno, code.co_name
+
+
+def count_calls_from_src(stats: pstats.Stats) -> dict:
+    """
+    Calls to each WATCHED_CALLS function made directly by code under src/.
+    """
+    counts = {}
+    for label, dotted in WATCHED_CALLS.items():
+        func = _resolve(dotted)
+        entry = stats.stats.get(_profile_key(func)) if func is not None else None
+        callers = entry[4] if entry else {}
+        counts[label] = sum(
+            calls[0] for (filename, _, _), calls in callers.items()
+            if os.path.abspath(filename).startswith(SRC_DIR + os.sep)
+        )
+    return counts
+
+
+def profile(csv_path: str, repeat: int = 5) -> dict:
+    """
+    Call counts, result size, traced peak and median time for one input.
+    """
+    from src.data_process.final_data_processed import create_final_explained_dataset
+
+    # Older trees have no llm_workers argument and always generate serially
+    kwargs = {"llm_workers": 1} if "llm_workers" in inspect.signature(create_final_explained_dataset).parameters else {}
+
+    def run():
+        return create_final_explained_dataset(csv_path, **kwargs)
+
+    run()  # Warm imports and lazy caches so they do not show up in the counts
+
+    profiler = cProfile.Profile()
+    df = profiler.runcall(run)
+    result = count_calls_from_src(pstats.Stats(profiler))
+    result["result frame MiB"] = round(df.memory_usage(deep=True).sum() / 2**20, 1)
+    del df
+
+    tracemalloc.start()
+    run()
+    result["traced peak MiB"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+    tracemalloc.stop()
+
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        seconds.append(time.perf_counter() - start)
+    result["median seconds"] = round(float(np.median(seconds)), 3)
+    return result
+
+
+def print_table(result: dict, before: dict = None):
+    width = max(len(label) for label in result)
+    if before is None:
+        for label, value in result.items():
+            print(f"  {label:<{width}}  {value:>10}")
+        return
+    print(f"  {'':<{width}}  {'before':>10}  {'after':>10}")
+    for label, value in result.items():
+        print(f"  {label:<{width}}  {before.get(label, '-'):>10}  {value:>10}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Count redundant passes and copies in create_final_explained_dataset.")
+    parser.add_argument("--rows", type=int, default=20_000, help="Synthetic rows to generate")
+    parser.add_argument("--csv", default=None, help="Profile this input instead of a synthetic one")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs for the median")
+    parser.add_argument("--output", default=None, help="Write the profile as JSON")
+    parser.add_argument("--compare", default=None, help="Profile JSON from another tree, shown as 'before'")
+    args = parser.parse_args(argv)
+
+    _stub_llm()
+    workdir = tempfile.mkdtemp(prefix="fraud_profile_")
+    try:
+        csv_path = args.csv
+        if csv_path is None:
+            csv_path = os.path.join(workdir, "raw.csv")
+            generate_synthetic_fraud_data(csv_path, args.rows, seed=args.seed)
+        result = profile(csv_path, args.repeat)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    before = None
+    if args.compare:
+        with open(args.compare) as f:
+            before = json.load(f)["profile"]
+    print(f"Profile of create_final_explained_dataset ({csv_path if args.csv else f'{args.rows:,} synthetic rows'}, "
+          f"llm_workers=1, calls from src, median of {args.repeat} runs):")
+    print_table(result, before)
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump({"rows": args.rows if args.csv is None else None, "profile": result}, f, indent=2)
+        print(f"Profile saved at {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
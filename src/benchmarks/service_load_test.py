@@ -0,0 +1,251 @@
+# src/benchmarks/service_load_test.py
+"""
+Load test for the single-transaction explanation service.
+
+Without --url, builds an offline fixture: synthetic transactions, a small
+sklearn model with its encoders, and an explanation cache filled by the
+stubbed LLM. It then starts the service in a separate process, so client
+threads do not compete with it for the GIL. Keep-alive clients replay the
+transactions concurrently, and each scenario reports p50/p90/p99 latency
+and throughput, overall and per LLM narrative source. The replayed mix has
+--fraud-share fraud-flagged rows (default half): only those go through the
+LLM narrative path, and a natural input is almost all non-fraud rows that
+the service skips.
+
+    rules   validation + rule factors + template and cached-LLM narratives
+    shap    the same plus top SHAP features from the preloaded explainer
+
+Usage:
+    python -m src.benchmarks.service_load_test --requests 5000 --concurrency 8
+    python -m src.benchmarks.service_load_test --url http://127.0.0.1:8080 --scenarios rules
+    python -m src.benchmarks.service_load_test --p99-budget-ms 5   # exit 1 above budget
+
+Exit code is 1 when a scenario has errors or its p99 exceeds the budget.
+"""
+
+import os
+import sys
+import json
+import time
+import pickle
+import shutil
+import argparse
+import tempfile
+import threading
+import http.client
+import multiprocessing
+from urllib.parse import urlparse
+import numpy as np
+import pandas as pd
+
+from src.data_loader.generate_synthetic_fraud_data import generate_synthetic_fraud_data
+
+SCENARIOS = {"rules": "/explain", "shap": "/explain?shap=1"}
+DEFAULT_TRANSACTIONS = 2000
+DEFAULT_REQUESTS = 5000
+DEFAULT_CONCURRENCY = 8
+WARMUP_REQUESTS = 200
+DEFAULT_FRAUD_SHARE = 0.5
+SHAP_TRAIN_ROWS = 5000
+
+
+# -----------------------------
+# Offline fixture
+# -----------------------------
+def build_fixture(workdir: str, n_transactions: int, seed: int = 42) -> dict:
+    """
+    Write the transactions, model, encoders and a warm explanation cache
+    into workdir. Returns ExplanationService keyword arguments.
+    """
+    from sklearn.tree import DecisionTreeClassifier
+    from src.benchmarks.pipeline_benchmark import _stub_llm
+    from src.data_loader.load_fraud_output import load_and_validate_fraud_output
+    from src.explanation.feature_matrix import build_feature_matrix
+    from src.explanation.explanation_cache import ExplanationCache
+
+    csv_path = os.path.join(workdir, "transactions.csv")
+    generate_synthetic_fraud_data(csv_path, n_transactions, seed=seed)
+    df = load_and_validate_fraud_output(csv_path)
+
+    encoder_path = os.path.join(workdir, "encoders.json")
+    features = build_feature_matrix(df, encoder_path=encoder_path)
+    train = slice(0, min(SHAP_TRAIN_ROWS, len(features)))
+    model = DecisionTreeClassifier(max_depth=6, random_state=0).fit(
+        features.values[train], df["fraud_prediction"].to_numpy()[train]
+    )
+    model_path = os.path.join(workdir, "model.pkl")
+    with open(model_path, "wb") as f:
+        pickle.dump(model, f)
+
+    # Same call path as the pipeline's LLM stage, so the service finds these entries
+    cache_db = os.path.join(workdir, "explanations.db")
+    llm = _stub_llm()
+    llm.generate_explanation_series(df, cache=ExplanationCache(cache_db), max_workers=4)
+
+    return {
+        "cache_db": cache_db, "shap_model_path": model_path, "encoder_path": encoder_path,
+        "background_csv": csv_path, "shap_cache_dir": os.path.join(workdir, "shap_cache"),
+    }
+
+
+def _serve(service_kwargs: dict, port_queue):
+    from src.explanation.explanation_service import ExplanationService, make_server
+    server = make_server(ExplanationService(**service_kwargs), port=0)
+    port_queue.put(server.server_address[1])
+    server.serve_forever()
+
+
+def load_payloads(csv_path: str, limit: int = None, fraud_share: float = None, seed: int = 0) -> list:
+    """
+    Transactions as JSON request bodies (pandas handles numpy types and
+    timestamps). With fraud_share, fraud-flagged and other rows are resampled
+    (with repetition) to that mix and shuffled; otherwise the file's mix is kept.
+    """
+    frame = pd.read_csv(csv_path, nrows=limit)
+    if fraud_share is not None and len(frame):
+        fraud = frame["fraud_prediction"].astype(int).to_numpy() == 1
+        n_fraud = round(len(frame) * fraud_share)
+        pools = [(np.flatnonzero(fraud), n_fraud), (np.flatnonzero(~fraud), len(frame) - n_fraud)]
+        if any(n and not len(pool) for pool, n in pools):
+            raise ValueError(f"{csv_path} has no rows for a fraud share of {fraud_share}")
+        rng = np.random.default_rng(seed)
+        rows = np.concatenate([rng.choice(pool, n) for pool, n in pools if n])
+        frame = frame.iloc[rng.permutation(rows)]
+    return [json.dumps(r).encode("utf-8") for r in json.loads(frame.to_json(orient="records"))]
+
+
+# -----------------------------
+# Client
+# -----------------------------
+def run_scenario(host: str, port: int, path: str, payloads: list, n_requests: int, concurrency: int) -> dict:
+    """
+    Send n_requests POSTs from `concurrency` keep-alive connections and
+    summarise latency (client-observed, including HTTP and JSON).
+    """
+    latencies = np.zeros(n_requests, dtype=np.float64)
+    statuses = np.zeros(n_requests, dtype=np.int32)
+    # LLM narrative source per request (None for failed requests), for per-source latency
+    request_sources = [None] * n_requests
+
+    def worker(offset: int):
+        conn = http.client.HTTPConnection(host, port, timeout=30)
+        try:
+            for i in range(offset, n_requests, concurrency):
+                start = time.perf_counter()
+                conn.request("POST", path, payloads[i % len(payloads)], {"Content-Type": "application/json"})
+                response = conn.getresponse()
+                body = response.read()
+                latencies[i] = time.perf_counter() - start
+                statuses[i] = response.status
+                if response.status == 200:
+                    request_sources[i] = str(json.loads(body).get("llm_source"))
+        finally:
+            conn.close()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+
+    ms = latencies * 1000
+    request_sources = np.asarray(request_sources, dtype=object)
+    by_source = {}
+    for source in sorted({s for s in request_sources if s is not None}):
+        source_ms = ms[request_sources == source]
+        by_source[source] = {
+            "requests": int(source_ms.size),
+            "p50_ms": round(float(np.percentile(source_ms, 50)), 3),
+            "p99_ms": round(float(np.percentile(source_ms, 99)), 3),
+            "mean_ms": round(float(source_ms.mean()), 3),
+        }
+    return {
+        "requests": n_requests,
+        "concurrency": concurrency,
+        "errors": int((statuses != 200).sum()),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p90_ms": round(float(np.percentile(ms, 90)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "max_ms": round(float(ms.max()), 3),
+        "mean_ms": round(float(ms.mean()), 3),
+        "throughput_rps": round(n_requests / wall, 1),
+        "llm_sources": {source: stats["requests"] for source, stats in by_source.items()},
+        "by_source": by_source,
+    }
+
+
+def print_report(results: dict):
+    print(f"\n{'scenario':<10}{'requests':>10}{'errors':>8}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'max ms':>9}{'req/s':>10}")
+    for name, r in results.items():
+        print(f"{name:<10}{r['requests']:>10,}{r['errors']:>8}{r['p50_ms']:>9.2f}{r['p90_ms']:>9.2f}"
+              f"{r['p99_ms']:>9.2f}{r['max_ms']:>9.2f}{r['throughput_rps']:>10,.0f}")
+    print(f"\n{'scenario':<10}{'source':<10}{'requests':>10}{'p50 ms':>9}{'p99 ms':>9}{'mean ms':>9}")
+    for name, r in results.items():
+        for source, s in r["by_source"].items():
+            print(f"{name:<10}{source:<10}{s['requests']:>10,}{s['p50_ms']:>9.2f}{s['p99_ms']:>9.2f}"
+                  f"{s['mean_ms']:>9.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the explanation service.")
+    parser.add_argument("--url", help="Running service to target (default: start one on an offline fixture)")
+    parser.add_argument("--payloads-csv", help="Transactions to send (default: the fixture's)")
+    parser.add_argument("--transactions", type=int, default=DEFAULT_TRANSACTIONS, help="Fixture size")
+    parser.add_argument("--requests", type=int, default=DEFAULT_REQUESTS)
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--fraud-share", type=float, default=DEFAULT_FRAUD_SHARE,
+                        help="Share of fraud-flagged transactions replayed; a negative value keeps the input's mix")
+    parser.add_argument("--p99-budget-ms", type=float, help="Fail when a scenario's p99 exceeds this")
+    parser.add_argument("--output", help="Write results as JSON")
+    args = parser.parse_args(argv)
+
+    workdir, server = None, None
+    try:
+        if args.url:
+            url = urlparse(args.url)
+            host, port = url.hostname, url.port or 80
+            if not args.payloads_csv:
+                parser.error("--payloads-csv is required with --url")
+            payloads_csv = args.payloads_csv
+        else:
+            workdir = tempfile.mkdtemp(prefix="fraud_service_")
+            service_kwargs = build_fixture(workdir, args.transactions)
+            payloads_csv = args.payloads_csv or service_kwargs["background_csv"]
+            ctx = multiprocessing.get_context("spawn")
+            port_queue = ctx.Queue()
+            server = ctx.Process(target=_serve, args=(service_kwargs, port_queue), daemon=True)
+            server.start()
+            host, port = "127.0.0.1", port_queue.get(timeout=300)
+
+        payloads = load_payloads(payloads_csv, fraud_share=args.fraud_share if args.fraud_share >= 0 else None)
+        results = {}
+        for name in [s.strip() for s in args.scenarios.split(",") if s.strip()]:
+            path = SCENARIOS[name]
+            run_scenario(host, port, path, payloads, min(WARMUP_REQUESTS, args.requests), args.concurrency)
+            results[name] = run_scenario(host, port, path, payloads, args.requests, args.concurrency)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.join()
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print_report(results)
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    failed = [n for n, r in results.items()
+              if r["errors"] or (args.p99_budget_ms is not None and r["p99_ms"] > args.p99_budget_ms)]
+    if failed:
+        print(f"Failed scenarios: {', '.join(failed)}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
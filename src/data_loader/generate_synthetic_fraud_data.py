@@ -0,0 +1,345 @@
+# src/data_loader/generate_synthetic_fraud_data.py
+"""
+Vectorized, chunked generator for large synthetic fraud model outputs.
+
+Customers get a persistent profile (home country, typical spend, preferred
+merchant category); transactions are drawn from those profiles and then have
+the fraud patterns the rule engine detects injected at tunable rates. Velocity
+bursts are real clusters of one customer's transactions, and velocity_1h and
+avg_amount_30d are computed from each customer's generated history.
+Rows are generated in fixed blocks whose random streams are keyed by their
+global row range and appended to CSV, so memory stays bounded and output is
+reproducible for a given seed, independent of the write chunk size.
+
+Usage:
+    python -m src.data_loader.generate_synthetic_fraud_data --rows 1000000 --output data/raw/fraud_1m.csv
+    python -m src.data_loader.generate_synthetic_fraud_data --rows 100000000 --customers 5000000 \\
+        --output data/raw/fraud_100m.csv --velocity-burst-rate 0.05
+"""
+
+import os
+import argparse
+from dataclasses import dataclass, asdict
+import numpy as np
+import pandas as pd
+
+COUNTRIES = np.array(["US", "AE", "IN", "GB", "DE", "FR", "SG", "BR"])
+MERCHANT_CATEGORIES = np.array(["Electronics", "Grocery", "Travel", "Clothing", "Restaurants"])
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+DEFAULT_CHUNK_ROWS = 250_000
+STREAM_BLOCK_ROWS = 8192              # Rows per random stream; fixed so output does not depend on chunk size
+BURST_SIZE = (4, 15)                  # Transactions per velocity burst, [low, high)
+BURST_WINDOW_SECONDS = 1800           # A burst's transactions fall within this span
+VELOCITY_WINDOW_SECONDS = 3600
+AVG_TAU_SECONDS = 30 * 86400          # Time constant of the avg_amount_30d weighting
+AVG_PRIOR_WEIGHT = 1.0                # Profile spend counts as this many earlier transactions
+
+
+@dataclass
+class InjectionRates:
+    """
+    Share of transactions that receive each fraud pattern (patterns can overlap).
+    """
+    geo_mismatch: float = 0.08        # Transaction country differs from home country
+    velocity_burst: float = 0.05      # Rows that belong to a burst of one customer's transactions
+    device_change: float = 0.04       # Device fingerprint changed
+    large_amount: float = 0.03        # Amount several times the customer's 30-day average
+
+
+@dataclass
+class CustomerProfiles:
+    home_country: np.ndarray
+    avg_amount: np.ndarray
+    preferred_category: np.ndarray
+    weight_cdf: np.ndarray            # Cumulative activity weights (some customers transact more)
+
+
+def build_customer_profiles(n_customers: int, seed: int) -> CustomerProfiles:
+    """
+    Draw one profile per customer. Memory is O(n_customers), independent of row count.
+    """
+    rng = np.random.default_rng([seed, 0])
+    activity = rng.pareto(1.5, n_customers) + 1.0
+    return CustomerProfiles(
+        home_country=rng.integers(0, len(COUNTRIES), n_customers).astype(np.int8),
+        avg_amount=np.round(np.clip(rng.lognormal(5.5, 0.9, n_customers), 20, 8000), 2),
+        preferred_category=rng.integers(0, len(MERCHANT_CATEGORIES), n_customers).astype(np.int8),
+        weight_cdf=np.cumsum(activity) / activity.sum(),
+    )
+
+
+# -----------------------------
+# Customer history
+# -----------------------------
+class CustomerHistory:
+    """
+    Per-customer state carried from block to block so velocity_1h and
+    avg_amount_30d are derived from the transactions already generated.
+
+    velocity_1h is exact: the customer's transactions in the last hour,
+    including this one. Only the last hour of (customer, time) pairs is kept,
+    so memory follows the transaction rate, not the row count.
+
+    avg_amount_30d is an exponentially weighted average of the customer's
+    earlier amounts with a 30-day time constant, starting from the profile's
+    typical spend (worth AVG_PRIOR_WEIGHT transactions). Sums are stored
+    scaled by exp(t / AVG_TAU_SECONDS), so each block adds O(block) work and
+    the state is O(n_customers).
+    """
+
+    def __init__(self, profiles: CustomerProfiles):
+        n_customers = len(profiles.avg_amount)
+        self.prior = profiles.avg_amount
+        self.amount_sum = np.zeros(n_customers)
+        self.weight_sum = np.zeros(n_customers)
+        self.recent_customer = np.empty(0, dtype=np.int64)
+        self.recent_time = np.empty(0, dtype=np.int64)
+
+    def update(self, customer: np.ndarray, seconds: np.ndarray, amount: np.ndarray):
+        """
+        Return (velocity_1h, avg_amount_30d) for a chronological block and add
+        the block to the history.
+        """
+        n = len(customer)
+
+        # velocity_1h: rank within the customer's last hour, over carried + new rows
+        cust = np.concatenate([self.recent_customer, customer])
+        t = np.concatenate([self.recent_time, seconds])
+        order = np.lexsort((np.arange(len(cust)), cust))
+        key = cust[order] * (int(t.max()) + VELOCITY_WINDOW_SECONDS + 1) + t[order]
+        first_in_window = np.searchsorted(key, key - VELOCITY_WINDOW_SECONDS, side="right")
+        counts = np.empty(len(cust), dtype=np.int64)
+        counts[order] = np.arange(len(cust)) - first_in_window + 1
+        velocity = counts[len(self.recent_customer):]
+
+        keep = t > seconds[-1] - VELOCITY_WINDOW_SECONDS
+        self.recent_customer, self.recent_time = cust[keep], t[keep]
+
+        # avg_amount_30d: carried sums plus earlier rows of the same customer in this block
+        order = np.lexsort((np.arange(n), customer))
+        sorted_customer = customer[order]
+        growth = np.exp(seconds[order] / AVG_TAU_SECONDS)
+        scaled_amount = amount[order] * growth
+        starts = np.flatnonzero(np.r_[True, sorted_customer[1:] != sorted_customer[:-1]])
+        group_start = np.repeat(starts, np.diff(np.r_[starts, n]))
+
+        def earlier(values):
+            total = np.cumsum(values)
+            return total - values - (total[group_start] - values[group_start])
+
+        amount_before = (self.amount_sum[sorted_customer] + earlier(scaled_amount)) / growth
+        weight_before = (self.weight_sum[sorted_customer] + earlier(growth)) / growth
+        avg = np.empty(n)
+        avg[order] = (AVG_PRIOR_WEIGHT * self.prior[sorted_customer] + amount_before) / (AVG_PRIOR_WEIGHT + weight_before)
+
+        unique_customer = sorted_customer[starts]
+        self.amount_sum[unique_customer] += np.add.reduceat(scaled_amount, starts)
+        self.weight_sum[unique_customer] += np.add.reduceat(growth, starts)
+        return velocity, np.round(avg, 2)
+
+
+# -----------------------------
+# One block
+# -----------------------------
+def _burst_event_probability(burst_rate: float) -> float:
+    """
+    Probability that an event is a burst, so that burst_rate of the rows belong to one.
+    """
+    mean_size = (BURST_SIZE[0] + BURST_SIZE[1] - 1) / 2
+    return burst_rate / (mean_size - burst_rate * (mean_size - 1))
+
+
+def generate_block(
+    profiles: CustomerProfiles,
+    history: CustomerHistory,
+    block_index: int,
+    n_rows: int,
+    seed: int,
+    rates: InjectionRates,
+    start_time: np.datetime64,
+    seconds_per_row: float,
+    id_width: int,
+) -> pd.DataFrame:
+    """
+    Generate rows [block_index * STREAM_BLOCK_ROWS, ... + n_rows) with array operations only.
+
+    The random stream is keyed by the block index (a fixed global row range),
+    so the file does not depend on how many rows are written at a time.
+    Blocks must be generated in order because they feed the customer history.
+    """
+    rng = np.random.default_rng([seed, block_index + 1])
+    start_row = block_index * STREAM_BLOCK_ROWS
+    rows = np.arange(n_rows)
+
+    # Events: a single transaction, or a burst of several by one customer within BURST_WINDOW_SECONDS
+    is_burst = rng.random(n_rows) < _burst_event_probability(rates.velocity_burst)
+    sizes = np.where(is_burst, rng.integers(BURST_SIZE[0], BURST_SIZE[1], n_rows), 1)
+    n_events = int(np.searchsorted(np.cumsum(sizes), n_rows)) + 1
+    event = np.repeat(np.arange(n_events), sizes[:n_events])[:n_rows]
+    event_start = np.r_[0, np.cumsum(sizes[:n_events])[:-1]][event]
+    event_size = np.minimum(sizes[:n_events], n_rows - np.r_[0, np.cumsum(sizes[:n_events])[:-1]])[event]
+    in_burst = event_size > 1
+
+    customer = np.searchsorted(profiles.weight_cdf, rng.random(n_rows))[event]
+    home = profiles.home_country[customer]
+    avg_amount = profiles.avg_amount[customer]
+
+    # Chronological timestamps across the whole file: one slot per row, and a
+    # burst's transactions packed at the start of its slots
+    jitter = rng.random(n_rows)
+    jitter[in_burst] = jitter[np.lexsort((jitter, event))][in_burst]
+    burst_span = np.minimum(event_size * seconds_per_row, BURST_WINDOW_SECONDS)
+    offsets = np.where(
+        in_burst,
+        (start_row + event_start) * seconds_per_row + jitter * burst_span,
+        (start_row + rows + jitter) * seconds_per_row,
+    )
+    seconds = np.floor(offsets).astype(np.int64)
+
+    # Baseline behaviour: spend around the customer's typical amount, at home
+    amount = avg_amount * rng.lognormal(0.0, 0.5, n_rows)
+    transaction_country = home.copy()
+    device_changed = rng.random(n_rows) < 0.01
+    category = np.where(
+        rng.random(n_rows) < 0.7,
+        profiles.preferred_category[customer],
+        rng.integers(0, len(MERCHANT_CATEGORIES), n_rows),
+    )
+
+    # Fraud pattern injection
+    geo = rng.random(n_rows) < rates.geo_mismatch
+    shift = rng.integers(1, len(COUNTRIES), n_rows)
+    transaction_country = np.where(geo, (home + shift) % len(COUNTRIES), transaction_country)
+
+    device = rng.random(n_rows) < rates.device_change
+    device_changed = device_changed | device
+
+    large = rng.random(n_rows) < rates.large_amount
+    amount = np.where(large, np.maximum(avg_amount * rng.uniform(5, 25, n_rows), rng.uniform(5000, 20000, n_rows)), amount)
+    amount = np.round(np.clip(amount, 1.0, 50000.0), 2)
+
+    # Features derived from what the customer has already done
+    velocity, avg_amount_30d = history.update(customer, seconds, amount)
+    high_velocity = velocity > 3
+
+    # Model output: score rises with the number of patterns present
+    signals = geo.astype(np.int8) + high_velocity + device + large
+    logit = -3.0 + 1.6 * signals + rng.normal(0.0, 0.8, n_rows)
+    fraud_score = np.round(1.0 / (1.0 + np.exp(-logit)), 2)
+
+    timestamps = start_time + seconds.astype("timedelta64[s]")
+    row_numbers = np.arange(start_row + 1, start_row + n_rows + 1)
+    transaction_id = np.char.add("TX", np.char.zfill(row_numbers.astype(str), id_width))
+
+    geo_mismatch = (transaction_country != home).astype(np.int64)
+    return pd.DataFrame({
+        "transaction_id": transaction_id,
+        "customer_id": np.char.add("C", customer.astype(str)),
+        "transaction_amount": amount,
+        "merchant_category": MERCHANT_CATEGORIES[category],
+        "transaction_country": COUNTRIES[transaction_country],
+        "customer_country": COUNTRIES[home],
+        "geo_mismatch": geo_mismatch,
+        "device_fingerprint_changed": device_changed,
+        "velocity_1h": velocity,
+        "high_velocity_flag": high_velocity.astype(np.int64),
+        "avg_amount_30d": avg_amount_30d,
+        "fraud_score": fraud_score,
+        "fraud_prediction": (fraud_score >= 0.5).astype(np.int64),
+        "transaction_timestamp": timestamps,
+        "synthetic_feature": np.round(amount / (avg_amount_30d + 1), 2),
+    })
+
+
+# -----------------------------
+# Chunked writer
+# -----------------------------
+def generate_synthetic_fraud_data(
+    output_path: str,
+    n_rows: int,
+    n_customers: int = None,
+    seed: int = 42,
+    rates: InjectionRates = None,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    days: int = 30,
+    start_date: str = "2025-01-01",
+) -> dict:
+    """
+    Write n_rows synthetic transactions to CSV.
+
+    Args:
+        output_path (str): Destination .csv file
+        n_rows (int): Number of transactions
+        n_customers (int): Number of distinct customers (default: n_rows / 20, at least 1)
+        seed (int): Seed; the same seed and sizes always produce the same file, whatever chunk_rows is
+        rates (InjectionRates): Fraud pattern injection rates
+        chunk_rows (int): Rows buffered per CSV append (bounds memory, does not change the output)
+        days (int): Time span covered by the timestamps
+        start_date (str): First day of the time span
+
+    Returns:
+        dict: Rows written and per-pattern counts
+    """
+    rates = rates or InjectionRates()
+    n_customers = n_customers or max(1, n_rows // 20)
+    profiles = build_customer_profiles(n_customers, seed)
+    history = CustomerHistory(profiles)
+    start_time = np.datetime64(f"{start_date}T00:00:00")
+    seconds_per_row = days * 86400 / max(n_rows, 1)
+    id_width = max(3, len(str(n_rows)))
+
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    if os.path.exists(output_path):
+        os.remove(output_path)
+
+    summary = {"rows": 0, "geo_mismatch": 0, "high_velocity_flag": 0,
+               "device_fingerprint_changed": 0, "amount_over_5000": 0, "fraud_prediction": 0}
+    pending = []
+
+    def flush():
+        chunk = pd.concat(pending, ignore_index=True)
+        pending.clear()
+        chunk.to_csv(output_path, mode="a", header=summary["rows"] == 0, index=False, date_format=TIMESTAMP_FORMAT)
+        summary["rows"] += len(chunk)
+        summary["geo_mismatch"] += int(chunk["geo_mismatch"].sum())
+        summary["high_velocity_flag"] += int(chunk["high_velocity_flag"].sum())
+        summary["device_fingerprint_changed"] += int(chunk["device_fingerprint_changed"].sum())
+        summary["amount_over_5000"] += int((chunk["transaction_amount"] > 5000).sum())
+        summary["fraud_prediction"] += int(chunk["fraud_prediction"].sum())
+
+    buffered = 0
+    for block_index, start_row in enumerate(range(0, n_rows, STREAM_BLOCK_ROWS)):
+        block = generate_block(
+            profiles, history, block_index, min(STREAM_BLOCK_ROWS, n_rows - start_row), seed,
+            rates, start_time, seconds_per_row, id_width,
+        )
+        pending.append(block)
+        buffered += len(block)
+        if buffered >= chunk_rows:
+            flush()
+            buffered = 0
+    if pending:
+        flush()
+
+    print(f"Synthetic fraud data written at {output_path} ({summary['rows']:,} rows, {n_customers:,} customers)")
+    return summary
+
+
+if __name__ == "__main__":
+    defaults = InjectionRates()
+    parser = argparse.ArgumentParser(description="Generate large synthetic fraud model output.")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--customers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--output", default="data/raw/fraud_model_output_synthetic.csv")
+    for name, value in asdict(defaults).items():
+        parser.add_argument(f"--{name.replace('_', '-')}-rate", dest=name, type=float, default=value)
+    args = parser.parse_args()
+
+    rates = InjectionRates(**{name: getattr(args, name) for name in asdict(defaults)})
+    print(generate_synthetic_fraud_data(
+        args.output, args.rows, n_customers=args.customers, seed=args.seed,
+        rates=rates, chunk_rows=args.chunk_rows, days=args.days,
+    ))
@@ -1,6 +1,9 @@
+import numpy as np
 import pandas as pd
+from dataclasses import dataclass
 from src.data_loader.schema import FraudModelOutput
-from typing import List
+from src.explanation.rules import compute_reason_mask, reason_label_categorical
+from typing import Iterator, List
 
 # Original required columns
 REQUIRED_COLUMNS = [
@@ -23,13 +26,18 @@ DERIVED_COLUMNS = ["geo_mismatch", "high_velocity_flag"]
 ALL_COLUMNS = REQUIRED_COLUMNS + DERIVED_COLUMNS
 
 
-def load_and_validate_fraud_output(csv_path: str) -> pd.DataFrame:
+def validate_fraud_frame(df: pd.DataFrame, row_offset: int = 0) -> pd.DataFrame:
     """
-    Load a fraud model output CSV, validate required and derived columns,
-    and return a validated DataFrame including derived features.
-    """
-    df = pd.read_csv(csv_path)
+    Validate required and derived columns of an already-loaded frame and return
+    a validated DataFrame including derived features.
 
+    Args:
+        df (pd.DataFrame): Raw fraud model output (whole file or one chunk)
+        row_offset (int): Position of df's first row in the source file, for error messages
+
+    Returns:
+        pd.DataFrame: Validated records
+    """
     # 1️⃣ Validate column existence
     missing_columns = set(ALL_COLUMNS) - set(df.columns)
     if missing_columns:
@@ -54,14 +62,94 @@ def load_and_validate_fraud_output(csv_path: str) -> pd.DataFrame:
 
             validated_records.append(validated.__dict__)
         except Exception as e:
-            raise ValueError(f"Row {idx} failed validation: {e}")
+            raise ValueError(f"Row {row_offset + idx} failed validation: {e}")
+
+    return pd.DataFrame(validated_records)
+
 
-    validated_df = pd.DataFrame(validated_records)
+def load_and_validate_fraud_output(csv_path: str) -> pd.DataFrame:
+    """
+    Load a fraud model output CSV, validate required and derived columns,
+    and return a validated DataFrame including derived features.
+    """
+    df = pd.read_csv(csv_path)
+    validated_df = validate_fraud_frame(df)
 
     print(f"Successfully validated {len(validated_df)} records.")
     return validated_df
 
 
+def iter_validated_chunks(csv_path: str, chunk_rows: int = 100_000) -> Iterator[pd.DataFrame]:
+    """
+    Stream a fraud model output CSV in validated chunks so memory is bounded by
+    chunk_rows rather than file size.
+
+    Yields:
+        pd.DataFrame: Validated chunk with a RangeIndex starting at 0
+    """
+    row_offset = 0
+    reader = pd.read_csv(csv_path, chunksize=chunk_rows)
+    for chunk in reader:
+        validated = validate_fraud_frame(chunk.reset_index(drop=True), row_offset=row_offset)
+        row_offset += len(chunk)
+        yield validated
+    print(f"Successfully validated {row_offset} records.")
+
+
+# -----------------------------
+# Validated-frame contract
+# -----------------------------
+@dataclass
+class ValidatedFrame:
+    """
+    Validated transactions plus their rule reason codes, computed once.
+
+    Every explanation stage takes this object: it reads `df` without copying
+    it and uses `reason_mask` instead of evaluating the rules again. Build it
+    with from_frame / load_validated_frame so the two always agree.
+
+    Attributes:
+        df (pd.DataFrame): Validated records (ALL_COLUMNS), RangeIndex
+        reason_mask (np.ndarray): uint16 rule bitmask per row (see rules.REASON_KEYS)
+    """
+    df: pd.DataFrame
+    reason_mask: np.ndarray
+
+    def __post_init__(self):
+        if len(self.reason_mask) != len(self.df):
+            raise ValueError("reason_mask must have one entry per validated row")
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, validate: bool = True, row_offset: int = 0) -> "ValidatedFrame":
+        """
+        Args:
+            df (pd.DataFrame): Raw rows, or rows already returned by validate_fraud_frame
+            validate (bool): Run schema validation first (skip for validated rows)
+            row_offset (int): Position of df's first row in the source file, for error messages
+        """
+        if validate:
+            df = validate_fraud_frame(df, row_offset=row_offset)
+        return cls(df, compute_reason_mask(df))
+
+    def __len__(self):
+        return len(self.df)
+
+    @property
+    def transaction_ids(self) -> np.ndarray:
+        return self.df["transaction_id"].to_numpy()
+
+    def rule_based_factors(self) -> pd.Categorical:
+        """Human-readable factor labels (codes into the distinct labels)."""
+        return reason_label_categorical(self.reason_mask)
+
+
+def load_validated_frame(csv_path: str) -> ValidatedFrame:
+    """
+    Load and validate a fraud model output CSV and compute its reason codes.
+    """
+    return ValidatedFrame.from_frame(load_and_validate_fraud_output(csv_path), validate=False)
+
+
 # Example usage
 if __name__ == "__main__":
     df_validated = load_and_validate_fraud_output("data/raw/fraud_model_output.csv")
@@ -0,0 +1,246 @@
+# src/data_process/dashboard.py
+"""
+Self-contained interactive HTML dashboard built from report aggregates.
+
+Every chart is drawn from pre-binned counts (score histogram, per-rule and
+per-group totals, rating counts) and the drill-down table holds the bounded
+transaction sample, so file size and render time do not depend on how many
+rows the aggregates cover.
+
+Usage:
+    python -m src.data_process.dashboard data/processed/report_aggregates.json --output reports/dashboard.html
+"""
+
+import os
+import json
+import html
+import argparse
+import numpy as np
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+from src.explanation.rules import REASON_KEYS, REASON_LABELS
+from src.data_process.report_aggregates import ReportAggregates, SCORE_BIN_EDGES, RATING_COLUMNS, AGGREGATES_PATH
+
+DASHBOARD_FILE = "dashboard.html"
+TABLE_COLUMNS = [
+    "transaction_id", "transaction_timestamp", "fraud_score", "fraud_prediction", "transaction_amount",
+    "merchant_category", "rule_based_factors", "top_feature_1", "explanation",
+] + RATING_COLUMNS
+
+
+# -----------------------------
+# Figures
+# -----------------------------
+def _overview_figure(aggregates: ReportAggregates) -> go.Figure:
+    fig = make_subplots(rows=1, cols=2, column_widths=[0.65, 0.35],
+                        subplot_titles=("Fraud Score Distribution", "Fraud Predictions"))
+    centers = (SCORE_BIN_EDGES[:-1] + SCORE_BIN_EDGES[1:]) / 2
+    fig.add_trace(go.Bar(x=centers, y=aggregates.score_hist, width=np.diff(SCORE_BIN_EDGES),
+                         marker_color="skyblue", name="Transactions"), row=1, col=1)
+    fig.add_trace(go.Bar(x=["Non-Fraud", "Fraud"], y=aggregates.prediction_counts,
+                         marker_color=["#66c2a5", "#fc8d62"], name="Predictions"), row=1, col=2)
+    fig.update_xaxes(title_text="Fraud Score", row=1, col=1)
+    fig.update_layout(showlegend=False, height=380, margin=dict(t=50, b=40))
+    return fig
+
+
+def _factor_figure(aggregates: ReportAggregates) -> go.Figure:
+    counts = aggregates.factor_counts()
+    cooccurrence = aggregates.cooccurrence()
+    fig = make_subplots(rows=1, cols=2, column_widths=[0.45, 0.55],
+                        subplot_titles=("Rule-Based Factors (click to filter)", "Factor Co-occurrence"))
+    fig.add_trace(go.Bar(x=list(counts.values()), y=list(counts.keys()), orientation="h",
+                         customdata=REASON_KEYS, marker_color="#5ab4ac", name="Rows"), row=1, col=1)
+    fig.add_trace(go.Heatmap(z=cooccurrence.to_numpy(), x=list(cooccurrence.columns), y=list(cooccurrence.index),
+                             colorscale="Reds", showscale=False), row=1, col=2)
+    fig.update_yaxes(autorange="reversed", row=1, col=1)
+    fig.update_yaxes(autorange="reversed", showticklabels=False, row=1, col=2)
+    fig.update_layout(showlegend=False, height=420, margin=dict(t=50, l=200))
+    return fig
+
+
+def _breakdown_figure(aggregates: ReportAggregates) -> go.Figure:
+    fig = make_subplots(rows=1, cols=2, specs=[[{"secondary_y": True}, {"secondary_y": True}]],
+                        subplot_titles=("Daily Volume and Fraud Rate", "Merchant Category (click to filter)"))
+    for col, frame in ((1, aggregates.daily_frame() if aggregates.daily else None),
+                       (2, aggregates.merchant_category_frame() if aggregates.merchant_category else None)):
+        if frame is None:
+            continue
+        groups = [str(g) for g in frame.index]
+        fig.add_trace(go.Bar(x=groups, y=frame["rows"], marker_color="lightsteelblue", name="Transactions",
+                             customdata=groups), row=1, col=col, secondary_y=False)
+        fig.add_trace(go.Scatter(x=groups, y=frame["fraud_rate"], mode="lines+markers", marker_color="crimson",
+                                 name="Fraud rate"), row=1, col=col, secondary_y=True)
+    fig.update_layout(showlegend=False, height=380, margin=dict(t=50, b=60))
+    return fig
+
+
+def _shap_figure(aggregates: ReportAggregates) -> go.Figure:
+    cols = sorted(aggregates.top_feature_counts)
+    features = sorted({f for c in cols for f in aggregates.top_feature_counts[c]})
+    fig = go.Figure()
+    for col in cols:
+        counts = aggregates.top_feature_counts[col]
+        fig.add_trace(go.Bar(x=features, y=[counts.get(f, 0) for f in features], name=col))
+    fig.update_layout(title="Top SHAP Features by Rank", barmode="group", height=380, margin=dict(t=50))
+    return fig
+
+
+def _feedback_figure(aggregates: ReportAggregates) -> go.Figure:
+    fig = go.Figure()
+    for col in RATING_COLUMNS:
+        counts = aggregates.rating_counts.get(col)
+        if counts is not None:
+            fig.add_trace(go.Bar(x=[str(r) for r in range(1, len(counts))], y=counts[1:], name=col))
+    fig.update_layout(title="SME Rating Distribution", barmode="group", height=340, margin=dict(t=50),
+                      xaxis_title="Rating")
+    return fig
+
+
+# -----------------------------
+# Page assembly
+# -----------------------------
+_SCRIPT = """
+<script>
+(function () {
+  const rows = %(rows)s;
+  const columns = %(columns)s;
+  const reasonKeys = %(reason_keys)s;
+  const filters = {factor: "", prediction: "", category: ""};
+
+  function matches(row) {
+    if (filters.factor !== "" && !(row.reason_mask & (1 << reasonKeys.indexOf(filters.factor)))) return false;
+    if (filters.prediction !== "" && String(row.fraud_prediction) !== filters.prediction) return false;
+    if (filters.category !== "" && row.merchant_category !== filters.category) return false;
+    return true;
+  }
+
+  function render() {
+    const body = document.getElementById("sample-body");
+    const shown = rows.filter(matches);
+    body.innerHTML = shown.map(r => "<tr>" + columns.map(c => {
+      const v = r[c] === null || r[c] === undefined ? "" : String(r[c]);
+      const cell = document.createElement("td");
+      cell.textContent = v;
+      return cell.outerHTML;
+    }).join("") + "</tr>").join("");
+    document.getElementById("sample-count").textContent = shown.length + " of " + rows.length + " sampled rows";
+    document.getElementById("filter-factor").value = filters.factor;
+    document.getElementById("filter-category").value = filters.category;
+  }
+
+  ["factor", "prediction", "category"].forEach(name => {
+    document.getElementById("filter-" + name).addEventListener("change", e => {
+      filters[name] = e.target.value;
+      render();
+    });
+  });
+  document.getElementById("factors").on("plotly_click", e => {
+    filters.factor = e.points[0].customdata || "";
+    render();
+  });
+  document.getElementById("breakdowns").on("plotly_click", e => {
+    if (e.points[0].xaxis._id === "x2") { filters.category = e.points[0].x; render(); }
+  });
+  render();
+})();
+</script>
+"""
+
+
+def _options(values: list, labels: dict = None) -> str:
+    labels = labels or {}
+    return "".join(f'<option value="{html.escape(str(v))}">{html.escape(str(labels.get(v, v)))}</option>' for v in values)
+
+
+def build_dashboard(aggregates: ReportAggregates, output_path: str, feedback_summary: dict = None,
+                    title: str = "Fraud Explainability Dashboard", include_plotlyjs: str = "inline") -> str:
+    """
+    Write a single self-contained HTML file (plotly.js inlined once) with the
+    score, factor, breakdown, SHAP and SME feedback views plus a filterable
+    table over the sampled transactions.
+
+    Args:
+        aggregates (ReportAggregates): Aggregates to plot
+        output_path (str): Destination HTML file
+        feedback_summary (dict): Feedback metrics; derived from the rating counts when omitted
+        title (str): Page title
+        include_plotlyjs (str): "inline" for a fully offline file, "cdn" for a much smaller one
+    """
+    feedback_summary = feedback_summary or aggregates.feedback_summary()
+    sections = [("overview", _overview_figure(aggregates)), ("factors", _factor_figure(aggregates)),
+                ("breakdowns", _breakdown_figure(aggregates))]
+    if aggregates.top_feature_counts:
+        sections.append(("shap", _shap_figure(aggregates)))
+    if aggregates.rating_counts:
+        sections.append(("feedback", _feedback_figure(aggregates)))
+
+    figures_html = []
+    for i, (div_id, fig) in enumerate(sections):
+        figures_html.append(fig.to_html(full_html=False, include_plotlyjs=include_plotlyjs if i == 0 else False,
+                                        div_id=div_id, config={"displaylogo": False}))
+
+    kpis = [("Transactions", f"{aggregates.rows:,}"),
+            ("Predicted fraud", f"{int(aggregates.prediction_counts[1]):,}")]
+    kpis += [(k.replace("_", " "), f"{v:.2f}") for k, v in feedback_summary.items() if v == v]
+    kpi_html = "".join(f'<div class="kpi"><div class="value">{html.escape(v)}</div>'
+                       f'<div class="label">{html.escape(k)}</div></div>' for k, v in kpis)
+
+    sample = aggregates.sample.rows
+    columns = [c for c in TABLE_COLUMNS if c in sample.columns]
+    categories = sorted(sample["merchant_category"].dropna().unique()) if "merchant_category" in sample.columns else []
+    script = _SCRIPT % {
+        "rows": json.dumps(aggregates.sample.to_records()).replace("</", "<\\/"),
+        "columns": json.dumps(columns),
+        "reason_keys": json.dumps(REASON_KEYS),
+    }
+
+    page = f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{html.escape(title)}</title>
+<style>
+body {{ font-family: sans-serif; margin: 20px; color: #222; }}
+.kpis {{ display: flex; flex-wrap: wrap; gap: 12px; margin-bottom: 16px; }}
+.kpi {{ background: #f4f6f8; border-radius: 6px; padding: 10px 16px; min-width: 140px; }}
+.kpi .value {{ font-size: 22px; font-weight: bold; }}
+.kpi .label {{ font-size: 12px; color: #555; }}
+table {{ border-collapse: collapse; font-size: 12px; width: 100%; }}
+th, td {{ border-bottom: 1px solid #ddd; padding: 4px 6px; text-align: left; vertical-align: top; }}
+th {{ background: #f4f6f8; position: sticky; top: 0; }}
+.table-wrap {{ max-height: 480px; overflow: auto; }}
+.filters {{ margin: 8px 0; display: flex; gap: 12px; align-items: center; }}
+</style></head>
+<body>
+<h1>{html.escape(title)}</h1>
+<div class="kpis">{kpi_html}</div>
+{"".join(figures_html)}
+<h2>Sampled transactions</h2>
+<div class="filters">
+  <label>Factor <select id="filter-factor"><option value="">All</option>{_options(REASON_KEYS, REASON_LABELS)}</select></label>
+  <label>Prediction <select id="filter-prediction"><option value="">All</option>{_options(["1", "0"], {"1": "Fraud", "0": "Non-Fraud"})}</select></label>
+  <label>Merchant category <select id="filter-category"><option value="">All</option>{_options(categories)}</select></label>
+  <span id="sample-count"></span>
+</div>
+<div class="table-wrap"><table>
+<thead><tr>{"".join(f"<th>{html.escape(c)}</th>" for c in columns)}</tr></thead>
+<tbody id="sample-body"></tbody>
+</table></div>
+{script}
+</body></html>
+"""
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        f.write(page)
+    print(f"Dashboard saved at {output_path} ({os.path.getsize(output_path) / 2**20:.1f} MiB)")
+    return output_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the interactive HTML dashboard from report aggregates.")
+    parser.add_argument("paths", nargs="*", default=[AGGREGATES_PATH], help="Aggregate files (merged if several)")
+    parser.add_argument("--output", default=os.path.join("reports", DASHBOARD_FILE))
+    parser.add_argument("--plotlyjs", default="inline", choices=["inline", "cdn"])
+    args = parser.parse_args()
+
+    from src.data_process.report_aggregates import merge_aggregate_files
+    build_dashboard(merge_aggregate_files(args.paths), args.output, include_plotlyjs=args.plotlyjs)
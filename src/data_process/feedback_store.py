@@ -0,0 +1,467 @@
+# src/data_process/feedback_store.py
+"""
+SQLite-backed store for SME feedback.
+
+Every rating is appended to `feedback_history` (who rated what, and when) and
+upserted into `feedback_latest`, which has transaction_id as its primary key.
+Recording one rating is a couple of B-tree inserts (O(log n)), and joining
+feedback onto a batch of transactions is an indexed lookup instead of a full
+DataFrame merge.
+
+`feedback_stats` keeps running count / sum / high-rating count per rating
+dimension for every (rule-factor signature, model, time window) group and
+their rollups. It is updated in the same transaction as each rating. A
+re-rating applies the delta between the old and new latest rating, so the
+stats always describe the latest ratings and any summary is a constant-cost
+primary-key lookup.
+
+Usage:
+    python -m src.data_process.feedback_store rate TX001 --clarity 4 --accuracy 5 --actionability 3 --reviewer alice
+    python -m src.data_process.feedback_store show TX001
+    python -m src.data_process.feedback_store summary --window 2025-01
+"""
+
+import os
+import sqlite3
+import argparse
+from collections import Counter
+from contextlib import closing
+from itertools import product
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+
+FEEDBACK_DB = os.path.join("data", "final", "feedback.db")
+RATING_COLUMNS = ["clarity_rating", "accuracy_rating", "actionability_rating"]
+FEEDBACK_COLUMNS = RATING_COLUMNS + ["comments", "reviewer", "rated_at"]
+HIGH_RATING = 4
+ALL = "*"                       # Rollup value for signature / model / window
+_RECORD_FIELDS = ["transaction_id", "reviewer"] + RATING_COLUMNS + ["comments", "rated_at", "signature", "model"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS feedback_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    transaction_id TEXT NOT NULL,
+    reviewer TEXT NOT NULL,
+    clarity_rating INTEGER,
+    accuracy_rating INTEGER,
+    actionability_rating INTEGER,
+    comments TEXT,
+    rated_at TEXT NOT NULL,
+    signature TEXT NOT NULL DEFAULT '',
+    model TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_feedback_history_tx ON feedback_history (transaction_id);
+
+CREATE TABLE IF NOT EXISTS feedback_latest (
+    transaction_id TEXT PRIMARY KEY,
+    reviewer TEXT NOT NULL,
+    clarity_rating INTEGER,
+    accuracy_rating INTEGER,
+    actionability_rating INTEGER,
+    comments TEXT,
+    rated_at TEXT NOT NULL,
+    signature TEXT NOT NULL DEFAULT '',
+    model TEXT NOT NULL DEFAULT '',
+    rating_count INTEGER NOT NULL DEFAULT 1
+) WITHOUT ROWID;
+-- Low-rating selection probes one index per dimension instead of scanning every rating
+CREATE INDEX IF NOT EXISTS idx_feedback_latest_clarity ON feedback_latest (clarity_rating);
+CREATE INDEX IF NOT EXISTS idx_feedback_latest_accuracy ON feedback_latest (accuracy_rating);
+CREATE INDEX IF NOT EXISTS idx_feedback_latest_actionability ON feedback_latest (actionability_rating);
+
+CREATE TABLE IF NOT EXISTS feedback_stats (
+    dimension TEXT NOT NULL,
+    signature TEXT NOT NULL,
+    model TEXT NOT NULL,
+    time_window TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    total INTEGER NOT NULL,
+    high_count INTEGER NOT NULL,
+    PRIMARY KEY (dimension, signature, model, time_window)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS merged_sources (
+    source TEXT PRIMARY KEY,
+    last_history_id INTEGER NOT NULL
+);
+"""
+
+_UPSERT_LATEST = """
+INSERT INTO feedback_latest
+    (transaction_id, reviewer, clarity_rating, accuracy_rating, actionability_rating, comments, rated_at,
+     signature, model)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (transaction_id) DO UPDATE SET
+    reviewer = excluded.reviewer,
+    clarity_rating = excluded.clarity_rating,
+    accuracy_rating = excluded.accuracy_rating,
+    actionability_rating = excluded.actionability_rating,
+    comments = excluded.comments,
+    rated_at = excluded.rated_at,
+    signature = excluded.signature,
+    model = excluded.model,
+    rating_count = feedback_latest.rating_count + 1
+"""
+
+_INSERT_HISTORY = """
+INSERT INTO feedback_history
+    (transaction_id, reviewer, clarity_rating, accuracy_rating, actionability_rating, comments, rated_at,
+     signature, model)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+_UPSERT_STATS = """
+INSERT INTO feedback_stats (dimension, signature, model, time_window, count, total, high_count)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (dimension, signature, model, time_window) DO UPDATE SET
+    count = feedback_stats.count + excluded.count,
+    total = feedback_stats.total + excluded.total,
+    high_count = feedback_stats.high_count + excluded.high_count
+"""
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def _optional_int(value):
+    return None if value is None or pd.isna(value) else int(value)
+
+
+def _stats_deltas(previous: list, records: list) -> list:
+    """
+    feedback_stats rows to add for a batch of writes: the latest rating of
+    each id after the batch counts +1, the rating it replaces counts -1.
+    Every rating lands in each rollup of (signature | *) x (model | *) x
+    (day | month | *), so any of those groups is one row to read.
+    """
+    positions = [_RECORD_FIELDS.index(f) for f in RATING_COLUMNS + ["rated_at", "signature", "model"]]
+    latest = {r[0]: [r[i] for i in positions] for r in records}      # last write per id wins
+
+    # Collapse identical (sign, group, ratings) first; batches have few distinct ones
+    # Keys are (sign, signature, model, day, clarity, accuracy, actionability)
+    distinct = Counter((1, row[4], row[5], str(row[3])[:10], *row[:3]) for row in latest.values())
+    distinct.update((-1, row[5], row[6], str(row[4])[:10], *row[1:4]) for row in previous)
+
+    deltas = {}
+    for (sign, signature, model, day, *ratings), n in distinct.items():
+        for dim, value in zip(RATING_COLUMNS, ratings):
+            if value is None:
+                continue
+            value = int(value)
+            update = (sign * n, sign * n * value, sign * n * (value >= HIGH_RATING))
+            for key in product((dim,), (signature, ALL), (model, ALL), (day, day[:7], ALL)):
+                current = deltas.get(key, (0, 0, 0))
+                deltas[key] = (current[0] + update[0], current[1] + update[1], current[2] + update[2])
+    return [key + value for key, value in deltas.items() if any(value)]
+
+
+def _inherit_groups(previous: list, records: list) -> list:
+    """
+    Fill empty signature / model fields from the latest rating of the same
+    transaction (earlier records of the batch included).
+    """
+    sig, mod = _RECORD_FIELDS.index("signature"), _RECORD_FIELDS.index("model")
+    groups = {row[0]: (row[5], row[6]) for row in previous}
+    out = []
+    for record in records:
+        signature, model = groups.get(record[0], ("", ""))
+        if not record[sig] or not record[mod]:
+            record = list(record)
+            record[sig] = record[sig] or signature
+            record[mod] = record[mod] or model
+            record = tuple(record)
+        groups[record[0]] = (record[sig], record[mod])
+        out.append(record)
+    return out
+
+
+class FeedbackStore:
+    """
+    Rating history plus the latest rating per transaction, with reviewer
+    attribution. Holds real reviewer ratings only; the pipeline's simulated
+    ratings never reach it. Like ShardQueue, it keeps the default rollback
+    journal (not WAL), since shard workers may read it over shared storage.
+    """
+
+    def __init__(self, db_path: str = FEEDBACK_DB):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30.0, isolation_level=None)
+
+    def _write(self, records: list, after=None):
+        """
+        Append records to the history, upsert the latest table and apply the
+        stats deltas in one transaction. Each record follows _RECORD_FIELDS.
+        Records without a signature or model keep the ones of the rating they
+        replace, so a re-rating stays in its (signature, model) group.
+        `after(conn)` runs inside the same transaction.
+        """
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                previous = self._previous_latest(conn, [r[0] for r in records])
+                records = _inherit_groups(previous, records)
+                conn.executemany(_INSERT_HISTORY, records)
+                conn.executemany(_UPSERT_LATEST, records)
+                conn.executemany(_UPSERT_STATS, _stats_deltas(previous, records))
+                if after is not None:
+                    after(conn)
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    @staticmethod
+    def _previous_latest(conn, transaction_ids: list) -> list:
+        """Current latest rows for the given ids (one primary-key probe per id)."""
+        cols = ", ".join(["f.transaction_id"] + ["f." + c for c in RATING_COLUMNS] + ["f.rated_at", "f.signature", "f.model"])
+        if len(transaction_ids) == 1:
+            return conn.execute(f"SELECT {cols} FROM feedback_latest f WHERE f.transaction_id = ?",
+                                (transaction_ids[0],)).fetchall()
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS write_ids (transaction_id TEXT PRIMARY KEY)")
+        conn.execute("DELETE FROM write_ids")
+        conn.executemany("INSERT OR IGNORE INTO write_ids VALUES (?)", ((t,) for t in transaction_ids))
+        return conn.execute(
+            f"SELECT {cols} FROM write_ids w JOIN feedback_latest f ON f.transaction_id = w.transaction_id"
+        ).fetchall()
+
+    # -----------------------------
+    # Writes
+    # -----------------------------
+    def record(self, transaction_id, clarity_rating=None, accuracy_rating=None, actionability_rating=None,
+               reviewer: str = "unknown", comments: str = "", rated_at: str = None,
+               signature: str = "", model: str = ""):
+        """
+        Record one rating: one history row, one upsert and a fixed number of
+        stats upserts, O(log n).
+
+        Args:
+            signature (str): Rule-factor signature of the explanation (rule_based_factors);
+                empty keeps the signature of the transaction's previous rating
+            model (str): Model that generated the explanation; empty keeps the previous one
+        """
+        self._write([(str(transaction_id), reviewer, _optional_int(clarity_rating), _optional_int(accuracy_rating),
+                      _optional_int(actionability_rating), comments or "", rated_at or _now(),
+                      signature or "", model or "")])
+
+    def record_frame(self, feedback_df: pd.DataFrame, reviewer: str = "unknown", signatures=None, model: str = ""):
+        """
+        Record a batch of ratings (transaction_id plus rating columns; optional
+        comments, reviewer, rated_at, signature and model columns) in one
+        transaction. `signatures` (aligned with the rows) and `model` fill in
+        the signature and model when the frame has no such columns.
+        """
+        n = len(feedback_df)
+        if not n:
+            return
+        rated_at = _now()
+
+        def column(name, default):
+            return feedback_df[name].tolist() if name in feedback_df.columns else [default] * n
+
+        ratings = [
+            [None if pd.isna(v) else int(v) for v in column(col, None)] for col in RATING_COLUMNS
+        ]
+        records = list(zip(
+            feedback_df["transaction_id"].astype(str).tolist(),
+            column("reviewer", reviewer),
+            *ratings,
+            ["" if pd.isna(c) else str(c) for c in column("comments", "")],
+            column("rated_at", rated_at),
+            list(map(str, signatures)) if signatures is not None else column("signature", ""),
+            column("model", model or ""),
+        ))
+        self._write(records)
+
+    # -----------------------------
+    # Reads
+    # -----------------------------
+    def latest(self, transaction_ids=None) -> pd.DataFrame:
+        """
+        Latest rating per transaction (all transactions when ids are omitted).
+        """
+        if transaction_ids is None:
+            with closing(self._connect()) as conn:
+                return pd.read_sql_query("SELECT * FROM feedback_latest ORDER BY transaction_id", conn)
+        ids = pd.Series(np.asarray(transaction_ids, dtype=object)).astype(str)
+        return self.join(pd.DataFrame({"transaction_id": ids})).dropna(subset=["rated_at"])
+
+    def history(self, transaction_id) -> pd.DataFrame:
+        """
+        Every rating recorded for one transaction, oldest first.
+        """
+        with closing(self._connect()) as conn:
+            return pd.read_sql_query(
+                "SELECT * FROM feedback_history WHERE transaction_id = ? ORDER BY id", conn, params=(str(transaction_id),)
+            )
+
+    def join(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Attach the latest feedback columns to df via the transaction_id index.
+        The batch's ids go into a temporary table and are joined against the
+        primary key, so the cost depends on the batch, not on the store size.
+        Rows without feedback get missing values; df's row order is kept.
+        """
+        ids = df["transaction_id"].astype(str).tolist()
+        with closing(self._connect()) as conn:
+            conn.execute("CREATE TEMP TABLE batch_ids (pos INTEGER PRIMARY KEY, transaction_id TEXT)")
+            conn.executemany("INSERT INTO batch_ids VALUES (?, ?)", enumerate(ids))
+            found = pd.read_sql_query(
+                f"SELECT b.pos, {', '.join('f.' + c for c in FEEDBACK_COLUMNS)} "
+                "FROM batch_ids b JOIN feedback_latest f ON f.transaction_id = b.transaction_id",
+                conn,
+            )
+        feedback = found.set_index("pos").reindex(np.arange(len(df)))
+        out = df.copy()
+        for col in FEEDBACK_COLUMNS:
+            out[col] = feedback[col].to_numpy()
+        return out
+
+    def low_rated(self, thresholds: dict, model: str = ALL) -> pd.DataFrame:
+        """
+        Latest ratings with any dimension strictly below its threshold. Each
+        dimension is an index range scan, so the cost follows the number of
+        low ratings rather than the store size.
+
+        Args:
+            thresholds (dict): Rating column -> minimum acceptable rating
+            model (str): Only explanations from this model, or "*" for all
+        """
+        dims = [c for c in RATING_COLUMNS if thresholds.get(c) is not None]
+        if not dims:
+            return pd.DataFrame(columns=["transaction_id", "signature", "model", "rated_at"] + RATING_COLUMNS)
+        where = " OR ".join(f"{c} < ?" for c in dims)
+        params = [thresholds[c] for c in dims]
+        if model != ALL:
+            where = f"({where}) AND model = ?"
+            params.append(model)
+        with closing(self._connect()) as conn:
+            return pd.read_sql_query(
+                f"SELECT transaction_id, signature, model, rated_at, {', '.join(RATING_COLUMNS)} "
+                f"FROM feedback_latest WHERE {where} ORDER BY transaction_id", conn, params=params,
+            )
+
+    def version(self) -> tuple:
+        """
+        (history rows, latest rated_at): changes whenever a rating is recorded
+        or merged, so callers can tell that their ratings-derived output is stale.
+        """
+        with closing(self._connect()) as conn:
+            return tuple(conn.execute("SELECT COUNT(*), MAX(rated_at) FROM feedback_history").fetchone())
+
+    def count(self) -> int:
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT COUNT(*) FROM feedback_latest").fetchone()[0]
+
+    # -----------------------------
+    # Streaming summary (constant cost)
+    # -----------------------------
+    def summary(self, signature: str = ALL, model: str = ALL, window: str = ALL) -> dict:
+        """
+        Same metrics as summarize_feedback for one group, read from the
+        running stats: one primary-key lookup per rating dimension.
+
+        Args:
+            signature (str): rule_based_factors value, or "*" for all
+            model (str): Explanation model, or "*" for all
+            window (str): "YYYY-MM-DD", "YYYY-MM" or "*" for all time
+        """
+        metrics = {}
+        with closing(self._connect()) as conn:
+            for dim in RATING_COLUMNS:
+                row = conn.execute(
+                    "SELECT count, total, high_count FROM feedback_stats "
+                    "WHERE dimension = ? AND signature = ? AND model = ? AND time_window = ?",
+                    (dim, signature, model, window),
+                ).fetchone()
+                count, total, high = row if row else (0, 0, 0)
+                metrics[f"{dim}_avg"] = total / count if count else np.nan
+                metrics[f"{dim}_>=4_pct"] = high / count * 100 if count else np.nan
+                metrics[f"{dim}_count"] = count
+        return metrics
+
+    def stats(self, by: str = "signature", model: str = ALL, window: str = ALL) -> pd.DataFrame:
+        """
+        Per-group averages and high-rating shares, one row per signature,
+        model or window (`by`), with the other two keys fixed.
+        """
+        fixed = {"signature": ALL, "model": model, "time_window": window}
+        by = "time_window" if by == "window" else by
+        fixed.pop(by)
+        where = " AND ".join(f"{k} = ?" for k in fixed)
+        with closing(self._connect()) as conn:
+            frame = pd.read_sql_query(
+                f"SELECT {by}, dimension, count, total, high_count FROM feedback_stats "
+                f"WHERE {where} AND {by} != ? AND count > 0",
+                conn, params=(*fixed.values(), ALL),
+            )
+        frame["avg"] = frame["total"] / frame["count"]
+        frame["high_pct"] = frame["high_count"] / frame["count"] * 100
+        return frame.pivot(index=by, columns="dimension", values=["count", "avg", "high_pct"])
+
+    def merge_from(self, other_db: str) -> int:
+        """
+        Replay another store's history into this one (e.g. a reviewer's offline store),
+        in the order it was recorded. Only rows added since the last merge
+        from the same source are replayed, so merging twice is harmless.
+        """
+        source = os.path.abspath(other_db)
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT last_history_id FROM merged_sources WHERE source = ?", (source,)).fetchone()
+        last_id = row[0] if row else 0
+
+        with closing(sqlite3.connect(other_db)) as src:
+            rows = src.execute(
+                "SELECT id, transaction_id, reviewer, clarity_rating, accuracy_rating, actionability_rating, comments, "
+                "rated_at, signature, model FROM feedback_history WHERE id > ? ORDER BY id", (last_id,)
+            ).fetchall()
+        if rows:
+            self._write([r[1:] for r in rows], after=lambda conn: conn.execute(
+                "INSERT INTO merged_sources (source, last_history_id) VALUES (?, ?) "
+                "ON CONFLICT (source) DO UPDATE SET last_history_id = excluded.last_history_id",
+                (source, rows[-1][0]),
+            ))
+        return len(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record or inspect SME feedback.")
+    parser.add_argument("--db", default=FEEDBACK_DB)
+    sub = parser.add_subparsers(dest="command", required=True)
+    rate = sub.add_parser("rate", help="Record one rating")
+    rate.add_argument("transaction_id")
+    rate.add_argument("--clarity", type=int)
+    rate.add_argument("--accuracy", type=int)
+    rate.add_argument("--actionability", type=int)
+    rate.add_argument("--reviewer", default=os.getenv("USER", "unknown"))
+    rate.add_argument("--comments", default="")
+    rate.add_argument("--signature", default="", help="Rule-factor signature (default: keep the previous rating's)")
+    rate.add_argument("--model", default="", help="Explanation model (default: keep the previous rating's)")
+    show = sub.add_parser("show", help="Show the rating history of one transaction")
+    show.add_argument("transaction_id")
+    summary = sub.add_parser("summary", help="Running feedback metrics (constant-cost lookup)")
+    summary.add_argument("--signature", default=ALL)
+    summary.add_argument("--model", default=ALL)
+    summary.add_argument("--window", default=ALL, help="YYYY-MM-DD, YYYY-MM or * (all time)")
+    summary.add_argument("--by", choices=["signature", "model", "window"], help="Break down by this key instead")
+    args = parser.parse_args()
+
+    store = FeedbackStore(args.db)
+    if args.command == "rate":
+        store.record(args.transaction_id, args.clarity, args.accuracy, args.actionability,
+                     reviewer=args.reviewer, comments=args.comments, signature=args.signature, model=args.model)
+        print(f"Recorded feedback for {args.transaction_id}")
+    elif args.command == "summary":
+        if args.by:
+            print(store.stats(args.by, model=args.model, window=args.window).to_string())
+        else:
+            for k, v in store.summary(args.signature, args.model, args.window).items():
+                print(f"{k}: {v:.2f}")
+    else:
+        print(store.history(args.transaction_id).to_string(index=False))
@@ -1,48 +1,70 @@
 # src/final_dataset/feedback_system.py
 
+import os
 import pandas as pd
 import numpy as np
 # from src.data_process.final_explained_dataset import create_final_explained_dataset
 
+SIMULATED_REVIEWER = "simulated"
+RATING_COLUMNS = ["clarity_rating", "accuracy_rating", "actionability_rating"]
+
 # -----------------------------
 # 1️⃣ Collect SME Feedback
 # -----------------------------
-def collect_sme_feedback(df: pd.DataFrame, feedback_csv: str = "data/final/fraud_explainability_feedback.csv") -> pd.DataFrame:
+def collect_sme_feedback(df: pd.DataFrame, feedback_csv: str = "data/final/fraud_explainability_feedback.csv",
+                         append: bool = False) -> pd.DataFrame:
     """
-    Collect or simulate SME ratings for each transaction explanation.
+    Simulate SME ratings for each transaction explanation.
+
+    The simulated ratings only go to the feedback CSV and the returned frame.
+    They are never written to the FeedbackStore, which holds real reviewer
+    ratings only (see integrate_feedback).
 
     Args:
         df: DataFrame with final explanations (Task 5 output)
-        feedback_csv: Path to save the feedback CSV
+        feedback_csv: Path to save the feedback CSV (None to skip the CSV export)
+        append: Append to an existing feedback CSV (chunked runs) instead of overwriting
 
     Returns:
-        pd.DataFrame: DataFrame with SME feedback
+        pd.DataFrame: transaction_id plus the SME feedback columns
     """
-    feedback = df.copy()
-    
+    # Only the id and the ratings are needed; the explained dataset is not copied
+    feedback = pd.DataFrame({"transaction_id": df["transaction_id"].to_numpy()})
+
     # Simulate SME ratings (replace with real input in production)
     feedback["clarity_rating"] = np.random.randint(3, 6, size=len(feedback))        # 3-5 scale
     feedback["accuracy_rating"] = np.random.randint(3, 6, size=len(feedback))
     feedback["actionability_rating"] = np.random.randint(3, 6, size=len(feedback))
     feedback["comments"] = ""  # Optional: SMEs can fill this manually
+    feedback["reviewer"] = SIMULATED_REVIEWER
 
     # Save feedback CSV for record
-    feedback.to_csv(feedback_csv, index=False)
-    print(f"SME feedback saved at {feedback_csv}")
+    if feedback_csv:
+        if append and os.path.exists(feedback_csv):
+            feedback.to_csv(feedback_csv, mode="a", header=False, index=False)
+        else:
+            feedback.to_csv(feedback_csv, index=False)
+        print(f"SME feedback saved at {feedback_csv}")
 
     return feedback
 
 # -----------------------------
 # 2️⃣ Summarize Feedback
 # -----------------------------
-def summarize_feedback(feedback_df: pd.DataFrame):
+def summarize_feedback(feedback_df: pd.DataFrame = None, store=None):
     """
     Summarize SME feedback to compute averages and percentage of high ratings.
+
+    With a FeedbackStore, the metrics come from its running stats (latest
+    rating per transaction) at constant cost instead of a scan of the frame.
     """
     metrics = {}
-    for col in ["clarity_rating", "accuracy_rating", "actionability_rating"]:
-        metrics[f"{col}_avg"] = feedback_df[col].mean()
-        metrics[f"{col}_>=4_pct"] = (feedback_df[col] >= 4).mean() * 100
+    if store is not None:
+        metrics = {k: v for k, v in store.summary().items() if not k.endswith("_count")}
+    else:
+        for col in RATING_COLUMNS:
+            metrics[f"{col}_avg"] = feedback_df[col].mean()
+            metrics[f"{col}_>=4_pct"] = (feedback_df[col] >= 4).mean() * 100
 
     print("SME Feedback Summary:")
     for k, v in metrics.items():
@@ -53,15 +75,31 @@ def summarize_feedback(feedback_df: pd.DataFrame):
 # -----------------------------
 # 3️⃣ Integrate Feedback with Final Dataset
 # -----------------------------
-def integrate_feedback(df_final: pd.DataFrame, feedback_df: pd.DataFrame) -> pd.DataFrame:
+def integrate_feedback(df_final: pd.DataFrame, feedback_df: pd.DataFrame = None, store=None) -> pd.DataFrame:
     """
     Merge SME feedback into the final explained dataset.
+
+    With a FeedbackStore, the latest recorded rating per transaction (plus
+    reviewer and timestamp) is attached through the store's transaction_id
+    index instead of a DataFrame merge. Simulated ratings in feedback_df
+    (aligned with df_final's rows) only fill the rows no reviewer has rated.
     """
-    return df_final.merge(
-        feedback_df[["transaction_id", "clarity_rating", "accuracy_rating", "actionability_rating", "comments"]],
-        on="transaction_id",
-        how="left"
-    )
+    if store is None:
+        return df_final.merge(
+            feedback_df[["transaction_id", "clarity_rating", "accuracy_rating", "actionability_rating", "comments"]],
+            on="transaction_id",
+            how="left"
+        )
+    out = store.join(df_final)
+    if feedback_df is not None:
+        unrated = out["rated_at"].isna().to_numpy()
+        for col in RATING_COLUMNS + ["comments", "reviewer"]:
+            values = out[col].to_numpy(dtype=object, copy=True)
+            values[unrated] = feedback_df[col].to_numpy(dtype=object)[unrated]
+            out[col] = values
+        for col in RATING_COLUMNS:
+            out[col] = pd.to_numeric(out[col])
+    return out
 
 # # -----------------------------
 # # 4️⃣ Main Execution
@@ -0,0 +1,395 @@
+# src/data_process/report_aggregates.py
+"""
+Small, mergeable store of everything the reports need.
+
+Aggregates from different chunks, shards or days are combined with `merge`
+(or `+`) without touching the rows again, then rendered directly.
+
+Usage:
+    python -m src.data_process.report_aggregates merge day1.json day2.json --output month.json
+    python -m src.data_process.report_aggregates render month.json --report-dir reports/2025-01
+"""
+
+import os
+import copy
+import json
+import argparse
+import numpy as np
+import pandas as pd
+from src.explanation.rules import (
+    REASON_KEYS, REASON_LABELS, NO_REASON_LABEL, compute_reason_mask, reason_keys_from_mask, reason_mask_from_labels,
+)
+
+# -----------------------------
+# Fixed binning so chunks can be accumulated
+# -----------------------------
+SCORE_BIN_EDGES = np.linspace(0.0, 1.0, 21)
+AGGREGATES_PATH = os.path.join("data", "processed", "report_aggregates.json")
+
+# Per-group columns for the daily and merchant-category breakdowns
+GROUP_FIELDS = ["rows", "predicted_fraud", "score_sum"] + REASON_KEYS
+
+# SME ratings are integers on a 1-5 scale
+RATING_COLUMNS = ["clarity_rating", "accuracy_rating", "actionability_rating"]
+RATING_LEVELS = 6
+
+# Bounded transaction sample for dashboards and drill-down
+SAMPLE_SIZE = 1000
+SAMPLE_COLUMNS = [
+    "transaction_id", "transaction_timestamp", "fraud_score", "fraud_prediction", "transaction_amount",
+    "merchant_category", "transaction_country", "rule_based_factors", "top_feature_1", "explanation",
+] + RATING_COLUMNS
+SAMPLE_TEXT_CHARS = 200
+
+
+def _id_hash(transaction_ids) -> np.ndarray:
+    return pd.util.hash_array(np.asarray(transaction_ids, dtype=object).astype(str).astype(object))
+
+
+class TransactionSample:
+    """
+    Bottom-k sample by hash of transaction_id: the k rows with the smallest
+    hashes. Merging two samples and keeping the k smallest gives the same rows
+    as sampling the combined data, so the sample is independent of how the
+    data was chunked or sharded, and its size never grows past k.
+    """
+
+    def __init__(self, size: int = SAMPLE_SIZE):
+        self.size = size
+        self.rows = pd.DataFrame()
+        self._hashes = np.zeros(0, dtype=np.uint64)
+
+    def _keep_smallest(self, rows: pd.DataFrame, hashes: np.ndarray):
+        if len(rows) > self.size:
+            keep = np.argpartition(hashes, self.size - 1)[:self.size]
+            rows, hashes = rows.iloc[keep], hashes[keep]
+        order = np.argsort(hashes, kind="stable")
+        self.rows = rows.iloc[order].reset_index(drop=True)
+        self._hashes = hashes[order]
+
+    def update(self, df: pd.DataFrame, reason_mask: np.ndarray):
+        if "transaction_id" not in df.columns or not len(df):
+            return
+        hashes = _id_hash(df["transaction_id"].to_numpy())
+        if len(df) > self.size:
+            # Only this chunk's own k smallest can survive; avoid copying the rest
+            candidates = np.argpartition(hashes, self.size - 1)[:self.size]
+        else:
+            candidates = np.arange(len(df))
+        if len(self._hashes) >= self.size:
+            candidates = candidates[hashes[candidates] < self._hashes[-1]]
+            if not len(candidates):
+                return
+
+        cols = [c for c in SAMPLE_COLUMNS if c in df.columns]
+        rows = df.iloc[candidates][cols].copy()
+        rows["reason_mask"] = np.asarray(reason_mask)[candidates].astype(np.int64)
+        if "transaction_timestamp" in rows.columns:
+            rows["transaction_timestamp"] = rows["transaction_timestamp"].astype(str)
+        if "explanation" in rows.columns:
+            rows["explanation"] = rows["explanation"].astype(str).str.slice(0, SAMPLE_TEXT_CHARS)
+        self.merge_rows(rows, hashes[candidates])
+
+    def merge_rows(self, rows: pd.DataFrame, hashes: np.ndarray):
+        combined = pd.concat([self.rows, rows], ignore_index=True) if len(self.rows) else rows
+        self._keep_smallest(combined, np.concatenate([self._hashes, hashes]))
+
+    def merge(self, other: "TransactionSample"):
+        if len(other.rows):
+            self.merge_rows(other.rows, other._hashes)
+
+    def to_records(self) -> list:
+        return json.loads(self.rows.to_json(orient="records"))
+
+    @classmethod
+    def from_records(cls, records: list, size: int = SAMPLE_SIZE) -> "TransactionSample":
+        sample = cls(size)
+        rows = pd.DataFrame.from_records(records)
+        if len(rows):
+            sample._keep_smallest(rows, _id_hash(rows["transaction_id"].to_numpy()))
+        return sample
+
+
+def _group_stats(keys: np.ndarray, scores: np.ndarray, predictions: np.ndarray, reason_mask: np.ndarray,
+                 format_key=str) -> dict:
+    """
+    GROUP_FIELDS totals per distinct key, via one factorize and a bincount per
+    field. Only the distinct keys are formatted, not every row.
+    """
+    codes, uniques = pd.factorize(keys)
+    valid = codes >= 0
+    codes = codes[valid]
+    n = len(uniques)
+    stats = np.zeros((n, len(GROUP_FIELDS)), dtype=np.float64)
+    stats[:, 0] = np.bincount(codes, minlength=n)
+    stats[:, 1] = np.bincount(codes, weights=predictions[valid], minlength=n)
+    stats[:, 2] = np.bincount(codes, weights=scores[valid], minlength=n)
+    mask = reason_mask[valid].astype(np.int64)
+    for bit in range(len(REASON_KEYS)):
+        stats[:, 3 + bit] = np.bincount(codes, weights=(mask >> bit) & 1, minlength=n)
+    return {format_key(key): row for key, row in zip(uniques, stats)}
+
+
+def _add_groups(target: dict, stats: dict):
+    for key, row in stats.items():
+        if key in target:
+            target[key] = np.asarray(target[key]) + row
+        else:
+            target[key] = np.array(row, dtype=np.float64)
+
+
+class ReportAggregates:
+    """
+    Running report aggregates: score histogram, prediction counts, rule-factor
+    bitmask counts (which also give per-factor and co-occurrence counts), top
+    SHAP feature counts, per-day / per-merchant-category breakdowns, SME rating
+    counts and a bounded transaction sample.
+    Updated one chunk at a time, so reports never need the full dataset in
+    memory.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.score_hist = np.zeros(len(SCORE_BIN_EDGES) - 1, dtype=np.int64)
+        self.prediction_counts = np.zeros(2, dtype=np.int64)
+        self.reason_mask_counts = np.zeros(1 << len(REASON_KEYS), dtype=np.int64)
+        self.top_feature_counts = {}
+        self.daily = {}                  # "YYYY-MM-DD" -> GROUP_FIELDS totals
+        self.merchant_category = {}      # category -> GROUP_FIELDS totals
+        self.rating_counts = {}          # rating column -> count per rating value (0-5)
+        self.sample = TransactionSample()
+
+    def update(self, df: pd.DataFrame, reason_mask: np.ndarray = None):
+        """
+        Add one chunk of the final explained dataset.
+
+        Args:
+            df (pd.DataFrame): Chunk with fraud_score, fraud_prediction and top_feature_i columns
+            reason_mask (np.ndarray): Precomputed rule bitmask for the chunk; taken from a
+                reason_mask column (compact frames) or recomputed if omitted
+        """
+        self.rows += len(df)
+        scores = np.zeros(len(df))
+        predictions = np.zeros(len(df))
+        if "fraud_score" in df.columns:
+            scores = np.clip(df["fraud_score"].to_numpy(dtype=np.float64), 0.0, 1.0)
+            self.score_hist += np.histogram(scores, bins=SCORE_BIN_EDGES)[0]
+        if "fraud_prediction" in df.columns:
+            predictions = df["fraud_prediction"].to_numpy(dtype=np.int64)
+            self.prediction_counts += np.bincount(predictions, minlength=2)[:2]
+        if reason_mask is None and "reason_mask" in df.columns:
+            reason_mask = df["reason_mask"].to_numpy()
+        if reason_mask is None:
+            if "transaction_amount" not in df.columns and "rule_based_factors" in df.columns:
+                reason_mask = reason_mask_from_labels(df["rule_based_factors"])
+            else:
+                reason_mask = compute_reason_mask(df)
+        self.reason_mask_counts += np.bincount(reason_mask, minlength=len(self.reason_mask_counts))
+
+        if "transaction_timestamp" in df.columns:
+            days = pd.to_datetime(df["transaction_timestamp"], errors="coerce").dt.floor("D")
+            _add_groups(self.daily, _group_stats(days.to_numpy(), scores, predictions, reason_mask,
+                                                 format_key=lambda d: pd.Timestamp(d).strftime("%Y-%m-%d")))
+        if "merchant_category" in df.columns:
+            _add_groups(self.merchant_category, _group_stats(
+                df["merchant_category"].to_numpy(), scores, predictions, reason_mask))
+
+        for col in RATING_COLUMNS:
+            if col in df.columns:
+                ratings = df[col].dropna().to_numpy(dtype=np.int64)
+                counts = np.bincount(np.clip(ratings, 0, RATING_LEVELS - 1), minlength=RATING_LEVELS)
+                self.rating_counts[col] = self.rating_counts.get(col, np.zeros(RATING_LEVELS, dtype=np.int64)) + counts
+
+        self.sample.update(df, reason_mask)
+
+        for col in df.columns:
+            if col.startswith("top_feature_") and not col.startswith("top_feature_value_"):
+                counts = self.top_feature_counts.setdefault(col, {})
+                # Categorical columns also report unused categories, with count 0
+                for feature, count in df[col].value_counts().items():
+                    if count:
+                        counts[feature] = counts.get(feature, 0) + int(count)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, reason_mask: np.ndarray = None) -> "ReportAggregates":
+        """
+        Aggregate a whole in-memory dataset in one vectorized pass.
+        """
+        agg = cls()
+        agg.update(df, reason_mask)
+        return agg
+
+    def merge(self, other: "ReportAggregates") -> "ReportAggregates":
+        """
+        Fold another aggregate (from another chunk, shard or day) into this one.
+        """
+        if len(other.reason_mask_counts) != len(self.reason_mask_counts):
+            raise ValueError("Aggregates were built with different rule sets and cannot be merged")
+        self.rows += other.rows
+        self.score_hist += other.score_hist
+        self.prediction_counts += other.prediction_counts
+        self.reason_mask_counts += other.reason_mask_counts
+        for col, counts in other.top_feature_counts.items():
+            mine = self.top_feature_counts.setdefault(col, {})
+            for feature, count in counts.items():
+                mine[feature] = mine.get(feature, 0) + count
+        _add_groups(self.daily, other.daily)
+        _add_groups(self.merchant_category, other.merchant_category)
+        for col, counts in other.rating_counts.items():
+            self.rating_counts[col] = self.rating_counts.get(col, np.zeros(RATING_LEVELS, dtype=np.int64)) + counts
+        self.sample.merge(other.sample)
+        return self
+
+    def __add__(self, other: "ReportAggregates") -> "ReportAggregates":
+        return copy.deepcopy(self).merge(other)
+
+    # -----------------------------
+    # Derived views
+    # -----------------------------
+    def factor_counts(self) -> dict:
+        """
+        Rows flagged by each individual rule (a row can count towards several).
+        """
+        masks = np.arange(len(self.reason_mask_counts))
+        return {
+            REASON_LABELS[key]: int(self.reason_mask_counts[(masks >> bit) & 1 == 1].sum())
+            for bit, key in enumerate(REASON_KEYS)
+        }
+
+    def combination_counts(self) -> dict:
+        """
+        Rows per exact combination of rules (the old comma-joined label view).
+        """
+        return {
+            ", ".join(REASON_LABELS[k] for k in reason_keys_from_mask(mask)) or NO_REASON_LABEL: int(count)
+            for mask, count in enumerate(self.reason_mask_counts) if count
+        }
+
+    def cooccurrence(self) -> pd.DataFrame:
+        """
+        Rows flagged by both rule i and rule j (diagonal = per-rule counts),
+        derived exactly from the bitmask counts.
+        """
+        masks = np.arange(len(self.reason_mask_counts))
+        bits = np.stack([(masks >> bit) & 1 for bit in range(len(REASON_KEYS))])   # (rules, masks)
+        matrix = (bits * self.reason_mask_counts) @ bits.T
+        labels = [REASON_LABELS[k] for k in REASON_KEYS]
+        return pd.DataFrame(matrix, index=labels, columns=labels)
+
+    @staticmethod
+    def _group_frame(groups: dict, index_name: str) -> pd.DataFrame:
+        frame = pd.DataFrame.from_dict(
+            {k: np.asarray(v) for k, v in groups.items()}, orient="index", columns=GROUP_FIELDS
+        ).sort_index()
+        frame.index.name = index_name
+        count_cols = [c for c in GROUP_FIELDS if c != "score_sum"]
+        frame[count_cols] = frame[count_cols].round().astype(np.int64)
+        frame["avg_score"] = frame["score_sum"] / frame["rows"].where(frame["rows"] > 0)
+        frame["fraud_rate"] = frame["predicted_fraud"] / frame["rows"].where(frame["rows"] > 0)
+        return frame
+
+    def daily_frame(self) -> pd.DataFrame:
+        """Per-day totals, rates and per-rule counts."""
+        return self._group_frame(self.daily, "day")
+
+    def monthly_frame(self) -> pd.DataFrame:
+        """Per-day breakdown rolled up to months."""
+        daily = self.daily_frame()
+        sums = daily[GROUP_FIELDS].groupby(daily.index.str[:7]).sum()
+        return self._group_frame({k: row.to_numpy() for k, row in sums.iterrows()}, "month")
+
+    def merchant_category_frame(self) -> pd.DataFrame:
+        """Per-merchant-category totals, rates and per-rule counts."""
+        return self._group_frame(self.merchant_category, "merchant_category")
+
+    def feedback_summary(self) -> dict:
+        """
+        Same metrics as summarize_feedback, from the rating counts.
+        """
+        metrics = {}
+        levels = np.arange(RATING_LEVELS)
+        for col, counts in self.rating_counts.items():
+            total = counts.sum()
+            metrics[f"{col}_avg"] = float((counts * levels).sum() / total) if total else np.nan
+            metrics[f"{col}_>=4_pct"] = float(counts[4:].sum() / total * 100) if total else np.nan
+        return metrics
+
+    # -----------------------------
+    # Persistence
+    # -----------------------------
+    def to_dict(self) -> dict:
+        return {
+            "rows": self.rows,
+            "score_bin_edges": SCORE_BIN_EDGES.tolist(),
+            "score_hist": self.score_hist.tolist(),
+            "prediction_counts": self.prediction_counts.tolist(),
+            "reason_keys": REASON_KEYS,
+            "reason_mask_counts": self.reason_mask_counts.tolist(),
+            "top_feature_counts": self.top_feature_counts,
+            "group_fields": GROUP_FIELDS,
+            "daily": {k: np.asarray(v).tolist() for k, v in sorted(self.daily.items())},
+            "merchant_category": {k: np.asarray(v).tolist() for k, v in sorted(self.merchant_category.items())},
+            "rating_counts": {k: v.tolist() for k, v in self.rating_counts.items()},
+            "sample_size": self.sample.size,
+            "sample": self.sample.to_records(),
+        }
+
+    @classmethod
+    def from_dict(cls, payload: dict) -> "ReportAggregates":
+        if payload.get("reason_keys", REASON_KEYS) != REASON_KEYS or \
+                payload.get("score_bin_edges", SCORE_BIN_EDGES.tolist()) != SCORE_BIN_EDGES.tolist():
+            raise ValueError("Aggregates file uses different rules or score bins than this version")
+        agg = cls()
+        agg.rows = payload["rows"]
+        agg.score_hist = np.asarray(payload["score_hist"], dtype=np.int64)
+        agg.prediction_counts = np.asarray(payload["prediction_counts"], dtype=np.int64)
+        agg.reason_mask_counts = np.asarray(payload["reason_mask_counts"], dtype=np.int64)
+        agg.top_feature_counts = payload["top_feature_counts"]
+        # Files written before the breakdowns were added simply have none
+        agg.daily = {k: np.asarray(v, dtype=np.float64) for k, v in payload.get("daily", {}).items()}
+        agg.merchant_category = {k: np.asarray(v, dtype=np.float64) for k, v in payload.get("merchant_category", {}).items()}
+        agg.rating_counts = {k: np.asarray(v, dtype=np.int64) for k, v in payload.get("rating_counts", {}).items()}
+        agg.sample = TransactionSample.from_records(payload.get("sample", []), payload.get("sample_size", SAMPLE_SIZE))
+        return agg
+
+    def save(self, path: str = AGGREGATES_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        print(f"Report aggregates saved at {path}")
+
+    @classmethod
+    def load(cls, path: str = AGGREGATES_PATH) -> "ReportAggregates":
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+def merge_aggregate_files(paths: list) -> ReportAggregates:
+    """
+    Merge saved aggregate files (chunks, shards, days) into one.
+    """
+    merged = ReportAggregates()
+    for path in paths:
+        merged.merge(ReportAggregates.load(path))
+    return merged
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Merge and render report aggregates.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    merge_cmd = sub.add_parser("merge", help="Merge aggregate files into one")
+    merge_cmd.add_argument("paths", nargs="+")
+    merge_cmd.add_argument("--output", required=True)
+    merge_cmd.add_argument("--report-dir", default=None, help="Also render the merged reports here")
+    render_cmd = sub.add_parser("render", help="Render reports from aggregate files (merged first if several)")
+    render_cmd.add_argument("paths", nargs="+")
+    render_cmd.add_argument("--report-dir", default="reports")
+    args = parser.parse_args()
+
+    aggregates = merge_aggregate_files(args.paths)
+    print(f"{len(args.paths)} aggregate files, {aggregates.rows:,} rows")
+    if args.command == "merge":
+        aggregates.save(args.output)
+    if args.report_dir:
+        from src.data_process.vizualization_reporting import render_reports
+        render_reports(aggregates, args.report_dir)
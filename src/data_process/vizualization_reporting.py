@@ -1,101 +1,246 @@
 # src/data_process/vizualization_reporting.py
 
 import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 import seaborn as sns
 
+from src.data_process.report_aggregates import ReportAggregates, SCORE_BIN_EDGES
+
 # -----------------------------
 # Create directories for saving reports
 # -----------------------------
 REPORT_DIR = os.path.join(os.getcwd(), "reports")
 os.makedirs(REPORT_DIR, exist_ok=True)
 
+# Plots are cheap once aggregated; a few processes are enough
+DEFAULT_RENDER_WORKERS = min(4, os.cpu_count() or 1)
+
+
+# -----------------------------
+# Renderers (take aggregated counts only, never rows)
+# -----------------------------
+# Each plot is drawn on its own matplotlib Figure rather than through pyplot,
+# so rendering needs no GUI backend and keeps no global figure state, whether
+# it runs in a worker process or inline on a pipeline stage thread.
+def _save(fig: Figure, output_path: str, tight: bool = True) -> str:
+    if tight:
+        fig.tight_layout()
+    fig.savefig(output_path)
+    return output_path
+
+
+def render_fraud_score_distribution(bin_edges, counts, output_dir: str = REPORT_DIR):
+    bin_edges, counts = np.asarray(bin_edges), np.asarray(counts)
+    centers = (bin_edges[:-1] + bin_edges[1:]) / 2
+    widths = np.diff(bin_edges)
+
+    fig = Figure(figsize=(8,5))
+    ax = fig.subplots()
+    ax.bar(centers, counts, width=widths, color="skyblue", edgecolor="white")
+    # Smoothed outline over the bins (stands in for the per-row KDE)
+    smooth = np.convolve(np.pad(counts, 1, mode="edge"), [0.25, 0.5, 0.25], mode="valid")
+    ax.plot(centers, smooth, color="steelblue")
+    ax.set_title("Fraud Score Distribution")
+    ax.set_xlabel("Fraud Score")
+    ax.set_ylabel("Count")
+    output_path = _save(fig, os.path.join(output_dir, "fraud_score_distribution.png"), tight=False)
+    print(f"Saved fraud score distribution plot: {output_path}")
+    return output_path
+
+
+def render_fraud_prediction_counts(counts, output_dir: str = REPORT_DIR):
+    fig = Figure(figsize=(6,4))
+    ax = fig.subplots()
+    labels = ["0", "1"]
+    sns.barplot(x=labels, y=list(counts), hue=labels, palette="Set2", legend=False, ax=ax)
+    ax.set_title("Fraud Prediction Counts")
+    ax.set_xlabel("Fraud Prediction (0=Non-Fraud, 1=Fraud)")
+    ax.set_ylabel("Count")
+    output_path = _save(fig, os.path.join(output_dir, "fraud_prediction_counts.png"), tight=False)
+    print(f"Saved fraud prediction counts plot: {output_path}")
+    return output_path
+
+
+def render_rule_based_factors(factor_counts: dict, output_dir: str = REPORT_DIR):
+    factor_counts = pd.Series(factor_counts, dtype="int64").sort_values(ascending=False)
+    fig = Figure(figsize=(10,6))
+    ax = fig.subplots()
+    sns.barplot(x=factor_counts.values, y=factor_counts.index, hue=factor_counts.index, palette="viridis",
+                legend=False, ax=ax)
+    ax.set_title("Rule-Based Factors Frequency")
+    ax.set_xlabel("Count")
+    ax.set_ylabel("Rule-Based Factors")
+    output_path = _save(fig, os.path.join(output_dir, "rule_based_factors.png"))
+    print(f"Saved rule-based factors plot: {output_path}")
+    return output_path
+
+
+def render_factor_cooccurrence(labels: list, matrix: list, output_dir: str = REPORT_DIR):
+    fig = Figure(figsize=(9,7))
+    ax = fig.subplots()
+    sns.heatmap(pd.DataFrame(matrix, index=labels, columns=labels), annot=True, fmt="d", cmap="rocket_r", ax=ax)
+    ax.set_title("Rule-Based Factor Co-occurrence")
+    output_path = _save(fig, os.path.join(output_dir, "rule_factor_cooccurrence.png"))
+    print(f"Saved rule factor co-occurrence plot: {output_path}")
+    return output_path
+
+
+def render_group_breakdown(name: str, title: str, groups: list, rows: list, fraud_rate: list,
+                           output_dir: str = REPORT_DIR):
+    fig = Figure(figsize=(10,5))
+    ax = fig.subplots()
+    ax.bar(groups, rows, color="lightsteelblue")
+    ax.set_ylabel("Transactions")
+    ax.tick_params(axis="x", rotation=45)
+    rate_ax = ax.twinx()
+    rate_ax.plot(groups, fraud_rate, color="crimson", marker="o")
+    rate_ax.set_ylabel("Predicted fraud rate")
+    ax.set_title(title)
+    output_path = _save(fig, os.path.join(output_dir, f"{name}.png"))
+    print(f"Saved {title.lower()} plot: {output_path}")
+    return output_path
+
+
+def render_top_shap_feature(col: str, feature_counts: dict, output_dir: str = REPORT_DIR):
+    feature_counts = pd.Series(feature_counts, dtype="int64").sort_values(ascending=False)
+    fig = Figure(figsize=(8,4))
+    ax = fig.subplots()
+    sns.barplot(x=feature_counts.index, y=feature_counts.values, hue=feature_counts.index, palette="magma",
+                legend=False, ax=ax)
+    ax.set_title(f"Top SHAP Feature: {col}")
+    ax.set_xlabel(col)
+    ax.set_ylabel("Count")
+    ax.tick_params(axis="x", labelrotation=30)
+    for label in ax.get_xticklabels():
+        label.set_horizontalalignment("right")
+    output_path = _save(fig, os.path.join(output_dir, f"{col}_distribution.png"))
+    print(f"Saved SHAP feature plot: {output_path}")
+    return output_path
+
+
+def report_jobs(aggregates: ReportAggregates, output_dir: str = REPORT_DIR) -> list:
+    """
+    One (renderer, kwargs) job per plot. Payloads are small count tables,
+    so shipping them to worker processes costs nothing.
+    """
+    jobs = []
+    if aggregates.score_hist.any():
+        jobs.append((render_fraud_score_distribution,
+                     {"bin_edges": SCORE_BIN_EDGES.tolist(), "counts": aggregates.score_hist.tolist()}))
+    if aggregates.prediction_counts.any():
+        jobs.append((render_fraud_prediction_counts, {"counts": aggregates.prediction_counts.tolist()}))
+    if aggregates.rows:
+        jobs.append((render_rule_based_factors, {"factor_counts": aggregates.factor_counts()}))
+        cooccurrence = aggregates.cooccurrence()
+        jobs.append((render_factor_cooccurrence,
+                     {"labels": list(cooccurrence.index), "matrix": cooccurrence.to_numpy().tolist()}))
+    for name, title, frame in (
+        ("daily_breakdown", "Daily Volume and Fraud Rate", aggregates.daily_frame() if aggregates.daily else None),
+        ("merchant_category_breakdown", "Merchant Category Volume and Fraud Rate",
+         aggregates.merchant_category_frame() if aggregates.merchant_category else None),
+    ):
+        if frame is not None:
+            jobs.append((render_group_breakdown, {
+                "name": name, "title": title, "groups": [str(g) for g in frame.index],
+                "rows": frame["rows"].tolist(), "fraud_rate": frame["fraud_rate"].fillna(0).tolist(),
+            }))
+    for col in sorted(aggregates.top_feature_counts):
+        jobs.append((render_top_shap_feature, {"col": col, "feature_counts": aggregates.top_feature_counts[col]}))
+    for _, kwargs in jobs:
+        kwargs["output_dir"] = output_dir
+    return jobs
+
+
+def _run_job(job):
+    func, kwargs = job
+    return func(**kwargs)
+
+
+def render_reports(aggregates: ReportAggregates, report_dir: str = REPORT_DIR, max_workers: int = None) -> list:
+    """
+    Render every report plot from aggregates, in parallel worker processes.
+    Time depends on the number of plots, not the number of rows.
+
+    Returns:
+        list: Paths of the rendered plots
+    """
+    os.makedirs(report_dir, exist_ok=True)
+    jobs = report_jobs(aggregates, report_dir)
+    max_workers = min(max_workers or DEFAULT_RENDER_WORKERS, len(jobs))
+    if max_workers <= 1:
+        return [_run_job(job) for job in jobs]
+
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return list(pool.map(_run_job, jobs))
+
 # -----------------------------
 # Plot fraud score distribution
 # -----------------------------
-def plot_fraud_score_distribution(df: pd.DataFrame):
+def plot_fraud_score_distribution(df: pd.DataFrame, output_dir: str = REPORT_DIR):
     if "fraud_score" not in df.columns:
         print("Warning: 'fraud_score' column not found. Skipping plot.")
         return
 
-    plt.figure(figsize=(8,5))
-    sns.histplot(df["fraud_score"], bins=20, kde=True, color="skyblue")
-    plt.title("Fraud Score Distribution")
-    plt.xlabel("Fraud Score")
-    plt.ylabel("Count")
-    output_path = os.path.join(REPORT_DIR, "fraud_score_distribution.png")
-    plt.savefig(output_path)
-    plt.close()
-    print(f"Saved fraud score distribution plot: {output_path}")
+    scores = np.clip(df["fraud_score"].to_numpy(dtype=np.float64), 0.0, 1.0)
+    counts, _ = np.histogram(scores, bins=SCORE_BIN_EDGES)
+    render_fraud_score_distribution(SCORE_BIN_EDGES, counts, output_dir)
 
 # -----------------------------
 # Plot fraud prediction counts
 # -----------------------------
-def plot_fraud_prediction_counts(df: pd.DataFrame):
+def plot_fraud_prediction_counts(df: pd.DataFrame, output_dir: str = REPORT_DIR):
     if "fraud_prediction" not in df.columns:
         print("Warning: 'fraud_prediction' column not found. Skipping plot.")
         return
 
-    plt.figure(figsize=(6,4))
-    sns.countplot(x="fraud_prediction", data=df, palette="Set2")
-    plt.title("Fraud Prediction Counts")
-    plt.xlabel("Fraud Prediction (0=Non-Fraud, 1=Fraud)")
-    plt.ylabel("Count")
-    output_path = os.path.join(REPORT_DIR, "fraud_prediction_counts.png")
-    plt.savefig(output_path)
-    plt.close()
-    print(f"Saved fraud prediction counts plot: {output_path}")
+    counts = np.bincount(df["fraud_prediction"].to_numpy(dtype=np.int64), minlength=2)[:2]
+    render_fraud_prediction_counts(counts.tolist(), output_dir)
 
 # -----------------------------
 # Plot rule-based factors
 # -----------------------------
-def plot_rule_based_factors(df: pd.DataFrame):
+def plot_rule_based_factors(df: pd.DataFrame, output_dir: str = REPORT_DIR):
     if "rule_based_factors" not in df.columns:
         print("Warning: 'rule_based_factors' column not found. Skipping plot.")
         return
 
-    factor_counts = df["rule_based_factors"].value_counts().sort_values(ascending=False)
-    plt.figure(figsize=(10,6))
-    sns.barplot(x=factor_counts.values, y=factor_counts.index, palette="viridis")
-    plt.title("Rule-Based Factors Frequency")
-    plt.xlabel("Count")
-    plt.ylabel("Rule-Based Factors")
-    output_path = os.path.join(REPORT_DIR, "rule_based_factors.png")
-    plt.savefig(output_path)
-    plt.close()
-    print(f"Saved rule-based factors plot: {output_path}")
+    # One bar per rule (a transaction counts towards every rule it triggered)
+    aggregates = ReportAggregates.from_frame(df[["rule_based_factors"]])
+    render_rule_based_factors(aggregates.factor_counts(), output_dir)
 
 # -----------------------------
 # Plot SHAP top features if available
 # -----------------------------
-def plot_top_shap_features(df: pd.DataFrame):
-    shap_cols = [c for c in df.columns if "top_feature" in c]
+def plot_top_shap_features(df: pd.DataFrame, output_dir: str = REPORT_DIR):
+    # Feature-name columns only; top_feature_value_i columns are continuous
+    shap_cols = [c for c in df.columns if c.startswith("top_feature_") and not c.startswith("top_feature_value_")]
     if not shap_cols:
         print("Warning: No SHAP top feature columns found. Skipping plot.")
         return
 
     for col in shap_cols:
-        plt.figure(figsize=(8,4))
-        sns.countplot(x=col, data=df, palette="magma")
-        plt.title(f"Top SHAP Feature: {col}")
-        plt.xlabel(col)
-        plt.ylabel("Count")
-        output_path = os.path.join(REPORT_DIR, f"{col}_distribution.png")
-        plt.savefig(output_path)
-        plt.close()
-        print(f"Saved SHAP feature plot: {output_path}")
+        render_top_shap_feature(col, df[col].value_counts().to_dict(), output_dir)
 
 # -----------------------------
 # Main reporting function
 # -----------------------------
-def generate_reports(df: pd.DataFrame, shap_values=None):
+def generate_reports(df: pd.DataFrame = None, shap_values=None, report_dir: str = REPORT_DIR,
+                     aggregates: ReportAggregates = None, max_workers: int = None):
+    """
+    Aggregate the dataset in one vectorized pass (or reuse precomputed
+    aggregates, e.g. from the chunked or sharded runs) and render the plots
+    in parallel. Returns the paths of the rendered plots.
+    """
     print("Generating reports...")
-    plot_fraud_score_distribution(df)
-    plot_fraud_prediction_counts(df)
-    plot_rule_based_factors(df)
-    plot_top_shap_features(df)
+    if aggregates is None:
+        aggregates = ReportAggregates.from_frame(df)
+    paths = render_reports(aggregates, report_dir, max_workers)
     print("All reports generated.")
+    return paths
 
 # -----------------------------
 # Standalone test
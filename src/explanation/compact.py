@@ -0,0 +1,481 @@
+# src/explanation/compact.py
+"""
+Compact columnar store for the explanation outputs.
+
+Per-row strings dominate the memory and size of large runs: every row
+carries a comma-joined rule label, up to top_n feature names and an
+explanation that is one of a few fixed messages for most rows. The store
+keeps codes instead and produces strings only on export:
+
+    reason_mask         uint16 rule bitmask (bit i = rules.REASON_KEYS[i])
+    top_feature_idx     (rows, top_n) int16 index into feature_names, -1 = none
+    top_feature_value   (rows, top_n) float32 SHAP value
+    explanation_ref     int32 reference into a deduplicated text table, -1 = none
+
+Usage:
+    python -m src.explanation.compact info data/processed/compact
+    python -m src.explanation.compact export data/processed/compact --output explained.csv
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import argparse
+import numpy as np
+import pandas as pd
+
+from src.explanation.rules import reason_label_categorical, reason_mask_from_labels
+
+# -----------------------------
+# Store layout
+# -----------------------------
+# <store_dir>/
+#   meta.json              feature names, top_n, row and text counts, id width
+#   ids.bin                (n_rows,) transaction ids, fixed-width bytes
+#   reason_mask.u16        (n_rows,) rule bitmask
+#   explanation_ref.i32    (n_rows,) row in the text table
+#   top_feature_idx.i16    (n_rows, top_n) feature index, row-major
+#   top_feature_value.f32  (n_rows, top_n) SHAP value, row-major
+#   texts.bin              distinct explanation texts, UTF-8, concatenated
+#   text_offsets.i64       (n_texts + 1,) byte offsets into texts.bin
+COMPACT_DIR = os.path.join("data", "processed", "compact")
+DEFAULT_ID_WIDTH = 32
+DEFAULT_CHUNK_ROWS = 1_000_000
+
+# Columns that only exist in compact frames, dropped from readable exports
+COMPACT_ONLY_COLUMNS = ["reason_mask"]
+
+_ROW_FILES = {
+    "reason_mask.u16": np.uint16,
+    "explanation_ref.i32": np.int32,
+    "top_feature_idx.i16": np.int16,
+    "top_feature_value.f32": np.float32,
+}
+
+
+class TextTable:
+    """
+    Read-only view of a store's text table. texts.bin is memory-mapped and
+    a text is decoded only when a reference to it is read, so opening a
+    store does not load its texts into memory.
+    """
+
+    def __init__(self, store_dir: str):
+        self.offsets = np.fromfile(os.path.join(store_dir, "text_offsets.i64"), dtype=np.int64)
+        texts_path = os.path.join(store_dir, "texts.bin")
+        self._blob = np.memmap(texts_path, dtype=np.uint8, mode="r") if os.path.getsize(texts_path) else \
+            np.zeros(0, dtype=np.uint8)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, ref: int) -> str:
+        return self._blob[self.offsets[ref]:self.offsets[ref + 1]].tobytes().decode("utf-8")
+
+    def __iter__(self):
+        return (self[ref] for ref in range(len(self)))
+
+    def categorical(self, refs: np.ndarray) -> pd.Categorical:
+        """
+        Strings for these references as a Categorical (no per-row copies);
+        only the texts the references use are decoded. -1 becomes missing.
+        """
+        refs = np.asarray(refs, dtype=np.int32)
+        used = np.unique(refs[refs >= 0])
+        codes = np.where(refs >= 0, np.searchsorted(used, refs), -1)
+        return pd.Categorical.from_codes(codes, categories=[self[ref] for ref in used])
+
+
+class TextTableWriter:
+    """
+    Builds a text table on disk (TextTable reads it). Each new text is
+    appended to texts.bin (and its end offset to text_offsets.i64) as soon as
+    it is interned; only a 16-byte digest per distinct text is kept to
+    deduplicate, so memory does not hold the texts themselves.
+
+    With extend=True the store's existing table is copied first and new texts
+    are appended after it, so existing references stay valid. A suffix writes
+    to side files (e.g. "texts.bin.tmp") that the caller renames into place.
+    """
+
+    def __init__(self, store_dir: str, extend: bool = False, suffix: str = ""):
+        self.texts_path = os.path.join(store_dir, "texts.bin" + suffix)
+        self.offsets_path = os.path.join(store_dir, "text_offsets.i64" + suffix)
+        self._refs = {}
+        self._end = 0
+        self._n_texts = 0
+        if extend:
+            if suffix:
+                shutil.copyfile(os.path.join(store_dir, "texts.bin"), self.texts_path)
+                shutil.copyfile(os.path.join(store_dir, "text_offsets.i64"), self.offsets_path)
+            self._index_existing()
+        self._texts = open(self.texts_path, "ab" if extend else "wb")
+        self._offsets = open(self.offsets_path, "ab" if extend else "wb")
+        if not extend:
+            self._offsets.write(np.int64(0).tobytes())
+
+    def _index_existing(self):
+        offsets = np.fromfile(self.offsets_path, dtype=np.int64)
+        with open(self.texts_path, "rb") as f:
+            for ref, size in enumerate(np.diff(offsets)):
+                self._refs.setdefault(_digest(f.read(int(size))), ref)
+        self._n_texts = len(offsets) - 1
+        self._end = int(offsets[-1])
+
+    def __len__(self):
+        return self._n_texts
+
+    def _intern(self, text: str) -> int:
+        data = text.encode("utf-8")
+        key = _digest(data)
+        ref = self._refs.get(key)
+        if ref is None:
+            ref = self._refs[key] = self._n_texts
+            self._texts.write(data)
+            self._end += len(data)
+            self._offsets.write(np.int64(self._end).tobytes())
+            self._n_texts += 1
+        return ref
+
+    def encode(self, values) -> np.ndarray:
+        """
+        References for a column of strings (or a Categorical), writing new
+        texts through to disk; missing values become -1. Each distinct value
+        is hashed into the table once per call.
+        """
+        return _encode(values, self._intern)
+
+    def close(self):
+        self._texts.close()
+        self._offsets.close()
+
+
+def _digest(data: bytes) -> bytes:
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def _encode(values, intern) -> np.ndarray:
+    if isinstance(values, pd.Series):
+        values = values.array
+    if isinstance(values, pd.Categorical):
+        codes, uniques = values.codes, values.categories
+    else:
+        codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+    mapping = np.fromiter((intern(str(u)) for u in uniques), dtype=np.int32, count=len(uniques))
+    refs = np.full(len(codes), -1, dtype=np.int32)
+    present = codes >= 0
+    refs[present] = mapping[codes[present]]
+    return refs
+
+
+def _id_bytes(transaction_ids) -> np.ndarray:
+    """Transaction ids as UTF-8 bytes at their natural (longest-id) width."""
+    ids = np.asarray(transaction_ids, dtype=object).astype(str)
+    try:
+        return ids.astype(bytes)
+    except UnicodeEncodeError:
+        return np.asarray([t.encode("utf-8") for t in ids], dtype=bytes)
+
+
+def id_width_for(transaction_ids, minimum: int = DEFAULT_ID_WIDTH) -> int:
+    """Fixed id width that fits every id (at least minimum), for one-shot stores."""
+    return max(minimum, _id_bytes(transaction_ids).dtype.itemsize)
+
+
+def encode_ids(transaction_ids, id_width: int) -> np.ndarray:
+    """
+    Transaction ids as fixed-width bytes for a store's ids files. Raises
+    ValueError rather than truncating an id longer than id_width (truncated
+    ids collide and make lookups return the wrong row).
+    """
+    ids = _id_bytes(transaction_ids)
+    if ids.dtype.itemsize > id_width:
+        longest = ids[np.argmax(np.char.str_len(ids))].decode("utf-8")
+        raise ValueError(f"transaction_id {longest!r} is {ids.dtype.itemsize} bytes, longer than the store's "
+                         f"id_width of {id_width}; create the store with a larger id_width")
+    return ids.astype(f"S{id_width}")
+
+
+def fits_id_width(transaction_id, id_width: int) -> bool:
+    """False for ids a store of this width cannot contain (lookups must not truncate them)."""
+    return len(str(transaction_id).encode("utf-8")) <= id_width
+
+
+def readable_columns(df: pd.DataFrame) -> list:
+    """Columns of a compact frame that belong in a human-readable export."""
+    return [c for c in df.columns if c not in COMPACT_ONLY_COLUMNS]
+
+
+def _top_feature_columns(df: pd.DataFrame, feature_names: list, top_n: int):
+    """int16 feature indices and float32 values from top_feature_i / top_feature_value_i columns."""
+    idx = np.full((len(df), top_n), -1, dtype=np.int16)
+    values = np.full((len(df), top_n), np.nan, dtype=np.float32)
+    for i in range(top_n):
+        name_col, value_col = f"top_feature_{i + 1}", f"top_feature_value_{i + 1}"
+        if name_col in df.columns:
+            idx[:, i] = pd.Categorical(df[name_col], categories=feature_names).codes
+        if value_col in df.columns:
+            values[:, i] = df[value_col].to_numpy(dtype=np.float32)
+    return idx, values
+
+
+# -----------------------------
+# Writer (supports chunked appends)
+# -----------------------------
+class CompactStoreWriter:
+    """
+    Append explained batches to a compact store. Rows and new texts go
+    straight to disk; only a digest per distinct explanation stays in memory.
+    """
+
+    def __init__(self, store_dir: str, feature_names: list = (), top_n: int = 0, id_width: int = DEFAULT_ID_WIDTH):
+        self.store_dir = store_dir
+        self.feature_names = [str(f) for f in feature_names]
+        self.top_n = top_n if self.feature_names else 0
+        self.id_width = id_width
+        self.n_rows = 0
+        os.makedirs(store_dir, exist_ok=True)
+        self.texts = TextTableWriter(store_dir)
+        self._files = {name: open(os.path.join(store_dir, name), "wb") for name in ["ids.bin"] + list(_ROW_FILES)}
+
+    def append(self, df: pd.DataFrame, reason_mask: np.ndarray = None):
+        """
+        Append one batch.
+
+        Args:
+            df (pd.DataFrame): Explained rows: transaction_id, explanation and
+                top_feature_i / top_feature_value_i (strings or Categoricals)
+            reason_mask (np.ndarray): Rule bitmask for the rows; taken from a
+                reason_mask column, or parsed from rule_based_factors, when omitted
+        """
+        if reason_mask is None:
+            reason_mask = df["reason_mask"] if "reason_mask" in df.columns else \
+                reason_mask_from_labels(df["rule_based_factors"])
+        reason_mask = np.asarray(reason_mask, dtype=np.uint16)
+        if len(reason_mask) != len(df):
+            raise ValueError("reason_mask must align with the batch rows")
+
+        ids = encode_ids(df["transaction_id"], self.id_width)
+        ids.tofile(self._files["ids.bin"])
+        reason_mask.tofile(self._files["reason_mask.u16"])
+        if "explanation" in df.columns:
+            refs = self.texts.encode(df["explanation"])
+        else:
+            refs = np.full(len(df), -1, dtype=np.int32)
+        refs.tofile(self._files["explanation_ref.i32"])
+        idx, values = _top_feature_columns(df, self.feature_names, self.top_n)
+        idx.tofile(self._files["top_feature_idx.i16"])
+        values.tofile(self._files["top_feature_value.f32"])
+        self.n_rows += len(df)
+
+    def close(self):
+        """Flush row and text files and write the metadata."""
+        for f in self._files.values():
+            f.close()
+        self.texts.close()
+        _write_meta(self.store_dir, {
+            "n_rows": self.n_rows,
+            "feature_names": self.feature_names,
+            "top_n": self.top_n,
+            "id_width": self.id_width,
+            "n_texts": len(self.texts),
+        })
+        print(f"Compact store written at {self.store_dir} ({self.n_rows} rows, {len(self.texts)} distinct explanations)")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def _write_meta(store_dir: str, meta: dict):
+    path = os.path.join(store_dir, "meta.json")
+    with open(path + ".tmp", "w") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def write_compact_store(df: pd.DataFrame, store_dir: str = COMPACT_DIR, feature_names: list = (), top_n: int = 0,
+                        reason_mask: np.ndarray = None) -> str:
+    """Persist a whole explained frame in one call, sized to its longest transaction id."""
+    id_width = id_width_for(df["transaction_id"])
+    with CompactStoreWriter(store_dir, feature_names, top_n, id_width=id_width) as writer:
+        writer.append(df, reason_mask)
+    return store_dir
+
+
+def merge_compact_stores(store_dirs: list, out_dir: str, block_rows: int = DEFAULT_CHUNK_ROWS) -> str:
+    """
+    Concatenate several compact stores (e.g. one per shard) in the given order.
+    Text tables are merged and each store's references remapped block by
+    block, so memory does not grow with the row count.
+    """
+    stores = [CompactStore(d) for d in store_dirs]
+    if not stores:
+        raise ValueError("No compact stores to merge")
+    first = stores[0].meta
+    for store in stores[1:]:
+        if any(store.meta[k] != first[k] for k in ("feature_names", "top_n", "id_width")):
+            raise ValueError("Compact stores have different feature schemas and cannot be merged")
+
+    os.makedirs(out_dir, exist_ok=True)
+    texts = TextTableWriter(out_dir)
+    outputs = {name: open(os.path.join(out_dir, name), "wb") for name in ["ids.bin"] + list(_ROW_FILES)}
+    try:
+        for store in stores:
+            for name in ["ids.bin", "reason_mask.u16", "top_feature_idx.i16", "top_feature_value.f32"]:
+                with open(os.path.join(store.store_dir, name), "rb") as src:
+                    shutil.copyfileobj(src, outputs[name], length=1 << 22)
+            # -1 (no explanation) maps to the appended -1 slot
+            mapping = np.fromiter((texts._intern(text) for text in store.texts), dtype=np.int32, count=len(store.texts))
+            mapping = np.append(mapping, np.int32(-1))
+            for start in range(0, len(store), block_rows):
+                mapping[store.explanation_ref[start:start + block_rows]].tofile(outputs["explanation_ref.i32"])
+    finally:
+        for f in outputs.values():
+            f.close()
+        texts.close()
+
+    n_rows = sum(len(s) for s in stores)
+    _write_meta(out_dir, dict(first, n_rows=n_rows, n_texts=len(texts)))
+    print(f"Compact store merged at {out_dir} ({n_rows} rows from {len(stores)} stores)")
+    return out_dir
+
+
+def update_explanations(store_dir: str, updates: dict, block_rows: int = DEFAULT_CHUNK_ROWS) -> int:
+    """
+    Point the given transactions at new explanation texts (e.g. after
+    feedback-driven regeneration). The text table and reference column are
+    written to temporary files and renamed over the originals, texts first,
+    so a reader or a crash never sees references to texts that are not there.
+    Superseded texts stay in the table.
+
+    Returns:
+        int: Number of rows updated
+    """
+    store = CompactStore(store_dir)
+    # Ids longer than the store's width cannot be in it
+    updates = {k: v for k, v in updates.items() if fits_id_width(k, store.meta["id_width"])}
+    if not updates or not len(store):
+        return 0
+    texts = TextTableWriter(store_dir, extend=True, suffix=".tmp")
+    try:
+        update_ids = encode_ids(list(updates), store.meta["id_width"])
+        new_refs = texts.encode(list(updates.values()))
+    finally:
+        texts.close()
+    order = np.argsort(update_ids)
+    update_ids, new_refs = update_ids[order], new_refs[order]
+
+    ref_path = os.path.join(store_dir, "explanation_ref.i32")
+    replaced = 0
+    with open(ref_path + ".tmp", "wb") as out:
+        for start in range(0, len(store), block_rows):
+            ids = store.ids[start:start + block_rows]
+            refs = np.array(store.explanation_ref[start:start + block_rows])
+            pos = np.minimum(np.searchsorted(update_ids, ids), len(update_ids) - 1)
+            hit = update_ids[pos] == ids
+            refs[hit] = new_refs[pos[hit]]
+            refs.tofile(out)
+            replaced += int(hit.sum())
+    meta = dict(store.meta, n_texts=len(texts))
+    del store
+
+    os.replace(texts.texts_path, os.path.join(store_dir, "texts.bin"))
+    os.replace(texts.offsets_path, os.path.join(store_dir, "text_offsets.i64"))
+    os.replace(ref_path + ".tmp", ref_path)
+    _write_meta(store_dir, meta)
+    return replaced
+
+
+# -----------------------------
+# Reader (memory-mapped)
+# -----------------------------
+class CompactStore:
+    """
+    Read-only view over a compact store. Row columns are memory-mapped;
+    readable frames are built one slice at a time.
+    """
+
+    def __init__(self, store_dir: str = COMPACT_DIR):
+        with open(os.path.join(store_dir, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.store_dir = store_dir
+        self.feature_names = self.meta["feature_names"]
+        self.top_n = self.meta["top_n"]
+        n_rows = self.meta["n_rows"]
+
+        self.ids = self._map("ids.bin", f"S{self.meta['id_width']}", (n_rows,))
+        self.reason_mask = self._map("reason_mask.u16", np.uint16, (n_rows,))
+        self.explanation_ref = self._map("explanation_ref.i32", np.int32, (n_rows,))
+        self.top_feature_idx = self._map("top_feature_idx.i16", np.int16, (n_rows, self.top_n))
+        self.top_feature_value = self._map("top_feature_value.f32", np.float32, (n_rows, self.top_n))
+        self.texts = TextTable(store_dir)
+
+    def _map(self, name, dtype, shape):
+        if shape[0] == 0 or (len(shape) > 1 and shape[1] == 0):
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(os.path.join(self.store_dir, name), dtype=dtype, mode="r", shape=shape)
+
+    def __len__(self):
+        return self.meta["n_rows"]
+
+    def nbytes(self) -> int:
+        """Size of the store on disk."""
+        return sum(os.path.getsize(os.path.join(self.store_dir, name)) for name in os.listdir(self.store_dir))
+
+    def frame(self, start: int = 0, stop: int = None) -> pd.DataFrame:
+        """
+        Rows [start, stop) with the readable columns as Categoricals over the
+        shared label, feature-name and text tables, plus the raw reason_mask.
+        """
+        rows = slice(start, stop)
+        mask = np.array(self.reason_mask[rows])
+        columns = {
+            "transaction_id": np.char.decode(self.ids[rows], "utf-8").astype(object),
+            "explanation": self.texts.categorical(self.explanation_ref[rows]),
+            "rule_based_factors": reason_label_categorical(mask),
+        }
+        idx = self.top_feature_idx[rows]
+        for i in range(self.top_n):
+            columns[f"top_feature_{i + 1}"] = pd.Categorical.from_codes(idx[:, i], categories=self.feature_names)
+            columns[f"top_feature_value_{i + 1}"] = np.array(self.top_feature_value[rows, i])
+        columns["reason_mask"] = mask
+        return pd.DataFrame(columns)
+
+    def iter_frames(self, chunk_rows: int = DEFAULT_CHUNK_ROWS):
+        for start in range(0, len(self), chunk_rows):
+            yield self.frame(start, start + chunk_rows)
+
+    def export_csv(self, path: str, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> str:
+        """Write the readable columns to CSV, one chunk at a time."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        first = True
+        for chunk in self.iter_frames(chunk_rows):
+            chunk.to_csv(path, mode="w" if first else "a", header=first, index=False, columns=readable_columns(chunk))
+            first = False
+        if first:
+            pd.DataFrame(columns=readable_columns(self.frame(0, 0))).to_csv(path, index=False)
+        return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or export a compact explanation store.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    info = sub.add_parser("info", help="Row, text and size summary")
+    info.add_argument("store_dir", nargs="?", default=COMPACT_DIR)
+    export = sub.add_parser("export", help="Write the readable columns to CSV")
+    export.add_argument("store_dir", nargs="?", default=COMPACT_DIR)
+    export.add_argument("--output", required=True)
+    export.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    args = parser.parse_args()
+
+    store = CompactStore(args.store_dir)
+    if args.command == "info":
+        print(f"{len(store):,} rows, {len(store.texts):,} distinct explanations, "
+              f"top {store.top_n} of {len(store.feature_names)} features, {store.nbytes() / 2**20:.1f} MiB on disk")
+    else:
+        store.export_csv(args.output, args.chunk_rows)
+        print(f"Exported {len(store):,} rows to {args.output}")
@@ -0,0 +1,130 @@
+# src/explanation/explanation_cache.py
+
+import os
+import time
+import sqlite3
+import hashlib
+from contextlib import closing
+
+EXPLANATION_CACHE_DB = os.path.join("data", "cache", "explanations.db")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS explanations (
+    transaction_id TEXT NOT NULL,
+    model TEXT NOT NULL,
+    prompt_hash TEXT NOT NULL,
+    explanation TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (transaction_id, model, prompt_hash)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS regenerations (
+    transaction_id TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    prompt_variant TEXT NOT NULL,
+    regenerated_at REAL NOT NULL,
+    explanation TEXT
+) WITHOUT ROWID;
+"""
+
+
+def prompt_hash(system_message: str, prompt: str) -> str:
+    """Hash of the exact messages sent, so any prompt or data change misses the cache."""
+    return hashlib.sha256(f"{system_message}\x00{prompt}".encode("utf-8")).hexdigest()[:24]
+
+
+class ExplanationCache:
+    """
+    Generated explanations keyed by (transaction_id, model, prompt hash).
+    Re-running the pipeline reuses them instead of calling the LLM again.
+
+    A feedback-driven regeneration is also kept as a per-transaction
+    override: it is the transaction's current explanation, served in place
+    of a generation under any model or prompt until it is regenerated again.
+    """
+
+    def __init__(self, db_path: str = EXPLANATION_CACHE_DB):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(regenerations)")]
+            if "explanation" not in columns:
+                # Caches created before overrides were kept
+                conn.execute("ALTER TABLE regenerations ADD COLUMN explanation TEXT")
+
+    def _connect(self) -> sqlite3.Connection:
+        # One short-lived connection per call, so LLM worker threads can share the cache
+        return sqlite3.connect(self.db_path, timeout=30.0)
+
+    def get(self, transaction_id, model: str, key: str):
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT explanation FROM explanations WHERE transaction_id = ? AND model = ? AND prompt_hash = ?",
+                (str(transaction_id), model, key),
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, transaction_id, model: str, key: str, explanation: str):
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO explanations VALUES (?, ?, ?, ?, ?)",
+                (str(transaction_id), model, key, explanation, time.time()),
+            )
+
+    def recent(self, model: str, limit: int) -> list:
+        """Newest (transaction_id, prompt_hash, explanation) entries for a model, for warming memory caches."""
+        with closing(self._connect()) as conn:
+            return conn.execute(
+                "SELECT transaction_id, prompt_hash, explanation FROM explanations WHERE model = ? "
+                "ORDER BY created_at DESC LIMIT ?", (model, limit),
+            ).fetchall()
+
+    def mark_regenerated(self, transaction_ids, model: str, prompt_variant: str, explanations=None):
+        """
+        Record a feedback-driven regeneration. With explanations (aligned with
+        the ids), they become the transactions' overrides.
+        """
+        now = time.time()
+        texts = explanations if explanations is not None else [None] * len(transaction_ids)
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO regenerations VALUES (?, ?, ?, ?, ?)",
+                [(str(t), model, prompt_variant, now, text) for t, text in zip(transaction_ids, texts)],
+            )
+
+    def _regeneration_column(self, transaction_ids, column: str) -> dict:
+        ids = [str(t) for t in transaction_ids]
+        found = {}
+        with closing(self._connect()) as conn:
+            for start in range(0, len(ids), 500):
+                batch = ids[start:start + 500]
+                found.update(conn.execute(
+                    f"SELECT transaction_id, {column} FROM regenerations "
+                    f"WHERE {column} IS NOT NULL AND transaction_id IN ({', '.join('?' * len(batch))})", batch,
+                ).fetchall())
+        return found
+
+    def regenerated_at(self, transaction_ids) -> dict:
+        """transaction_id -> time of its last feedback-driven regeneration."""
+        return self._regeneration_column(transaction_ids, "regenerated_at")
+
+    def overrides(self, transaction_ids) -> dict:
+        """transaction_id -> regenerated explanation, for the ids that have one."""
+        return self._regeneration_column(transaction_ids, "explanation")
+
+    def overrides_version(self) -> list:
+        """[count, newest regeneration time] of the overrides; changes whenever one is added or replaced."""
+        with closing(self._connect()) as conn:
+            return list(conn.execute(
+                "SELECT COUNT(*), MAX(regenerated_at) FROM regenerations WHERE explanation IS NOT NULL"
+            ).fetchone())
+
+    def recent_overrides(self, limit: int) -> list:
+        """Newest (transaction_id, explanation) overrides, for warming memory caches."""
+        with closing(self._connect()) as conn:
+            return conn.execute(
+                "SELECT transaction_id, explanation FROM regenerations WHERE explanation IS NOT NULL "
+                "ORDER BY regenerated_at DESC LIMIT ?", (limit,),
+            ).fetchall()
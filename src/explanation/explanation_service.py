@@ -0,0 +1,414 @@
+# src/explanation/explanation_service.py
+"""
+Local HTTP service that explains a single transaction on demand.
+
+The payload is validated against FraudModelOutput. The rule engine and
+templates then produce the factor list and a template narrative. The LLM
+narrative is the transaction's regenerated override if it has one, otherwise
+the cached generation, with an in-memory LRU (entries expire after a TTL) in
+front of SQLite. Top SHAP features come from the SHAP store, or from an
+explainer loaded once at startup. The default path makes no network calls,
+so a response takes about a millisecond.
+
+Endpoints:
+    POST /explain              transaction JSON -> explanation JSON
+         ?shap=1               include the top SHAP features
+         ?llm=generate         call the LLM on a cache miss (slow; needs OPENAI_API_KEY)
+    GET  /health               readiness and cache sizes
+
+Usage:
+    python -m src.explanation.explanation_service --port 8080
+    python -m src.explanation.explanation_service --shap-model-path models/fraud.pkl --background-csv data/raw/fraud_model_output.csv
+    curl -s -X POST "localhost:8080/explain?shap=1" -d @transaction.json
+"""
+
+import os
+import json
+import time
+import pickle
+import argparse
+import threading
+from collections import OrderedDict
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+import numpy as np
+import pandas as pd
+from pydantic import ValidationError
+
+from src.config import DEFAULT_MODEL
+from src.metrics import METRICS
+from src.data_loader.schema import FraudModelOutput
+from src.data_loader.load_fraud_output import REQUIRED_COLUMNS, validate_fraud_frame
+from src.explanation.rules import reason_mask_for_record, reason_keys_from_mask, format_reason_label
+from src.explanation.templates import ExplanationTemplates
+from src.explanation.prompts import (
+    SYSTEM_MESSAGE, NORMAL_EXPLANATION, SKIPPED_EXPLANATION, build_openai_prompt,
+)
+from src.explanation.explanation_cache import ExplanationCache, EXPLANATION_CACHE_DB, prompt_hash
+from src.explanation.feature_matrix import ENCODER_PATH
+from src.explanation.shap_cache import SHAP_CACHE_DIR
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+DEFAULT_LRU_SIZE = 100_000
+DEFAULT_LRU_TTL = 300.0          # Seconds before a narrative is re-read, so regenerations show up
+BACKGROUND_ROWS = 1000
+MAX_BODY_BYTES = 1 << 20
+
+
+class InvalidTransaction(ValueError):
+    """Payload failed schema validation; `errors` lists the offending fields."""
+
+    def __init__(self, errors: list):
+        super().__init__(f"{len(errors)} validation error(s)")
+        self.errors = errors
+
+
+class _LRU:
+    """
+    Thread-safe, size-bounded dict that evicts the least recently used entry.
+    Entries expire ttl seconds after they were stored (None keeps them).
+    """
+
+    def __init__(self, max_size: int, ttl: float = None):
+        self.max_size, self.ttl = max_size, ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires is not None and expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl if self.ttl is not None else None)
+            self._data.move_to_end(key)
+            if len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+# -----------------------------
+# Validation
+# -----------------------------
+def validate_transaction(payload: dict) -> dict:
+    """
+    Validate one transaction payload and add the derived flags when the
+    caller did not send them (same definitions as the data generators).
+
+    Returns:
+        dict: Record with the loader's columns, in the loader's order
+    """
+    if not isinstance(payload, dict):
+        raise InvalidTransaction([{"loc": [], "msg": "Expected a JSON object"}])
+    try:
+        validated = FraudModelOutput(**{k: payload[k] for k in REQUIRED_COLUMNS if k in payload})
+    except ValidationError as e:
+        raise InvalidTransaction(json.loads(e.json()))
+
+    record = dict(validated.__dict__)
+    try:
+        record["geo_mismatch"] = int(payload.get(
+            "geo_mismatch", record["transaction_country"] != record["customer_country"]))
+        record["high_velocity_flag"] = int(payload.get("high_velocity_flag", record["velocity_1h"] > 3))
+    except (TypeError, ValueError) as e:
+        raise InvalidTransaction([{"loc": ["geo_mismatch", "high_velocity_flag"], "msg": str(e)}])
+    return record
+
+
+# -----------------------------
+# Service
+# -----------------------------
+class ExplanationService:
+    """
+    Everything needed to explain one transaction, loaded once: explanation
+    cache (warmed into memory), SHAP store and explainer.
+    """
+
+    def __init__(self, llm_model: str = DEFAULT_MODEL, prompt_variant: str = "default",
+                 cache_db: str = EXPLANATION_CACHE_DB, shap_model_path: str = None,
+                 encoder_path: str = ENCODER_PATH, background_csv: str = None,
+                 shap_cache_dir: str = SHAP_CACHE_DIR, shap_store_dir: str = None, top_n: int = 5,
+                 lru_size: int = DEFAULT_LRU_SIZE, lru_ttl: float = DEFAULT_LRU_TTL):
+        """
+        Args:
+            llm_model (str): Model whose cached narratives are served (and used with llm=generate)
+            prompt_variant (str): Prompt variant the narratives were generated with
+            cache_db (str): Explanation cache database; None disables LLM narratives
+            shap_model_path (str): Pickled model for live SHAP; None serves the store only
+            encoder_path (str): Fitted feature encoders (required with shap_model_path)
+            background_csv (str): Transactions for the explainer background (first rows are used)
+            shap_cache_dir (str): Explainer cache; a pipeline-built explainer is reused
+            shap_store_dir (str): Precomputed SHAP store for transactions already processed
+            top_n (int): Top SHAP features returned
+            lru_size (int): In-memory narratives kept (warmed with the newest cache entries)
+            lru_ttl (float): Seconds an in-memory narrative is served before the cache is
+                read again (None: never), which bounds how long a regenerated one stays hidden
+        """
+        self.llm_model, self.prompt_variant, self.top_n = llm_model, prompt_variant, top_n
+        self.cache = ExplanationCache(cache_db) if cache_db else None
+        # transaction_id -> (prompt hash, narrative); the hash is None for regenerated overrides
+        self._narratives = _LRU(lru_size, ttl=lru_ttl)
+        if self.cache is not None:
+            for transaction_id, key, text in reversed(self.cache.recent(llm_model, lru_size)):
+                self._narratives.put(transaction_id, (key, text))
+            # Oldest first so the newest entry per transaction wins; overrides last, as they
+            # replace the generations they superseded
+            for transaction_id, text in reversed(self.cache.recent_overrides(lru_size)):
+                self._narratives.put(transaction_id, (None, text))
+
+        self._shap_store = None
+        if shap_store_dir and os.path.exists(os.path.join(shap_store_dir, "meta.json")):
+            from src.explanation.shap_store import ShapMatrixStore
+            self._shap_store = ShapMatrixStore(shap_store_dir)
+
+        self._explainer, self._builder = None, None
+        self._shap_lock = threading.Lock()
+        if shap_model_path:
+            self._load_explainer(shap_model_path, encoder_path, background_csv, shap_cache_dir)
+
+    def _load_explainer(self, model_path: str, encoder_path: str, background_csv: str, cache_dir: str):
+        from src.explanation.feature_matrix import FeatureMatrixBuilder
+        from src.explanation.shap_cache import load_or_build_explainer
+
+        if not background_csv:
+            raise ValueError("background_csv is required to build the SHAP explainer")
+        with open(model_path, "rb") as f:
+            model = pickle.load(f)
+        self._builder = FeatureMatrixBuilder.load(encoder_path)
+        background = validate_fraud_frame(pd.read_csv(background_csv, nrows=BACKGROUND_ROWS))
+        X = self._builder.transform(background).to_frame()
+        self._explainer, _ = load_or_build_explainer(model, X, cache_dir=cache_dir, model_path=model_path,
+                                                     vocabulary=self._builder.fingerprint)
+        # Pay any lazy initialisation now rather than on the first request
+        self._explainer(X.to_numpy()[:1])
+
+    def info(self) -> dict:
+        return {
+            "llm_model": self.llm_model,
+            "prompt_variant": self.prompt_variant,
+            "narratives_in_memory": len(self._narratives),
+            "shap_store_rows": len(self._shap_store) if self._shap_store is not None else 0,
+            "shap_explainer": self._explainer is not None,
+        }
+
+    def template_narrative(self, record: dict, reason_keys: list) -> str:
+        if not reason_keys:
+            return NORMAL_EXPLANATION
+        return " ".join(ExplanationTemplates.get_template(k, **record) for k in reason_keys)
+
+    def llm_narrative(self, record: dict, generate: bool = False, reason_keys: list = None) -> tuple:
+        """
+        (narrative, source). Resolved as in the batch pipeline: a regenerated
+        override wins, otherwise the narrative cached under the same prompt
+        the pipeline builds.
+        """
+        if int(record["fraud_prediction"]) != 1:
+            return SKIPPED_EXPLANATION, "skipped"
+        row = {k: str(v) for k, v in record.items()}
+        reasons = reason_keys if reason_keys is not None else reason_keys_from_mask(reason_mask_for_record(record))
+        if not reasons:
+            return NORMAL_EXPLANATION, "rules"
+        if self.cache is None:
+            return None, "disabled"
+
+        transaction_id = row["transaction_id"]
+        key = prompt_hash(SYSTEM_MESSAGE, build_openai_prompt(row, reasons, self.prompt_variant))
+        entry = self._narratives.get(transaction_id)
+        if entry is not None and entry[0] in (None, key):
+            return entry[1], "memory"
+        text = self.cache.overrides([transaction_id]).get(transaction_id)
+        if text is not None:
+            self._narratives.put(transaction_id, (None, text))
+            return text, "override"
+        text = self.cache.get(transaction_id, self.llm_model, key)
+        if text is not None:
+            self._narratives.put(transaction_id, (key, text))
+            return text, "cache"
+        if not generate:
+            return None, "miss"
+
+        # Imported lazily: the OpenAI client requires an API key at import time
+        from src.explanation.llm_narrative_openai import generate_explanation_openai
+        text = generate_explanation_openai(pd.Series(record), model=self.llm_model,
+                                           prompt_variant=self.prompt_variant, cache=self.cache, reason_keys=reasons)
+        if text.startswith("Error generating explanation"):
+            return None, "error"
+        self._narratives.put(transaction_id, (key, text))
+        return text, "generated"
+
+    def top_features(self, record: dict) -> tuple:
+        """
+        (top features, source): the SHAP store when the transaction was
+        already processed, otherwise the preloaded explainer.
+        """
+        if self._shap_store is not None:
+            try:
+                pairs = self._shap_store.top_features(record["transaction_id"], self.top_n)
+                return [{"feature": f, "shap_value": v} for f, v in pairs], "store"
+            except KeyError:
+                pass
+        if self._explainer is None:
+            return None, "unavailable"
+
+        row = self._builder.transform_record(record)
+        with self._shap_lock:
+            # Raw shap_values (tree explainers) skips building an Explanation object
+            raw = getattr(self._explainer, "shap_values", None)
+            values = raw(row) if raw is not None else self._explainer(row).values
+        # Positive (fraud) class for classifier outputs, as in top_features_from_values
+        values = np.asarray(values[-1] if isinstance(values, list) else values)
+        values = values[0, :, -1] if values.ndim == 3 else values[0]
+        order = np.argsort(-np.abs(values), kind="stable")[:self.top_n]
+        names = self._builder.feature_names
+        return [{"feature": names[i], "shap_value": float(values[i])} for i in order], "explainer"
+
+    def explain(self, payload: dict, include_shap: bool = False, generate_llm: bool = False) -> dict:
+        """
+        Explain one transaction payload.
+
+        Raises:
+            InvalidTransaction: The payload does not match FraudModelOutput
+        """
+        start = time.perf_counter()
+        record = validate_transaction(payload)
+        # Scalar rule and feature paths: a one-row DataFrame would cost more than the work itself
+        mask = reason_mask_for_record(record)
+        reason_keys = reason_keys_from_mask(mask)
+        narrative, source = self.llm_narrative(record, generate=generate_llm, reason_keys=reason_keys)
+
+        response = {
+            "transaction_id": record["transaction_id"],
+            "fraud_score": record["fraud_score"],
+            "fraud_prediction": record["fraud_prediction"],
+            "rule_based_factors": format_reason_label(mask),
+            "reason_keys": reason_keys,
+            "template_narrative": self.template_narrative(record, reason_keys),
+            "llm_narrative": narrative,
+            "llm_source": source,
+        }
+        if include_shap:
+            response["top_features"], response["shap_source"] = self.top_features(record)
+
+        elapsed = time.perf_counter() - start
+        response["latency_ms"] = round(elapsed * 1000, 3)
+        METRICS.incr("service_requests")
+        METRICS.observe("service_latency_seconds", elapsed)
+        return response
+
+
+# -----------------------------
+# HTTP layer
+# -----------------------------
+def _flag(query: dict, name: str) -> str:
+    return (query.get(name) or [""])[0].lower()
+
+
+class ExplanationRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"          # Keep-alive: no TCP handshake per request
+    disable_nagle_algorithm = True         # Headers and body go out without a delayed-ACK stall
+    server_version = "FraudExplanationService/1.0"
+
+    def _send(self, status: int, payload: dict):
+        body = json.dumps(payload, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if urlparse(self.path).path == "/health":
+            self._send(200, {"status": "ok", **self.server.service.info()})
+        else:
+            self._send(404, {"error": "Not found"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True
+            self._send(413, {"error": "Payload too large"})
+            return
+        body = self.rfile.read(length)
+        if url.path != "/explain":
+            self._send(404, {"error": "Not found"})
+            return
+
+        query = parse_qs(url.query)
+        try:
+            payload = json.loads(body or b"null")
+            response = self.server.service.explain(
+                payload,
+                include_shap=_flag(query, "shap") in ("1", "true", "yes"),
+                generate_llm=_flag(query, "llm") == "generate",
+            )
+        except json.JSONDecodeError as e:
+            self._send(400, {"error": f"Invalid JSON: {e}"})
+        except InvalidTransaction as e:
+            METRICS.incr("service_invalid_requests")
+            self._send(422, {"error": "Invalid transaction", "details": e.errors})
+        except Exception as e:
+            METRICS.incr("service_errors")
+            self._send(500, {"error": str(e)})
+        else:
+            self._send(200, response)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def make_server(service: ExplanationService, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                verbose: bool = False) -> ThreadingHTTPServer:
+    """
+    Bind a threaded HTTP server for the service (port 0 picks a free port).
+    """
+    server = ThreadingHTTPServer((host, port), ExplanationRequestHandler)
+    server.daemon_threads = True
+    server.service = service
+    server.verbose = verbose
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve single-transaction explanations over HTTP.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="LLM whose cached narratives are served")
+    parser.add_argument("--prompt-variant", default="default")
+    parser.add_argument("--cache-db", default=EXPLANATION_CACHE_DB)
+    parser.add_argument("--shap-model-path")
+    parser.add_argument("--encoder-path", default=ENCODER_PATH)
+    parser.add_argument("--background-csv", default="data/raw/fraud_model_output.csv")
+    parser.add_argument("--shap-store-dir", default="data/processed/shap_store")
+    parser.add_argument("--top-n", type=int, default=5)
+    parser.add_argument("--lru-size", type=int, default=DEFAULT_LRU_SIZE)
+    parser.add_argument("--lru-ttl", type=float, default=DEFAULT_LRU_TTL,
+                        help="Seconds before an in-memory narrative is re-read from the cache")
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    args = parser.parse_args()
+
+    service = ExplanationService(
+        llm_model=args.model, prompt_variant=args.prompt_variant, cache_db=args.cache_db,
+        shap_model_path=args.shap_model_path, encoder_path=args.encoder_path, background_csv=args.background_csv,
+        shap_store_dir=args.shap_store_dir, top_n=args.top_n, lru_size=args.lru_size, lru_ttl=args.lru_ttl,
+    )
+    server = make_server(service, args.host, args.port, verbose=args.verbose)
+    print(f"Explanation service listening on http://{args.host}:{server.server_address[1]} ({service.info()})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
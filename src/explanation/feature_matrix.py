@@ -0,0 +1,257 @@
+# src/explanation/feature_matrix.py
+
+import os
+import json
+import hashlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from src.metrics import METRICS
+
+# -----------------------------
+# Feature definitions
+# -----------------------------
+ENCODER_PATH = os.path.join("data", "cache", "feature_encoders.json")
+
+NUMERIC_FEATURES = [
+    "transaction_amount",
+    "velocity_1h",
+    "avg_amount_30d",
+    "geo_mismatch",
+    "high_velocity_flag",
+    "device_fingerprint_changed",
+]
+CATEGORICAL_FEATURES = ["merchant_category", "transaction_country", "customer_country"]
+TIME_FEATURE = "transaction_timestamp"
+TIME_DERIVED_FEATURES = ["transaction_hour", "transaction_dayofweek"]
+
+# Matrices kept in memory, keyed by encoder fingerprint + input content hash
+_MATRIX_CACHE_SIZE = 4
+_MATRIX_CACHE: "OrderedDict[str, FeatureMatrix]" = OrderedDict()
+
+
+@dataclass
+class FeatureMatrix:
+    """
+    Encoded model features: a contiguous float32 matrix with a stable column order.
+    """
+    values: np.ndarray
+    feature_names: list
+    transaction_ids: np.ndarray
+    vocabulary: str = None  # Fingerprint of the encoders that built it
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Zero-copy DataFrame view for APIs that need column names (e.g. SHAP).
+        """
+        return pd.DataFrame(self.values, columns=self.feature_names, copy=False)
+
+    def __len__(self):
+        return len(self.values)
+
+
+# -----------------------------
+# Encoders
+# -----------------------------
+class FeatureMatrixBuilder:
+    """
+    Fit categorical vocabularies once, persist them, and encode transaction
+    frames into float32 matrices. New categories are appended to the
+    vocabularies (extend) so existing codes never change; categories still
+    unknown at transform time encode as -1 and are counted in METRICS
+    (feature_unknown_categories).
+    """
+
+    def __init__(self, vocabularies: dict = None):
+        self.vocabularies = vocabularies or {}
+        self._lookups = {col: {v: i for i, v in enumerate(vocab)} for col, vocab in self.vocabularies.items()}
+
+    @property
+    def feature_names(self) -> list:
+        return NUMERIC_FEATURES + CATEGORICAL_FEATURES + TIME_DERIVED_FEATURES
+
+    @property
+    def fingerprint(self) -> str:
+        payload = json.dumps({"features": self.feature_names, "vocab": self.vocabularies}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+    def fit(self, df: pd.DataFrame) -> "FeatureMatrixBuilder":
+        """
+        Learn sorted category vocabularies from the given frame.
+        """
+        self.vocabularies = {
+            col: sorted(str(v) for v in pd.unique(df[col].astype(str))) for col in CATEGORICAL_FEATURES
+        }
+        self._lookups = {col: {v: i for i, v in enumerate(vocab)} for col, vocab in self.vocabularies.items()}
+        return self
+
+    def extend(self, categories: dict) -> int:
+        """
+        Append categories not in the vocabularies yet, sorted, after the
+        existing ones (codes the model was trained on stay valid).
+
+        Args:
+            categories (dict): Column -> iterable of observed values
+
+        Returns:
+            int: Number of categories added
+        """
+        added = 0
+        for col, values in categories.items():
+            lookup = self._lookups.setdefault(col, {})
+            vocab = self.vocabularies.setdefault(col, [])
+            for value in sorted({str(v) for v in values} - lookup.keys()):
+                lookup[value] = len(vocab)
+                vocab.append(value)
+                added += 1
+        return added
+
+    def transform(self, df: pd.DataFrame) -> FeatureMatrix:
+        """
+        Encode a frame into a FeatureMatrix. Each column is written straight into
+        a preallocated float32 array; no intermediate DataFrame is built.
+        """
+        if not self.vocabularies:
+            raise ValueError("FeatureMatrixBuilder must be fitted or loaded before transform()")
+
+        missing = set(NUMERIC_FEATURES + CATEGORICAL_FEATURES + [TIME_FEATURE]) - set(df.columns)
+        if missing:
+            raise ValueError(f"Missing feature columns: {missing}")
+
+        n = len(df)
+        out = np.empty((n, len(self.feature_names)), dtype=np.float32, order="C")
+        col = 0
+        for name in NUMERIC_FEATURES:
+            out[:, col] = df[name].to_numpy(dtype=np.float32)
+            col += 1
+        unknown = 0
+        for name in CATEGORICAL_FEATURES:
+            codes = df[name].astype(str).map(self._lookups[name])
+            unknown += int(codes.isna().sum())
+            out[:, col] = codes.fillna(-1).to_numpy(dtype=np.float32)
+            col += 1
+        if unknown:
+            METRICS.incr("feature_unknown_categories", unknown)
+            print(f"Warning: {unknown} categorical values are not in the encoders and were encoded as -1")
+        timestamps = pd.to_datetime(df[TIME_FEATURE], format="%Y-%m-%d %H:%M:%S")
+        out[:, col] = timestamps.dt.hour.to_numpy(dtype=np.float32)
+        out[:, col + 1] = timestamps.dt.dayofweek.to_numpy(dtype=np.float32)
+
+        return FeatureMatrix(
+            values=out,
+            feature_names=list(self.feature_names),
+            transaction_ids=df["transaction_id"].to_numpy(),
+            vocabulary=self.fingerprint,
+        )
+
+    def transform_record(self, record: dict) -> np.ndarray:
+        """
+        Encode one transaction (a validated record with a datetime or
+        "%Y-%m-%d %H:%M:%S" timestamp) into a (1, n_features) float32 row,
+        without the per-call DataFrame overhead of transform().
+        """
+        if not self.vocabularies:
+            raise ValueError("FeatureMatrixBuilder must be fitted or loaded before transform_record()")
+
+        timestamp = record[TIME_FEATURE]
+        if isinstance(timestamp, str):
+            timestamp = datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S")
+        values = [float(record[name]) for name in NUMERIC_FEATURES]
+        codes = [self._lookups[name].get(str(record[name]), -1) for name in CATEGORICAL_FEATURES]
+        if -1 in codes:
+            METRICS.incr("feature_unknown_categories", codes.count(-1))
+        values += codes + [timestamp.hour, timestamp.weekday()]
+        return np.asarray([values], dtype=np.float32)
+
+    def save(self, path: str = ENCODER_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump({"feature_names": self.feature_names, "vocabularies": self.vocabularies}, f, indent=2)
+
+    @classmethod
+    def load(cls, path: str = ENCODER_PATH) -> "FeatureMatrixBuilder":
+        with open(path) as f:
+            payload = json.load(f)
+        return cls(vocabularies=payload["vocabularies"])
+
+
+def update_encoders(categories: dict, encoder_path: str = ENCODER_PATH) -> FeatureMatrixBuilder:
+    """
+    Persisted encoders extended with any category they have not seen (or new
+    encoders when none are persisted yet), saved back when they changed.
+
+    Args:
+        categories (dict): Column -> iterable of observed values, for CATEGORICAL_FEATURES
+        encoder_path (str): Location of the persisted encoders (None: not persisted)
+    """
+    if encoder_path and os.path.exists(encoder_path):
+        builder = FeatureMatrixBuilder.load(encoder_path)
+        added = builder.extend(categories)
+        if not added:
+            return builder
+        METRICS.incr("feature_categories_added", added)
+        print(f"Feature encoders extended with {added} new categories")
+    else:
+        builder = FeatureMatrixBuilder(vocabularies={col: sorted({str(v) for v in values})
+                                                     for col, values in categories.items()})
+    if encoder_path:
+        builder.save(encoder_path)
+        print(f"Feature encoders saved at {encoder_path}")
+    return builder
+
+
+def load_or_fit_builder(df: pd.DataFrame, encoder_path: str = ENCODER_PATH) -> FeatureMatrixBuilder:
+    """
+    Encoders for df: the persisted ones extended with df's new categories,
+    or fitted on df; persisted for later runs.
+    """
+    return update_encoders({col: pd.unique(df[col].astype(str)) for col in CATEGORICAL_FEATURES}, encoder_path)
+
+
+def fit_builder_from_csv(csv_path: str, encoder_path: str = ENCODER_PATH, chunk_rows: int = 250_000) -> FeatureMatrixBuilder:
+    """
+    Collect the categories of the whole CSV in a streaming pass (categorical
+    columns only) and update the persisted encoders with them. Batch runs use
+    this so categories first seen in a later batch are not encoded as unknown.
+    """
+    vocab = {col: set() for col in CATEGORICAL_FEATURES}
+    for chunk in pd.read_csv(csv_path, chunksize=chunk_rows, usecols=lambda c: c in vocab):
+        for col in chunk.columns:
+            vocab[col].update(chunk[col].astype(str).unique())
+    return update_encoders(vocab, encoder_path)
+
+# -----------------------------
+# Cached entry point
+# -----------------------------
+def build_feature_matrix(df: pd.DataFrame, encoder_path: str = ENCODER_PATH) -> FeatureMatrix:
+    """
+    Return the encoded feature matrix for df, reusing an already-built matrix
+    when the same rows are requested again (e.g. by SHAP and a scoring step).
+
+    Args:
+        df (pd.DataFrame): Validated transactions
+        encoder_path (str): Location of the persisted encoders
+
+    Returns:
+        FeatureMatrix: float32 matrix with stable column order
+    """
+    builder = load_or_fit_builder(df, encoder_path)
+    source_cols = ["transaction_id"] + NUMERIC_FEATURES + CATEGORICAL_FEATURES + [TIME_FEATURE]
+    content_hash = hashlib.sha256(
+        pd.util.hash_pandas_object(df[source_cols], index=False).to_numpy().tobytes()
+    ).hexdigest()
+    key = f"{builder.fingerprint}:{content_hash}"
+
+    if key in _MATRIX_CACHE:
+        METRICS.cache("feature_matrix", hit=True)
+        _MATRIX_CACHE.move_to_end(key)
+        return _MATRIX_CACHE[key]
+    METRICS.cache("feature_matrix", hit=False)
+
+    matrix = builder.transform(df)
+    _MATRIX_CACHE[key] = matrix
+    if len(_MATRIX_CACHE) > _MATRIX_CACHE_SIZE:
+        _MATRIX_CACHE.popitem(last=False)
+    return matrix
@@ -1,16 +1,29 @@
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
-from openai import OpenAI
-from src.explanation.templates import ExplanationTemplates
-from src.config import OPENAI_API_KEY, DEFAULT_MODEL
+from openai import (
+    OpenAI, RateLimitError, APIConnectionError, APIStatusError,
+    AuthenticationError, PermissionDeniedError, NotFoundError,
+)
+from src.explanation.prompts import (
+    SYSTEM_MESSAGE, NORMAL_EXPLANATION, SKIPPED_EXPLANATION,
+    generate_rule_based_reasons, build_openai_prompt,
+)
+from src.explanation.explanation_cache import prompt_hash
+from src.explanation.rules import reason_keys_from_mask
+from src.config import OPENAI_API_KEY, DEFAULT_MODEL, LLM_MAX_RETRIES
+from src.metrics import METRICS
 
 # -----------------------------
 # Initialize OpenAI client
 # -----------------------------
 # This sets up the OpenAI client with your API key.
 # It first tries to get it from config, then from environment variable.
+# Retries are handled below so they can be counted in the run metrics.
 client = OpenAI(
-    api_key=OPENAI_API_KEY or os.getenv("OPENAI_API_KEY")
+    api_key=OPENAI_API_KEY or os.getenv("OPENAI_API_KEY"),
+    max_retries=0,
 )
 
 # Ensure the API key is set. Otherwise, raise an error immediately.
@@ -19,97 +32,37 @@ if not client.api_key:
         "OpenAI API key not set. Define OPENAI_API_KEY in src/config.py or environment."
     )
 
-# -----------------------------
-# Task 2: Rule-based reasons
-# -----------------------------
-def generate_rule_based_reasons(row: dict) -> list:
-    """
-    Identify which rule-based fraud reasons apply for a single transaction.
-
-    Args:
-        row (dict): Dictionary of transaction features
-
-    Returns:
-        list: List of reason keys that match
-    """
-    reasons = []
-
-    try:
-        # High transaction amount > 5000
-        if float(row.get("transaction_amount", 0)) > 5000:
-            reasons.append("high_transaction_amount")
-
-        # Geo mismatch indicator
-        if int(row.get("geo_mismatch", 0)) == 1:
-            reasons.append("geo_mismatch")
-
-        # Device fingerprint changed
-        if bool(row.get("device_fingerprint_changed", False)):
-            reasons.append("device_fingerprint_changed")
-
-        # High velocity (multiple transactions in short time)
-        if int(row.get("high_velocity_flag", 0)) == 1:
-            reasons.append("high_velocity_flag")
-
-        # High fraud score threshold
-        if float(row.get("fraud_score", 0)) >= 0.8:
-            reasons.append("high_fraud_score")
 
-        # Large transaction + geo mismatch
-        if float(row.get("transaction_amount", 0)) > 10000 and int(row.get("geo_mismatch", 0)) == 1:
-            reasons.append("large_amount_geo_mismatch")
+# Wrong key, no access or unknown model: every row would fail the same way, so the batch stops
+_FATAL_ERRORS = (AuthenticationError, PermissionDeniedError, NotFoundError)
 
-    except Exception as e:
-        # Catch and print any errors evaluating the rules
-        print(f"Error evaluating rule-based reasons: {e}")
 
-    return reasons
-
-# -----------------------------
-# Prompt construction
-# -----------------------------
-def build_openai_prompt(row: dict, reason_keys: list) -> str:
+def _is_transient(error: Exception) -> bool:
     """
-    Build the prompt to send to OpenAI based on the transaction row
-    and detected rule-based reasons.
-
-    Args:
-        row (dict): Transaction data as dict of strings
-        reason_keys (list): Rule-based reason keys
-
-    Returns:
-        str: Full prompt text
+    Rate limits, connection failures, timeouts (an APIConnectionError) and 5xx
+    responses are worth retrying; auth errors, bad requests and unknown
+    models fail the same way every time.
     """
-    # Convert reason keys to human-readable text using templates
-    templates_text = " ".join([ExplanationTemplates.get_template(k) for k in reason_keys])
-    # Convert all values to string to prevent serialization/API errors
-    row_str_dict = {k: str(v) for k, v in row.items()}
-
-    # Build prompt string
-    return f"""
-You are a fraud analyst assistant.
-
-Generate a concise (1–3 sentences), professional, business-friendly explanation
-for why the transaction was flagged as potentially fraudulent.
-Avoid speculation and use factual language only.
-
-Transaction features:
-{row_str_dict}
-
-Detected risk patterns:
-{templates_text}
-""".strip()
+    if isinstance(error, (RateLimitError, APIConnectionError)):
+        return True
+    return isinstance(error, APIStatusError) and error.status_code >= 500
 
 # -----------------------------
 # Task 3: OpenAI explanation
 # -----------------------------
-def generate_explanation_openai(row: pd.Series, model: str = DEFAULT_MODEL) -> str:
+def generate_explanation_openai(row: pd.Series, model: str = DEFAULT_MODEL, prompt_variant: str = "default",
+                                cache=None, reason_keys: list = None, refresh: bool = False) -> str:
     """
     Generate explanation for a single transaction using OpenAI.
 
     Args:
         row (pd.Series): Single transaction row
         model (str): OpenAI model to use
+        prompt_variant (str): Key into PROMPT_VARIANTS
+        cache (ExplanationCache): Optional cache keyed by transaction, model and prompt
+        reason_keys (list): Precomputed rule reason keys (e.g. from a ValidatedFrame);
+            evaluated from the row when omitted
+        refresh (bool): Skip the cache lookup and call the API (the result is still cached)
 
     Returns:
         str: Generated explanation text
@@ -117,58 +70,127 @@ def generate_explanation_openai(row: pd.Series, model: str = DEFAULT_MODEL) -> s
     # Convert pandas row to dictionary with string values for safe API call
     row_dict = {k: str(v) for k, v in row.items()}
 
-    # Get rule-based reasons for this row
-    reason_keys = generate_rule_based_reasons(row_dict)
+    # Get rule-based reasons for this row. Evaluated on the typed row: on the
+    # string copy, "False" would count as a changed device fingerprint.
+    if reason_keys is None:
+        reason_keys = generate_rule_based_reasons(row)
 
     # If no reasons, return a default "normal" explanation
     if not reason_keys:
-        return "Transaction appears normal; no significant fraud indicators were detected."
+        return NORMAL_EXPLANATION
 
     # Build the prompt for OpenAI
-    prompt = build_openai_prompt(row_dict, reason_keys)
-
-    try:
-        # Call OpenAI Chat Completions API
-        response = client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": "You are a professional fraud detection analyst."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.3,
-            max_tokens=150,
-        )
-
-        # Return the generated explanation
-        return response.choices[0].message.content.strip()
-
-    except Exception as e:
-        # Catch API errors and return as string
-        return f"Error generating explanation: {str(e)}"
+    prompt = build_openai_prompt(row_dict, reason_keys, prompt_variant)
+
+    key = None
+    if cache is not None and "transaction_id" in row_dict:
+        key = prompt_hash(SYSTEM_MESSAGE, prompt)
+        cached = None if refresh else cache.get(row_dict["transaction_id"], model, key)
+        if cached is not None:
+            METRICS.incr("llm_cache_hits")
+            return cached
+
+    METRICS.incr("llm_calls")
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        start = time.perf_counter()
+        try:
+            # Call OpenAI Chat Completions API
+            response = client.chat.completions.create(
+                model=model,
+                messages=[
+                    {"role": "system", "content": SYSTEM_MESSAGE},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.3,
+                max_tokens=150,
+            )
+            METRICS.observe("llm_latency_seconds", time.perf_counter() - start)
+
+            # Return the generated explanation (errors below are never cached)
+            explanation = response.choices[0].message.content.strip()
+            if key is not None:
+                cache.put(row_dict["transaction_id"], model, key, explanation)
+            return explanation
+
+        except Exception as e:
+            METRICS.observe("llm_latency_seconds", time.perf_counter() - start)
+            if isinstance(e, _FATAL_ERRORS):
+                METRICS.incr("llm_errors")
+                raise
+            if attempt < LLM_MAX_RETRIES and _is_transient(e):
+                # Exponential backoff before retrying transient API errors
+                METRICS.incr("llm_retries")
+                time.sleep(0.5 * 2 ** attempt)
+                continue
+            # Other API errors (e.g. a rejected request) are per row: return as string
+            METRICS.incr("llm_errors")
+            return f"Error generating explanation: {str(e)}"
 
 # -----------------------------
 # Batch generation
 # -----------------------------
-def generate_explanations_for_df_openai(df: pd.DataFrame, model: str = DEFAULT_MODEL) -> pd.DataFrame:
+def generate_explanation_series(df: pd.DataFrame, model: str = DEFAULT_MODEL, max_workers: int = 1,
+                                prompt_variant: str = "default", cache=None, reason_mask=None,
+                                refresh: bool = False) -> pd.Series:
     """
-    Generate explanations for all rows in a DataFrame.
+    Generate explanations for all rows without copying the input frame.
 
     Args:
         df (pd.DataFrame): DataFrame of transactions
         model (str): OpenAI model
+        max_workers (int): Concurrent API calls. The calls are I/O-bound, so a
+            thread pool overlaps their network latency.
+        prompt_variant (str): Key into PROMPT_VARIANTS
+        cache (ExplanationCache): Optional explanation cache; hits skip the API call, and
+            regenerated explanations (overrides) are served in place of a new generation
+        reason_mask (np.ndarray): Precomputed rule bitmask aligned with df's rows,
+            so the rules are not evaluated again per row
+        refresh (bool): Ignore cached explanations and overrides and call the API
+            (feedback-driven regeneration)
 
     Returns:
-        pd.DataFrame: DataFrame with a new 'explanation' column
+        pd.Series: Explanation per row, aligned to df.index
     """
-    df = df.copy()
+    overrides = {}
+    if cache is not None and not refresh and "transaction_id" in df.columns:
+        overrides = cache.overrides(df["transaction_id"])
 
-    def safe_generate(row):
+    def safe_generate(item):
+        position, row = item
         if int(row.get("fraud_prediction", 0)) != 1:
             # Skip OpenAI call for non-fraud transactions
-            return "No fraud detected; explanation skipped."
-        return generate_explanation_openai(row, model=model)
+            return SKIPPED_EXPLANATION
+        override = overrides.get(str(row["transaction_id"])) if overrides else None
+        if override is not None:
+            METRICS.incr("llm_overrides")
+            return override
+        reason_keys = reason_keys_from_mask(reason_mask[position]) if reason_mask is not None else None
+        return generate_explanation_openai(row, model=model, prompt_variant=prompt_variant, cache=cache,
+                                           reason_keys=reason_keys, refresh=refresh)
+
+    rows = enumerate(row for _, row in df.iterrows())
+    if max_workers <= 1:
+        explanations = [safe_generate(item) for item in rows]
+    else:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            explanations = list(pool.map(safe_generate, rows))
+    return pd.Series(explanations, index=df.index, name="explanation", dtype=object)
+
+
+def generate_explanations_for_df_openai(df: pd.DataFrame, model: str = DEFAULT_MODEL, max_workers: int = 1) -> pd.DataFrame:
+    """
+    Generate explanations for all rows in a DataFrame.
+
+    Args:
+        df (pd.DataFrame): DataFrame of transactions
+        model (str): OpenAI model
+        max_workers (int): Concurrent API calls (see generate_explanation_series)
 
-    df["explanation"] = df.apply(safe_generate, axis=1)
+    Returns:
+        pd.DataFrame: DataFrame with a new 'explanation' column
+    """
+    df = df.copy()
+    df["explanation"] = generate_explanation_series(df, model=model, max_workers=max_workers)
     return df
 
 # -----------------------------
@@ -176,16 +198,17 @@ def generate_explanations_for_df_openai(df: pd.DataFrame, model: str = DEFAULT_M
 # -----------------------------
 if __name__ == "__main__":
     import pandas as pd
+    from src.data_loader.load_fraud_output import ValidatedFrame
+    from src.final.explained_dataset import llm_explanations
 
     # Load the real dataset
     csv_path = "data/raw/fraud_model_output.csv"
-    df = pd.read_csv(csv_path)
 
-    # Take only the first row for testing
-    test_row = df.head(2)
+    # Take only the first rows for testing
+    frame = ValidatedFrame.from_frame(pd.read_csv(csv_path, nrows=2))
 
     print("Generating explanation for first transaction in dataset...")
-    result_df = generate_explanations_for_df_openai(test_row)
+    explanations = llm_explanations(frame, max_workers=1)
 
     # Print only transaction ID and explanation
-    print(result_df)
+    print(pd.DataFrame({"transaction_id": frame.transaction_ids, "explanation": explanations}))
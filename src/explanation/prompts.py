@@ -0,0 +1,116 @@
+# src/explanation/prompts.py
+"""
+Rule-based reasons and prompt construction for the LLM narratives.
+
+Kept apart from the OpenAI client so callers that only need the prompt (and
+its cache key), such as the explanation service, work without an API key.
+"""
+
+from src.explanation.templates import ExplanationTemplates
+from src.explanation.rules import HIGH_AMOUNT_THRESHOLD, LARGE_AMOUNT_THRESHOLD, HIGH_SCORE_THRESHOLD
+
+# Fixed texts returned without calling the LLM
+NORMAL_EXPLANATION = "Transaction appears normal; no significant fraud indicators were detected."
+SKIPPED_EXPLANATION = "No fraud detected; explanation skipped."
+
+# -----------------------------
+# Task 2: Rule-based reasons
+# -----------------------------
+def generate_rule_based_reasons(row: dict) -> list:
+    """
+    Identify which rule-based fraud reasons apply for a single transaction.
+
+    Args:
+        row (dict): Dictionary of transaction features
+
+    Returns:
+        list: List of reason keys that match
+    """
+    reasons = []
+
+    try:
+        # High transaction amount > 5000
+        if float(row.get("transaction_amount", 0)) > HIGH_AMOUNT_THRESHOLD:
+            reasons.append("high_transaction_amount")
+
+        # Geo mismatch indicator
+        if int(row.get("geo_mismatch", 0)) == 1:
+            reasons.append("geo_mismatch")
+
+        # Device fingerprint changed
+        if bool(row.get("device_fingerprint_changed", False)):
+            reasons.append("device_fingerprint_changed")
+
+        # High velocity (multiple transactions in short time)
+        if int(row.get("high_velocity_flag", 0)) == 1:
+            reasons.append("high_velocity_flag")
+
+        # High fraud score threshold
+        if float(row.get("fraud_score", 0)) >= HIGH_SCORE_THRESHOLD:
+            reasons.append("high_fraud_score")
+
+        # Large transaction + geo mismatch
+        if float(row.get("transaction_amount", 0)) > LARGE_AMOUNT_THRESHOLD and int(row.get("geo_mismatch", 0)) == 1:
+            reasons.append("large_amount_geo_mismatch")
+
+    except Exception as e:
+        # Catch and print any errors evaluating the rules
+        print(f"Error evaluating rule-based reasons: {e}")
+
+    return reasons
+
+# -----------------------------
+# Prompt construction
+# -----------------------------
+SYSTEM_MESSAGE = "You are a professional fraud detection analyst."
+
+# Instruction blocks by variant. "default" is the original prompt; the others
+# are alternates for regenerating explanations that SMEs rated poorly.
+PROMPT_VARIANTS = {
+    "default": """
+You are a fraud analyst assistant.
+
+Generate a concise (1–3 sentences), professional, business-friendly explanation
+for why the transaction was flagged as potentially fraudulent.
+Avoid speculation and use factual language only.
+""",
+    "detailed": """
+You are a fraud analyst assistant writing for a fraud operations reviewer.
+
+Explain in 2–3 plain sentences why the transaction was flagged as potentially fraudulent.
+Name each detected risk pattern together with the transaction value that triggered it
+(for example the amount or the fraud score), then state one concrete next step
+for the reviewer, such as contacting the cardholder or holding the transaction.
+Use factual language only and do not speculate beyond the data provided.
+""",
+}
+
+
+def build_openai_prompt(row: dict, reason_keys: list, variant: str = "default") -> str:
+    """
+    Build the prompt to send to OpenAI based on the transaction row
+    and detected rule-based reasons.
+
+    Args:
+        row (dict): Transaction data as dict of strings
+        reason_keys (list): Rule-based reason keys
+        variant (str): Key into PROMPT_VARIANTS
+
+    Returns:
+        str: Full prompt text
+    """
+    # Convert reason keys to human-readable text using templates
+    templates_text = " ".join([ExplanationTemplates.get_template(k) for k in reason_keys])
+    # Convert all values to string to prevent serialization/API errors
+    row_str_dict = {k: str(v) for k, v in row.items()}
+
+    # Build prompt string
+    return f"""
+{PROMPT_VARIANTS[variant].strip()}
+
+Transaction features:
+{row_str_dict}
+
+Detected risk patterns:
+{templates_text}
+""".strip()
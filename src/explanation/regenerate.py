@@ -0,0 +1,228 @@
+# src/explanation/regenerate.py
+"""
+Feedback-driven regeneration of low-rated explanations.
+
+Selects transactions whose latest SME rating falls below a threshold on any
+dimension (or whole rule-factor signature groups whose average does),
+regenerates only those with an alternate prompt variant or model, and
+rewrites the explanation column of the processed and final datasets (and the
+compact store) in place. LLM calls scale with the number of bad
+explanations; the rest of the dataset is streamed through unchanged. The new
+texts are kept as per-transaction overrides in the explanation cache, so
+later pipeline runs and the explanation service serve them instead of
+generating with their own prompt.
+
+A transaction that was regenerated after its latest rating is skipped, so
+re-running the pass does not pay twice for the same complaint.
+
+Usage:
+    python -m src.explanation.regenerate --threshold 3 --prompt-variant detailed
+    python -m src.explanation.regenerate --by signature --clarity 3.5 --model gpt-4o
+    python -m src.explanation.regenerate --dry-run
+"""
+
+import os
+import argparse
+from dataclasses import dataclass, field
+import pandas as pd
+
+from src.config import DEFAULT_MODEL
+from src.metrics import METRICS
+from src.data_loader.load_fraud_output import ALL_COLUMNS, validate_fraud_frame
+from src.data_process.feedback_store import FeedbackStore, FEEDBACK_DB, RATING_COLUMNS, ALL
+from src.explanation.explanation_cache import ExplanationCache, EXPLANATION_CACHE_DB
+from src.explanation.compact import COMPACT_DIR, update_explanations
+
+DEFAULT_THRESHOLD = 3           # Ratings of 1-2 count as bad
+DEFAULT_CHUNK_ROWS = 100_000
+ERROR_PREFIX = "Error generating explanation"
+
+
+@dataclass
+class RegenerationPlan:
+    """What to regenerate: explicit transactions and/or whole signature groups."""
+    transaction_ids: set = field(default_factory=set)
+    signatures: set = field(default_factory=set)
+
+    def __len__(self):
+        return len(self.transaction_ids) + len(self.signatures)
+
+
+def rating_thresholds(threshold: float = DEFAULT_THRESHOLD, clarity: float = None, accuracy: float = None,
+                      actionability: float = None) -> dict:
+    """Per-dimension thresholds; unset dimensions fall back to `threshold`."""
+    overrides = dict(zip(RATING_COLUMNS, (clarity, accuracy, actionability)))
+    return {col: threshold if value is None else value for col, value in overrides.items()}
+
+
+def select_low_rated(store: FeedbackStore, thresholds: dict, by: str = "transaction", model: str = ALL,
+                     min_ratings: int = 1) -> RegenerationPlan:
+    """
+    Build a regeneration plan from the feedback store.
+
+    Args:
+        store (FeedbackStore): Feedback store to read
+        thresholds (dict): Rating column -> minimum acceptable rating
+        by (str): "transaction" (individual low ratings) or "signature"
+            (groups whose average rating is low)
+        model (str): Only consider feedback on this model's explanations
+        min_ratings (int): Minimum ratings a signature needs before its average counts
+    """
+    if by == "transaction":
+        return RegenerationPlan(transaction_ids=set(store.low_rated(thresholds, model=model)["transaction_id"]))
+    if by != "signature":
+        raise ValueError(f"Unknown selection mode: {by}")
+
+    stats = store.stats("signature", model=model)
+    bad = pd.Series(False, index=stats.index)
+    for col in RATING_COLUMNS:
+        if ("avg", col) in stats.columns and thresholds.get(col) is not None:
+            rated = stats[("count", col)].fillna(0) >= min_ratings
+            bad |= rated & (stats[("avg", col)] < thresholds[col])
+    return RegenerationPlan(signatures=set(stats.index[bad]))
+
+
+def _stale(selected: pd.DataFrame, store: FeedbackStore, cache: ExplanationCache) -> pd.Series:
+    """
+    True for rows not yet regenerated since their latest rating. Only the
+    selected rows are looked up, never the whole dataset.
+    """
+    ids = selected["transaction_id"]
+    regenerated = ids.map(cache.regenerated_at(ids)).astype(float)
+    rated = pd.to_datetime(store.join(selected[["transaction_id"]])["rated_at"], utc=True, errors="coerce",
+                           format="ISO8601")
+    rated_epoch = (rated - pd.Timestamp(0, tz="UTC")).dt.total_seconds().fillna(float("-inf"))
+    return (regenerated.isna() | (regenerated < rated_epoch)).to_numpy()
+
+
+def _rewrite_explanations(path: str, updates: dict, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> int:
+    """
+    Replace the explanation of the updated ids in a CSV, streamed chunk by
+    chunk into a temporary file that atomically replaces the original.
+    Values are read and written as strings, so untouched cells are unchanged.
+    """
+    if not updates or not os.path.exists(path):
+        return 0
+    tmp_path = path + ".tmp"
+    replaced = 0
+    for i, chunk in enumerate(pd.read_csv(path, chunksize=chunk_rows, dtype=str, keep_default_na=False)):
+        new = chunk["transaction_id"].map(updates)
+        hit = new.notna()
+        chunk.loc[hit, "explanation"] = new[hit]
+        replaced += int(hit.sum())
+        chunk.to_csv(tmp_path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+    os.replace(tmp_path, path)
+    return replaced
+
+
+def regenerate_explanations(plan: RegenerationPlan, processed_csv: str, store: FeedbackStore,
+                            cache: ExplanationCache, model: str = DEFAULT_MODEL, prompt_variant: str = "detailed",
+                            max_workers: int = 8, chunk_rows: int = DEFAULT_CHUNK_ROWS, extra_csvs: tuple = (),
+                            force: bool = False, dry_run: bool = False, compact_dir: str = None) -> dict:
+    """
+    Regenerate the planned explanations and write them back in place.
+
+    Args:
+        plan (RegenerationPlan): Transactions and signature groups to regenerate
+        processed_csv (str): Processed dataset (Task 5 output), rewritten in place
+        store (FeedbackStore): Feedback store (for the latest rating times)
+        cache (ExplanationCache): Explanation cache; the new explanations are stored as overrides
+        model (str): Model for the new explanations
+        prompt_variant (str): Key into PROMPT_VARIANTS for the new explanations
+        max_workers (int): Concurrent API calls
+        chunk_rows (int): Rows per streamed chunk
+        extra_csvs (tuple): Other datasets with an explanation column to update (e.g. the final feedback CSV)
+        compact_dir (str): Compact explanation store to repoint at the new texts, if it exists
+        force (bool): Also regenerate rows already regenerated since their latest rating
+        dry_run (bool): Only count what would be regenerated
+
+    Returns:
+        dict: Counts of selected, regenerated, failed and skipped rows
+    """
+    if not dry_run:
+        # Imported lazily: the OpenAI client requires an API key at import time
+        from src.explanation.llm_narrative_openai import generate_explanation_series
+
+    summary = {"selected": 0, "regenerated": 0, "failed": 0, "skipped": 0}
+    if not plan:
+        return summary
+    updates = {}
+    tmp_path = processed_csv + ".tmp"
+    reader = pd.read_csv(processed_csv, chunksize=chunk_rows, dtype=str, keep_default_na=False)
+    for i, chunk in enumerate(reader):
+        hit = chunk["transaction_id"].isin(plan.transaction_ids) | chunk["rule_based_factors"].isin(plan.signatures)
+        # Non-fraud rows carry a fixed skip message, nothing to regenerate
+        hit &= chunk["fraud_prediction"].astype(float) == 1
+        selected = chunk[hit]
+        if not selected.empty and not force:
+            stale = _stale(selected, store, cache)
+            summary["skipped"] += int((~stale).sum())
+            selected = selected[stale]
+        summary["selected"] += len(selected)
+
+        if not selected.empty and not dry_run:
+            ids = selected["transaction_id"].tolist()
+            # Rebuild the same validated input rows the LLM stage saw
+            rows = validate_fraud_frame(selected[ALL_COLUMNS].reset_index(drop=True))
+            explanations = generate_explanation_series(rows, model=model, max_workers=max_workers,
+                                                       prompt_variant=prompt_variant, cache=cache,
+                                                       refresh=True).to_numpy()
+            ok = ~pd.Series(explanations).str.startswith(ERROR_PREFIX).to_numpy()
+            done = [tid for tid, good in zip(ids, ok) if good]
+            chunk.loc[selected.index[ok], "explanation"] = explanations[ok]
+            updates.update(zip(done, explanations[ok]))
+            # Overrides: later pipeline runs serve these instead of generating with their own prompt
+            cache.mark_regenerated(done, model, prompt_variant, explanations[ok].tolist())
+            summary["regenerated"] += len(done)
+            summary["failed"] += int((~ok).sum())
+
+        if not dry_run:
+            chunk.to_csv(tmp_path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+
+    if dry_run:
+        return summary
+    if updates:
+        os.replace(tmp_path, processed_csv)
+        for path in extra_csvs:
+            _rewrite_explanations(path, updates, chunk_rows)
+        if compact_dir and os.path.exists(os.path.join(compact_dir, "meta.json")):
+            update_explanations(compact_dir, updates)
+    elif os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    METRICS.incr("llm_regenerated", summary["regenerated"])
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Regenerate explanations that SMEs rated poorly.")
+    parser.add_argument("--by", choices=["transaction", "signature"], default="transaction")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Ratings below this are bad (per-dimension flags override)")
+    parser.add_argument("--clarity", type=float)
+    parser.add_argument("--accuracy", type=float)
+    parser.add_argument("--actionability", type=float)
+    parser.add_argument("--min-ratings", type=int, default=1, help="Ratings a signature needs (--by signature)")
+    parser.add_argument("--feedback-model", default=ALL, help="Only use feedback on this model's explanations")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="Model for the regenerated explanations")
+    parser.add_argument("--prompt-variant", default="detailed")
+    parser.add_argument("--processed-csv", default="data/processed/fraud_model_processed.csv")
+    parser.add_argument("--final-csv", default="data/final/fraud_explainability.csv")
+    parser.add_argument("--compact-dir", default=COMPACT_DIR)
+    parser.add_argument("--feedback-db", default=FEEDBACK_DB)
+    parser.add_argument("--cache-db", default=EXPLANATION_CACHE_DB)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument("--force", action="store_true", help="Include rows already regenerated since their rating")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    store = FeedbackStore(args.feedback_db)
+    thresholds = rating_thresholds(args.threshold, args.clarity, args.accuracy, args.actionability)
+    plan = select_low_rated(store, thresholds, by=args.by, model=args.feedback_model, min_ratings=args.min_ratings)
+    print(f"Selected {len(plan.transaction_ids)} transactions and {len(plan.signatures)} signature groups")
+    result = regenerate_explanations(
+        plan, args.processed_csv, store, ExplanationCache(args.cache_db), model=args.model,
+        prompt_variant=args.prompt_variant, max_workers=args.workers, chunk_rows=args.chunk_rows,
+        extra_csvs=(args.final_csv,), force=args.force, dry_run=args.dry_run, compact_dir=args.compact_dir,
+    )
+    print(", ".join(f"{k}: {v}" for k, v in result.items()))
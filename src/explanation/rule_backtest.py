@@ -0,0 +1,273 @@
+# src/explanation/rule_backtest.py
+"""
+Vectorized backtest and threshold sweep for the rule engine.
+
+Each rule column is sorted once. For any list of thresholds, the rows a
+rule flags (and how many of them the model also predicts as fraud) are then
+a single np.searchsorted call. "Any rule fired" over the whole grid of
+(high amount, high score, velocity) thresholds comes from one cumulative
+histogram over the rows that no threshold-free rule flags. The cost is one
+pass over the data plus the size of the grid, so thousands of combinations
+over millions of rows take seconds.
+
+Rules evaluated (defaults are the thresholds in rules.py):
+    high_transaction_amount     transaction_amount > high_amount
+    large_amount_geo_mismatch   transaction_amount > large_amount and geo_mismatch
+    high_fraud_score            fraud_score >= high_score
+    high_velocity_flag          high_velocity_flag, or velocity_1h > velocity when swept
+    geo_mismatch, device_fingerprint_changed (no threshold)
+
+Usage:
+    python -m src.explanation.rule_backtest data/processed/fraud_model_processed.csv \\
+        --high-amount 2500:10000:250 --high-score 0.5:0.95:0.01 --velocity 1:10:1
+"""
+
+import os
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+from src.explanation.rules import HIGH_AMOUNT_THRESHOLD, LARGE_AMOUNT_THRESHOLD, HIGH_SCORE_THRESHOLD
+
+BACKTEST_PATH = os.path.join("data", "processed", "rule_backtest.csv")
+THRESHOLD_RULES = {
+    "high_amount": "high_transaction_amount",
+    "large_amount": "large_amount_geo_mismatch",
+    "high_score": "high_fraud_score",
+    "velocity": "high_velocity_flag",
+}
+FIXED_RULES = ["geo_mismatch", "device_fingerprint_changed"]
+BACKTEST_COLUMNS = ["transaction_amount", "fraud_score", "geo_mismatch", "device_fingerprint_changed",
+                    "high_velocity_flag", "velocity_1h"]
+
+
+class _SortedColumn:
+    """One rule column sorted once, for all rows and for the positive rows."""
+
+    def __init__(self, values: np.ndarray, label: np.ndarray):
+        self.all = np.sort(values)
+        self.positive = np.sort(values[label])
+
+    def count_above(self, thresholds: np.ndarray, strict: bool = True) -> tuple:
+        """(flagged, positives flagged) per threshold for value > t (or >= t)."""
+        side = "right" if strict else "left"
+        return (len(self.all) - np.searchsorted(self.all, thresholds, side),
+                len(self.positive) - np.searchsorted(self.positive, thresholds, side))
+
+
+def _grid(values, default) -> np.ndarray:
+    values = [default] if values is None else np.atleast_1d(values)
+    return np.unique(np.asarray(values, dtype=np.float64))
+
+
+def _flag(values) -> np.ndarray:
+    """
+    Boolean rule input as a bool array. Text values ("True"/"false", e.g. a
+    CSV read as strings) compare case-insensitively to "true" or "1", so
+    "False" is not truthy; numbers are true when equal to 1.
+    """
+    values = np.asarray(values)
+    if values.dtype.kind in "OSU":
+        return np.isin(np.char.lower(values.astype(str)), ["true", "1", "1.0"])
+    return values.astype(np.float64) == 1
+
+
+def _ratio(num, den) -> np.ndarray:
+    num, den = np.asarray(num, dtype=np.float64), np.asarray(den, dtype=np.float64)
+    return np.divide(num, den, out=np.full(np.broadcast(num, den).shape, np.nan), where=den > 0)
+
+
+class RuleBacktest:
+    """
+    Precomputed sorted indexes over the rule inputs, evaluated against any
+    grid of thresholds with `sweep`.
+    """
+
+    def __init__(self, amount, score, geo, device, velocity_flag, velocity=None, label=None):
+        """
+        Args:
+            amount, score (array): transaction_amount and fraud_score
+            geo, device, velocity_flag (array): geo_mismatch, device_fingerprint_changed, high_velocity_flag
+                (bool, 0/1 or "True"/"False" text)
+            velocity (array): velocity_1h; needed only to sweep the velocity threshold
+            label (array): Reference outcome for overlap/precision/recall (fraud_prediction == 1)
+        """
+        amount = np.asarray(amount, dtype=np.float64)
+        score = np.asarray(score, dtype=np.float64)
+        geo, device, velocity_flag = _flag(geo), _flag(device), _flag(velocity_flag)
+        label = np.zeros(len(amount), dtype=bool) if label is None else _flag(label)
+
+        self.n_rows = len(amount)
+        self.n_positive = int(label.sum())
+        self._amount = _SortedColumn(amount, label)
+        self._score = _SortedColumn(score, label)
+        self._geo_amount = _SortedColumn(amount[geo], label[geo])
+        self._velocity = _SortedColumn(np.asarray(velocity, dtype=np.float64), label) if velocity is not None else None
+        self._fixed = {
+            "geo_mismatch": (int(geo.sum()), int((geo & label).sum())),
+            "device_fingerprint_changed": (int(device.sum()), int((device & label).sum())),
+            "high_velocity_flag": (int(velocity_flag.sum()), int((velocity_flag & label).sum())),
+        }
+
+        # Only rows no threshold-free rule flags can change "any rule fired".
+        # large_amount_geo_mismatch implies geo_mismatch, so it never does.
+        free = ~(geo | device)
+        self._free_amount = amount[free]
+        self._free_score = score[free]
+        self._free_label = label[free]
+        self._free_velocity = np.asarray(velocity, dtype=np.float64)[free] if velocity is not None else None
+        self._free_velocity_flag = velocity_flag[free]
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, label_col: str = "fraud_prediction") -> "RuleBacktest":
+        return cls(
+            df["transaction_amount"].to_numpy(), df["fraud_score"].to_numpy(), df["geo_mismatch"].to_numpy(),
+            df["device_fingerprint_changed"].to_numpy(), df["high_velocity_flag"].to_numpy(),
+            velocity=df["velocity_1h"].to_numpy() if "velocity_1h" in df.columns else None,
+            label=df[label_col].to_numpy() if label_col else None,
+        )
+
+    @classmethod
+    def from_csv(cls, path: str, label_col: str = "fraud_prediction", chunk_rows: int = 1_000_000) -> "RuleBacktest":
+        """
+        Read only the rule columns (and the label), chunk by chunk, so memory
+        stays at a few numeric arrays regardless of how wide the file is.
+        """
+        columns = BACKTEST_COLUMNS + ([label_col] if label_col else [])
+        parts = {c: [] for c in columns}
+        for chunk in pd.read_csv(path, usecols=lambda c: c in columns, chunksize=chunk_rows):
+            for c in chunk.columns:
+                parts[c].append(chunk[c].to_numpy())
+        return cls.from_frame(pd.DataFrame({c: np.concatenate(v) for c, v in parts.items() if v}), label_col)
+
+    def _per_rule(self, rule: str, flagged, overlap) -> dict:
+        return {
+            f"{rule}_flagged": np.asarray(flagged),
+            f"{rule}_overlap": np.asarray(overlap),
+            f"{rule}_precision": _ratio(overlap, flagged),
+            f"{rule}_recall": _ratio(overlap, self.n_positive),
+        }
+
+    def _not_flagged(self, amounts: np.ndarray, scores: np.ndarray, velocities) -> tuple:
+        """
+        Rows (and positive rows) among the free rows that no threshold rule
+        flags, for every (amount, score, velocity) combination: bin each row by
+        how many thresholds it clears, then a cumulative sum over each axis.
+        """
+        # Row is below amount threshold i iff i >= its bin (amount <= t); likewise score < t and velocity <= t
+        a_bin = np.searchsorted(amounts, self._free_amount, "left")
+        s_bin = np.searchsorted(scores, self._free_score, "right")
+        if velocities is None:
+            v_bin = np.zeros(len(a_bin), dtype=np.int64)
+            keep = ~self._free_velocity_flag
+            shape = (len(amounts) + 1, len(scores) + 1, 1)
+        else:
+            v_bin = np.searchsorted(velocities, self._free_velocity, "left")
+            keep = np.ones(len(a_bin), dtype=bool)
+            shape = (len(amounts) + 1, len(scores) + 1, len(velocities) + 1)
+
+        flat = np.ravel_multi_index((a_bin[keep], s_bin[keep], v_bin[keep]), shape)
+        size = int(np.prod(shape))
+        counts = [np.bincount(flat, minlength=size), np.bincount(flat[self._free_label[keep]], minlength=size)]
+        out = []
+        for c in counts:
+            c = c.reshape(shape).cumsum(0).cumsum(1).cumsum(2)
+            out.append(c[:len(amounts), :len(scores), :(len(velocities) if velocities is not None else 1)])
+        return out[0], out[1]
+
+    def sweep(self, high_amount=None, large_amount=None, high_score=None, velocity=None) -> pd.DataFrame:
+        """
+        Evaluate every combination of the given thresholds (each a scalar or a
+        list; omitted ones stay at the rules.py value, and the velocity rule
+        keeps using high_velocity_flag unless `velocity` is given).
+
+        Returns:
+            pd.DataFrame: One row per combination with the thresholds, per-rule
+            flagged / overlap / precision / recall, and the same for any rule fired
+        """
+        amounts = _grid(high_amount, HIGH_AMOUNT_THRESHOLD)
+        larges = _grid(large_amount, LARGE_AMOUNT_THRESHOLD)
+        scores = _grid(high_score, HIGH_SCORE_THRESHOLD)
+        velocities = None
+        if velocity is not None:
+            if self._velocity is None:
+                raise ValueError("velocity_1h is required to sweep the velocity threshold")
+            velocities = _grid(velocity, 0)
+
+        # Grid axes: (high_amount, large_amount, high_score, velocity)
+        dims = (len(amounts), len(larges), len(scores), len(velocities) if velocities is not None else 1)
+
+        def axis(values, i):
+            shape = [1] * 4
+            shape[i] = -1
+            return np.broadcast_to(np.asarray(values).reshape(shape), dims).ravel()
+
+        columns = {"high_amount": axis(amounts, 0), "large_amount": axis(larges, 1), "high_score": axis(scores, 2)}
+        if velocities is not None:
+            columns["velocity"] = axis(velocities, 3)
+
+        flagged, overlap = self._amount.count_above(amounts)
+        columns.update(self._per_rule("high_transaction_amount", axis(flagged, 0), axis(overlap, 0)))
+        flagged, overlap = self._geo_amount.count_above(larges)
+        columns.update(self._per_rule("large_amount_geo_mismatch", axis(flagged, 1), axis(overlap, 1)))
+        flagged, overlap = self._score.count_above(scores, strict=False)
+        columns.update(self._per_rule("high_fraud_score", axis(flagged, 2), axis(overlap, 2)))
+        if velocities is None:
+            flagged, overlap = self._fixed["high_velocity_flag"]
+            columns.update(self._per_rule("high_velocity_flag", np.full(np.prod(dims), flagged),
+                                          np.full(np.prod(dims), overlap)))
+        else:
+            flagged, overlap = self._velocity.count_above(velocities)
+            columns.update(self._per_rule("high_velocity_flag", axis(flagged, 3), axis(overlap, 3)))
+        for rule in FIXED_RULES:
+            flagged, overlap = self._fixed[rule]
+            columns.update(self._per_rule(rule, np.full(np.prod(dims), flagged), np.full(np.prod(dims), overlap)))
+
+        quiet, quiet_positive = self._not_flagged(amounts, scores, velocities)
+        # Insert the large_amount axis, which does not affect the union
+        quiet = np.broadcast_to(quiet[:, None, :, :], dims).ravel()
+        quiet_positive = np.broadcast_to(quiet_positive[:, None, :, :], dims).ravel()
+        columns["any_flagged"] = self.n_rows - quiet
+        columns["any_overlap"] = self.n_positive - quiet_positive
+        columns["precision"] = _ratio(columns["any_overlap"], columns["any_flagged"])
+        columns["recall"] = _ratio(columns["any_overlap"], self.n_positive)
+        return pd.DataFrame(columns)
+
+
+def parse_grid(text: str) -> np.ndarray:
+    """ "start:stop:step" (stop inclusive) or a comma-separated list. """
+    if ":" in text:
+        start, stop, step = (float(p) for p in text.split(":"))
+        return np.round(np.arange(start, stop + step / 2, step), 10)
+    return np.asarray([float(v) for v in text.split(",")])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest rule thresholds over a processed or raw dataset.")
+    parser.add_argument("csv", nargs="?", default="data/processed/fraud_model_processed.csv")
+    parser.add_argument("--high-amount", type=parse_grid, help="e.g. 2500:10000:250")
+    parser.add_argument("--large-amount", type=parse_grid)
+    parser.add_argument("--high-score", type=parse_grid, help="e.g. 0.5:0.95:0.01")
+    parser.add_argument("--velocity", type=parse_grid, help="Sweep velocity_1h > t instead of high_velocity_flag")
+    parser.add_argument("--label-col", default="fraud_prediction")
+    parser.add_argument("--output", default=BACKTEST_PATH)
+    parser.add_argument("--top", type=int, default=10, help="Show the combinations with the best F1")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    backtest = RuleBacktest.from_csv(args.csv, label_col=args.label_col)
+    indexed = time.perf_counter()
+    results = backtest.sweep(args.high_amount, args.large_amount, args.high_score, args.velocity)
+    swept = time.perf_counter()
+    print(f"Indexed {backtest.n_rows:,} rows in {indexed - start:.2f}s; "
+          f"evaluated {len(results):,} combinations in {swept - indexed:.2f}s")
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    results.to_csv(args.output, index=False)
+    print(f"Backtest results saved at {args.output}")
+
+    f1 = 2 * results["precision"] * results["recall"] / (results["precision"] + results["recall"])
+    shown = [c for c in ["high_amount", "large_amount", "high_score", "velocity"] if c in results.columns]
+    shown += ["any_flagged", "any_overlap", "precision", "recall"]
+    print(results.assign(f1=f1).nlargest(args.top, "f1")[shown + ["f1"]].to_string(index=False))
@@ -0,0 +1,139 @@
+# src/explanation/rules.py
+
+import numpy as np
+import pandas as pd
+
+# -----------------------------
+# Rule thresholds
+# -----------------------------
+HIGH_AMOUNT_THRESHOLD = 5000
+LARGE_AMOUNT_THRESHOLD = 10000
+HIGH_SCORE_THRESHOLD = 0.8
+
+# -----------------------------
+# Reason keys, labels and bit positions
+# -----------------------------
+# Order is significant: it fixes each reason's bit in the mask and the label order.
+REASON_LABELS = {
+    "high_transaction_amount": "High Transaction Amount",
+    "geo_mismatch": "Geo Mismatch",
+    "device_fingerprint_changed": "Device Fingerprint Changed",
+    "high_velocity_flag": "High Velocity",
+    "high_fraud_score": "High Fraud Score",
+    "large_amount_geo_mismatch": "Large Amount + Geo Mismatch",
+}
+REASON_KEYS = list(REASON_LABELS)
+REASON_BITS = {key: np.uint16(1 << i) for i, key in enumerate(REASON_KEYS)}
+NO_REASON_LABEL = "No notable patterns"
+
+
+def _column(df: pd.DataFrame, name: str, dtype) -> np.ndarray:
+    if name not in df.columns:
+        return np.zeros(len(df), dtype=dtype)
+    return df[name].to_numpy(dtype=dtype)
+
+
+# -----------------------------
+# Vectorized rule evaluation
+# -----------------------------
+def compute_reason_mask(df: pd.DataFrame) -> np.ndarray:
+    """
+    Evaluate every rule over the whole frame at once.
+
+    Same rules as generate_rule_based_reasons, but one NumPy pass per rule
+    instead of one Python call per row.
+
+    Args:
+        df (pd.DataFrame): Validated transactions
+
+    Returns:
+        np.ndarray: uint16 bitmask per row (bit i set = REASON_KEYS[i] applies)
+    """
+    amount = _column(df, "transaction_amount", np.float64)
+    geo = _column(df, "geo_mismatch", np.int64) == 1
+
+    mask = np.zeros(len(df), dtype=np.uint16)
+    mask |= np.where(amount > HIGH_AMOUNT_THRESHOLD, REASON_BITS["high_transaction_amount"], 0).astype(np.uint16)
+    mask |= np.where(geo, REASON_BITS["geo_mismatch"], 0).astype(np.uint16)
+    mask |= np.where(_column(df, "device_fingerprint_changed", bool), REASON_BITS["device_fingerprint_changed"], 0).astype(np.uint16)
+    mask |= np.where(_column(df, "high_velocity_flag", np.int64) == 1, REASON_BITS["high_velocity_flag"], 0).astype(np.uint16)
+    mask |= np.where(_column(df, "fraud_score", np.float64) >= HIGH_SCORE_THRESHOLD, REASON_BITS["high_fraud_score"], 0).astype(np.uint16)
+    mask |= np.where((amount > LARGE_AMOUNT_THRESHOLD) & geo, REASON_BITS["large_amount_geo_mismatch"], 0).astype(np.uint16)
+    return mask
+
+
+def reason_mask_for_record(record: dict) -> int:
+    """
+    Scalar form of compute_reason_mask for one validated record, for
+    single-transaction callers where building a frame would dominate.
+    """
+    amount = float(record.get("transaction_amount", 0))
+    geo = int(record.get("geo_mismatch", 0)) == 1
+    mask = 0
+    if amount > HIGH_AMOUNT_THRESHOLD:
+        mask |= int(REASON_BITS["high_transaction_amount"])
+    if geo:
+        mask |= int(REASON_BITS["geo_mismatch"])
+    if bool(record.get("device_fingerprint_changed", False)):
+        mask |= int(REASON_BITS["device_fingerprint_changed"])
+    if int(record.get("high_velocity_flag", 0)) == 1:
+        mask |= int(REASON_BITS["high_velocity_flag"])
+    if float(record.get("fraud_score", 0)) >= HIGH_SCORE_THRESHOLD:
+        mask |= int(REASON_BITS["high_fraud_score"])
+    if amount > LARGE_AMOUNT_THRESHOLD and geo:
+        mask |= int(REASON_BITS["large_amount_geo_mismatch"])
+    return mask
+
+
+def reason_keys_from_mask(mask: int) -> list:
+    """
+    Decode one bitmask into its list of reason keys.
+    """
+    return [key for key in REASON_KEYS if int(mask) & int(REASON_BITS[key])]
+
+
+def format_reason_labels(mask: np.ndarray) -> np.ndarray:
+    """
+    Turn bitmasks into the comma-joined, human-readable factor strings.
+    Each distinct mask is formatted once (there are at most 2**len(REASON_KEYS)).
+    """
+    unique_masks, inverse = np.unique(mask, return_inverse=True)
+    labels = np.array([format_reason_label(m) for m in unique_masks], dtype=object)
+    return labels[inverse]
+
+
+def reason_label_categorical(mask: np.ndarray) -> pd.Categorical:
+    """
+    Factor strings as a Categorical: small integer codes into the distinct
+    labels, so a frame never holds one label string per row.
+    """
+    unique_masks, inverse = np.unique(mask, return_inverse=True)
+    return pd.Categorical.from_codes(inverse.reshape(-1), categories=[format_reason_label(m) for m in unique_masks])
+
+
+def format_reason_label(mask: int) -> str:
+    """
+    Factor string for a single bitmask.
+    """
+    return ", ".join(REASON_LABELS[k] for k in reason_keys_from_mask(mask)) or NO_REASON_LABEL
+
+
+def reason_mask_from_labels(labels) -> np.ndarray:
+    """
+    Inverse of format_reason_labels, for outputs that only kept the factor
+    strings. Each distinct string is parsed once.
+    """
+    bits_by_label = {label: REASON_BITS[key] for key, label in REASON_LABELS.items()}
+    unique_labels, inverse = np.unique(np.asarray(labels, dtype=str), return_inverse=True)
+    masks = np.array([
+        sum(int(bits_by_label.get(part.strip(), 0)) for part in label.split(","))
+        for label in unique_labels
+    ], dtype=np.uint16)
+    return masks[inverse]
+
+
+def compute_rule_based_factors(df: pd.DataFrame) -> pd.Series:
+    """
+    Rule-based factor labels for every row of df (Task 2).
+    """
+    return pd.Series(format_reason_labels(compute_reason_mask(df)), index=df.index, name="rule_based_factors")
@@ -0,0 +1,166 @@
+# src/explanation/shap_cache.py
+
+import os
+import json
+import time
+import pickle
+import hashlib
+import tempfile
+import pandas as pd
+import shap
+from src.metrics import METRICS
+
+# -----------------------------
+# Cache location
+# -----------------------------
+SHAP_CACHE_DIR = os.path.join("data", "cache", "shap")
+DEFAULT_BACKGROUND_SIZE = 100
+
+
+# -----------------------------
+# Model + schema fingerprint
+# -----------------------------
+def model_fingerprint(model, X: pd.DataFrame, model_path: str = None, vocabulary: str = None) -> str:
+    """
+    Hash the model artifact together with the feature schema.
+
+    Args:
+        model: Trained ML model
+        X (pd.DataFrame): Feature DataFrame (only column names and dtypes are used)
+        model_path (str): Optional path to the serialized model artifact.
+            When given, the file bytes are hashed instead of re-pickling the model.
+        vocabulary (str): Fingerprint of the categorical encoders that built X
+            (FeatureMatrix.vocabulary); the background's codes depend on it
+
+    Returns:
+        str: Hex fingerprint that changes whenever the model or schema changes
+    """
+    hasher = hashlib.sha256()
+
+    if model_path and os.path.exists(model_path):
+        with open(model_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                hasher.update(block)
+    else:
+        hasher.update(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL))
+
+    schema = [[str(col), str(dtype)] for col, dtype in X.dtypes.items()]
+    hasher.update(json.dumps(schema).encode("utf-8"))
+    if vocabulary:
+        hasher.update(vocabulary.encode("utf-8"))
+    # Explainer pickles are only valid for the SHAP version that wrote them
+    hasher.update(shap.__version__.encode("utf-8"))
+    return hasher.hexdigest()[:24]
+
+
+# -----------------------------
+# Build or load explainer
+# -----------------------------
+def load_or_build_explainer(
+    model,
+    X: pd.DataFrame,
+    cache_dir: str = SHAP_CACHE_DIR,
+    model_path: str = None,
+    background_size: int = DEFAULT_BACKGROUND_SIZE,
+    vocabulary: str = None,
+):
+    """
+    Return a SHAP explainer for the model, reusing a cached one when the
+    model fingerprint matches.
+
+    Args:
+        model: Trained ML model
+        X (pd.DataFrame): Feature DataFrame used to build the background summary
+        cache_dir (str): Directory holding cached explainers
+        model_path (str): Optional model artifact path used for fingerprinting
+        background_size (int): Number of rows kept in the background summary
+        vocabulary (str): Fingerprint of the encoders that built X (see model_fingerprint)
+
+    Returns:
+        tuple: (explainer, info) where info reports cache_hit, fingerprint,
+        build_seconds (time the cached explainer originally took to build)
+        and load_seconds (time spent on this call)
+    """
+    start = time.perf_counter()
+    fingerprint = model_fingerprint(model, X, model_path=model_path, vocabulary=vocabulary)
+    cache_path = os.path.join(cache_dir, f"explainer_{fingerprint}.pkl")
+
+    if os.path.exists(cache_path):
+        try:
+            with open(cache_path, "rb") as f:
+                cached = pickle.load(f)
+            METRICS.cache("shap_explainer", hit=True)
+            info = {
+                "cache_hit": True,
+                "fingerprint": fingerprint,
+                "build_seconds": cached["build_seconds"],
+                "load_seconds": time.perf_counter() - start,
+                "cache_path": cache_path,
+            }
+            print(f"Loaded cached SHAP explainer {fingerprint} in {info['load_seconds']:.3f}s "
+                  f"(original build {info['build_seconds']:.3f}s)")
+            return cached["explainer"], info
+        except Exception as e:
+            # Corrupt or incompatible cache entry: rebuild below
+            print(f"Warning: could not load cached SHAP explainer ({e}). Rebuilding.")
+
+    METRICS.cache("shap_explainer", hit=False)
+    # Summarize the background so the cached explainer stays small
+    background = shap.utils.sample(X, min(background_size, len(X)), random_state=0)
+    explainer = shap.Explainer(model, background)
+    build_seconds = time.perf_counter() - start
+
+    entry = {
+        "fingerprint": fingerprint,
+        "explainer": explainer,
+        "background": background,
+        "expected_value": getattr(explainer, "expected_value", None),
+        "feature_names": list(X.columns),
+        "build_seconds": build_seconds,
+    }
+    tmp_path = None
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        # A private temp file per writer: concurrent builders (e.g. shard workers) never interleave bytes,
+        # and the last complete pickle wins the rename
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, prefix=f"explainer_{fingerprint}.", suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except Exception as e:
+        print(f"Warning: SHAP explainer could not be cached ({e}).")
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    info = {
+        "cache_hit": False,
+        "fingerprint": fingerprint,
+        "build_seconds": build_seconds,
+        "load_seconds": 0.0,
+        "cache_path": cache_path,
+    }
+    print(f"Built SHAP explainer {fingerprint} in {build_seconds:.3f}s")
+    return explainer, info
+
+
+# -----------------------------
+# Cache maintenance
+# -----------------------------
+def clear_explainer_cache(cache_dir: str = SHAP_CACHE_DIR, keep: str = None) -> int:
+    """
+    Remove cached explainers, optionally keeping the one for a given fingerprint.
+
+    Returns:
+        int: Number of cache files removed
+    """
+    if not os.path.isdir(cache_dir):
+        return 0
+    removed = 0
+    for name in os.listdir(cache_dir):
+        if not name.startswith("explainer_"):
+            continue
+        if keep and name == f"explainer_{keep}.pkl":
+            continue
+        os.remove(os.path.join(cache_dir, name))
+        removed += 1
+    return removed
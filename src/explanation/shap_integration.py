@@ -1,19 +1,30 @@
 import shap
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
+from src.explanation.shap_cache import load_or_build_explainer
+from src.explanation.shap_store import ShapMatrixStore, SHAP_STORE_DIR
 
-def compute_shap_values(model, X: pd.DataFrame):
+def compute_shap_values(model, X: pd.DataFrame, cache_dir: str = None, model_path: str = None, vocabulary: str = None):
     """
     Compute SHAP values for the given model and feature DataFrame.
 
     Args:
         model: Trained ML model (e.g., XGBoost, RandomForest, LightGBM)
         X (pd.DataFrame): Feature DataFrame used for predictions
+        cache_dir (str): Optional explainer cache directory. When set, the explainer
+            is reused across runs until the model or feature schema changes.
+        model_path (str): Optional model artifact path used to fingerprint the cache
+        vocabulary (str): Fingerprint of the encoders that built X, part of the cache key
 
     Returns:
         shap.Explanation: SHAP values object
     """
-    explainer = shap.Explainer(model, X)
+    if cache_dir:
+        explainer, _ = load_or_build_explainer(model, X, cache_dir=cache_dir, model_path=model_path,
+                                               vocabulary=vocabulary)
+    else:
+        explainer = shap.Explainer(model, X)
     shap_values = explainer(X)
     return shap_values
 
@@ -34,6 +45,15 @@ def plot_local_waterfall(shap_values, transaction_index: int):
     shap.plots.waterfall(shap_values[transaction_index])
 
 
+def plot_local_waterfall_from_store(transaction_id: str, store_dir: str = SHAP_STORE_DIR):
+    """
+    Plot waterfall for a single transaction served from the on-disk SHAP store,
+    without recomputing SHAP or loading the full matrix.
+    """
+    store = ShapMatrixStore(store_dir)
+    shap.plots.waterfall(store.explanation(transaction_id))
+
+
 def get_top_features_per_transaction(shap_values, X: pd.DataFrame, transaction_index: int, top_n: int = 5):
     """
     Return top N contributing features for a transaction.
@@ -42,24 +62,47 @@ def get_top_features_per_transaction(shap_values, X: pd.DataFrame, transaction_i
         raise IndexError("transaction_index out of range for SHAP values")
 
     sv = shap_values.values[transaction_index]
+    if sv.ndim == 2:
+        # Classifier output: explain the positive (fraud) class
+        sv = sv[:, -1]
     feature_names = X.columns
     feature_contributions = list(zip(feature_names, sv))
     feature_contributions.sort(key=lambda x: abs(x[1]), reverse=True)
     return feature_contributions[:top_n]
 
 
-def get_top_features_df(shap_values, X: pd.DataFrame, top_n: int = 5) -> pd.DataFrame:
+def top_feature_indices(values: np.ndarray, top_n: int = 5):
     """
-    Return a DataFrame of top contributing features for each transaction.
+    Top-N features per row as (int16 feature indices, float32 SHAP values),
+    each of shape (rows, top_n). Same ordering as get_top_features_per_transaction
+    (descending |SHAP|, stable on ties).
     """
-    all_top_features = []
+    values = np.asarray(values)
+    if values.ndim == 3:
+        values = values[:, :, -1]
+    top_n = min(top_n, values.shape[1])
+    order = np.argsort(-np.abs(values), axis=1, kind="stable")[:, :top_n]
+    return order.astype(np.int16), np.take_along_axis(values, order, axis=1).astype(np.float32)
 
-    for idx in range(len(shap_values)):
-        top_features = get_top_features_per_transaction(shap_values, X, idx, top_n)
-        row = {"transaction_index": idx}
-        for i, (feature, value) in enumerate(top_features, start=1):
-            row[f"top_feature_{i}"] = feature
-            row[f"top_feature_value_{i}"] = value
-        all_top_features.append(row)
 
-    return pd.DataFrame(all_top_features)
+def top_features_from_values(values: np.ndarray, feature_names: list, top_n: int = 5) -> pd.DataFrame:
+    """
+    Vectorized top-N features for a whole SHAP matrix (rows x features).
+    Feature names are Categoricals over feature_names (int codes, no per-row
+    strings) and values are float32.
+    """
+    idx, top_values = top_feature_indices(values, top_n)
+    names = list(feature_names)
+
+    columns = {"transaction_index": np.arange(len(idx))}
+    for i in range(idx.shape[1]):
+        columns[f"top_feature_{i + 1}"] = pd.Categorical.from_codes(idx[:, i], categories=names)
+        columns[f"top_feature_value_{i + 1}"] = top_values[:, i]
+    return pd.DataFrame(columns)
+
+
+def get_top_features_df(shap_values, X: pd.DataFrame, top_n: int = 5) -> pd.DataFrame:
+    """
+    Return a DataFrame of top contributing features for each transaction.
+    """
+    return top_features_from_values(shap_values.values, list(X.columns), top_n=top_n)
@@ -0,0 +1,301 @@
+# src/explanation/shap_store.py
+
+import os
+import json
+import shutil
+import numpy as np
+import shap
+
+from src.explanation.compact import encode_ids, fits_id_width, id_width_for
+
+# -----------------------------
+# Store layout
+# -----------------------------
+# <store_dir>/
+#   meta.json         feature names, row count, id width
+#   values.f32        (n_rows, n_features) SHAP values, row-major float32
+#   base_values.f32   (n_rows,) expected value per row
+#   data.f32          (n_rows, n_features) feature values used for the explanation
+#   ids.bin           (n_rows,) transaction ids in row order, fixed-width bytes
+#   index_ids.bin     transaction ids, sorted within each appended batch (segment)
+#   index_rows.i64    row number for each entry of index_ids.bin
+SHAP_STORE_DIR = os.path.join("data", "processed", "shap_store")
+DEFAULT_ID_WIDTH = 32
+
+
+def _positive_class(values: np.ndarray) -> np.ndarray:
+    """Keep the positive-class slice of multi-output SHAP arrays."""
+    values = np.asarray(values)
+    if values.ndim == 3:
+        return values[:, :, -1]
+    return values
+
+
+# -----------------------------
+# Writer (supports chunked appends)
+# -----------------------------
+class ShapStoreWriter:
+    """
+    Append SHAP results to an on-disk float32 store, one batch at a time.
+    Each batch also appends a sorted index segment, so writing never needs
+    more memory than one batch, whatever the total row count. Segments that
+    continue the previous one's order (e.g. ids arriving sorted) are
+    coalesced on close.
+    """
+
+    def __init__(self, store_dir: str, feature_names: list, id_width: int = DEFAULT_ID_WIDTH):
+        self.store_dir = store_dir
+        self.feature_names = [str(f) for f in feature_names]
+        self.id_width = id_width
+        self.n_rows = 0
+        self.has_data = True
+        os.makedirs(store_dir, exist_ok=True)
+        self._files = {
+            name: open(os.path.join(store_dir, name), "wb")
+            for name in ("values.f32", "base_values.f32", "data.f32", "ids.bin", "index_ids.bin", "index_rows.i64")
+        }
+        self.segments = []
+
+    def append(self, shap_values, transaction_ids, data=None):
+        """
+        Append one batch of SHAP values.
+
+        Args:
+            shap_values: shap.Explanation or array of shape (rows, features)
+            transaction_ids: Iterable of transaction ids aligned with the rows
+            data: Optional feature values; taken from the Explanation when omitted
+        """
+        if isinstance(shap_values, shap.Explanation):
+            values = _positive_class(shap_values.values)
+            base = np.asarray(shap_values.base_values)
+            if base.ndim == 2:
+                base = base[:, -1]
+            if data is None:
+                data = shap_values.data
+        else:
+            values = _positive_class(shap_values)
+            base = np.zeros(len(values))
+
+        values = np.ascontiguousarray(values, dtype=np.float32)
+        if values.shape[1] != len(self.feature_names):
+            raise ValueError(
+                f"SHAP batch has {values.shape[1]} features, store expects {len(self.feature_names)}"
+            )
+        ids = encode_ids(list(transaction_ids), self.id_width)
+        if len(ids) != len(values):
+            raise ValueError("transaction_ids must align with SHAP rows")
+
+        order = np.argsort(ids, kind="stable")
+        ids[order].tofile(self._files["index_ids.bin"])
+        (order.astype(np.int64) + self.n_rows).tofile(self._files["index_rows.i64"])
+        self.segments.append([self.n_rows, self.n_rows + len(ids)])
+
+        values.tofile(self._files["values.f32"])
+        np.broadcast_to(np.asarray(base, dtype=np.float32), (len(values),)).tofile(self._files["base_values.f32"])
+        ids.tofile(self._files["ids.bin"])
+
+        try:
+            data_arr = np.ascontiguousarray(np.asarray(data, dtype=np.float32)) if data is not None else None
+        except (TypeError, ValueError):
+            data_arr = None
+        if data_arr is None or data_arr.shape != values.shape:
+            # Non-numeric feature values: waterfalls are still served without them
+            self.has_data = False
+        else:
+            data_arr.tofile(self._files["data.f32"])
+
+        self.n_rows += len(values)
+
+    def close(self):
+        """Flush data files and write metadata."""
+        for f in self._files.values():
+            f.close()
+        self.segments = _coalesce_segments(self.store_dir, self.segments, self.id_width)
+
+        meta = {
+            "n_rows": self.n_rows,
+            "feature_names": self.feature_names,
+            "id_width": self.id_width,
+            "has_data": self.has_data,
+            "index_segments": self.segments,
+            "dtype": "float32",
+        }
+        with open(os.path.join(self.store_dir, "meta.json"), "w") as f:
+            json.dump(meta, f, indent=2)
+        print(f"SHAP store written at {self.store_dir} ({self.n_rows} rows x {len(self.feature_names)} features)")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def write_shap_store(shap_values, transaction_ids, feature_names: list, store_dir: str = SHAP_STORE_DIR):
+    """
+    Persist a full SHAP matrix in one call.
+
+    Args:
+        shap_values: shap.Explanation or array of shape (rows, features)
+        transaction_ids: Transaction ids aligned with the rows
+        feature_names (list): Column names of the SHAP matrix
+        store_dir (str): Output directory
+    """
+    transaction_ids = list(transaction_ids)
+    with ShapStoreWriter(store_dir, feature_names, id_width=id_width_for(transaction_ids)) as writer:
+        writer.append(shap_values, transaction_ids)
+    return store_dir
+
+
+def merge_shap_stores(store_dirs: list, out_dir: str, block_rows: int = 1_000_000) -> str:
+    """
+    Concatenate several SHAP stores (e.g. one per shard) in the given order.
+    Files are streamed block by block, so memory does not grow with store size.
+    """
+    metas = []
+    for store_dir in store_dirs:
+        with open(os.path.join(store_dir, "meta.json")) as f:
+            metas.append(json.load(f))
+    if not metas:
+        raise ValueError("No SHAP stores to merge")
+    for meta in metas[1:]:
+        if meta["feature_names"] != metas[0]["feature_names"] or meta["id_width"] != metas[0]["id_width"]:
+            raise ValueError("SHAP stores have different feature schemas and cannot be merged")
+
+    os.makedirs(out_dir, exist_ok=True)
+    has_data = all(m["has_data"] for m in metas)
+    names = ["values.f32", "base_values.f32", "ids.bin", "index_ids.bin"] + (["data.f32"] if has_data else [])
+    outputs = {name: open(os.path.join(out_dir, name), "wb") for name in names + ["index_rows.i64"]}
+    if not has_data:
+        open(os.path.join(out_dir, "data.f32"), "wb").close()
+
+    offset, segments = 0, []
+    try:
+        for store_dir, meta in zip(store_dirs, metas):
+            for name in names:
+                with open(os.path.join(store_dir, name), "rb") as src:
+                    shutil.copyfileobj(src, outputs[name], length=1 << 22)
+            rows = np.memmap(os.path.join(store_dir, "index_rows.i64"), dtype=np.int64, mode="r") \
+                if meta["n_rows"] else np.zeros(0, dtype=np.int64)
+            for start in range(0, len(rows), block_rows):
+                (rows[start:start + block_rows] + offset).tofile(outputs["index_rows.i64"])
+            segments.extend([start + offset, end + offset]
+                            for start, end in meta.get("index_segments", [[0, meta["n_rows"]]]))
+            offset += meta["n_rows"]
+    finally:
+        for f in outputs.values():
+            f.close()
+
+    segments = _coalesce_segments(out_dir, segments, metas[0]["id_width"])
+    merged = dict(metas[0], n_rows=offset, has_data=has_data, index_segments=segments)
+    with open(os.path.join(out_dir, "meta.json"), "w") as f:
+        json.dump(merged, f, indent=2)
+    print(f"SHAP store merged at {out_dir} ({offset} rows from {len(store_dirs)} stores)")
+    return out_dir
+
+
+def _coalesce_segments(store_dir: str, segments: list, id_width: int) -> list:
+    """
+    Join adjacent index segments whose boundary ids are in order (together
+    they are one sorted run), so lookups search fewer segments.
+    """
+    segments = [[start, end] for start, end in segments if end > start]
+    if len(segments) < 2:
+        return segments
+    index_ids = np.memmap(os.path.join(store_dir, "index_ids.bin"), dtype=f"S{id_width}", mode="r")
+    coalesced = [segments[0]]
+    for start, end in segments[1:]:
+        last = coalesced[-1]
+        if start == last[1] and index_ids[start - 1] <= index_ids[start]:
+            last[1] = end
+        else:
+            coalesced.append([start, end])
+    return coalesced
+
+
+# -----------------------------
+# Reader (memory-mapped)
+# -----------------------------
+class ShapMatrixStore:
+    """
+    Read-only view over a SHAP store. Arrays are memory-mapped, so opening a
+    store and looking up a single transaction never loads the full matrix.
+    """
+
+    def __init__(self, store_dir: str = SHAP_STORE_DIR):
+        with open(os.path.join(store_dir, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.store_dir = store_dir
+        self.feature_names = self.meta["feature_names"]
+        n_rows, n_features = self.meta["n_rows"], len(self.feature_names)
+        id_dtype = f"S{self.meta['id_width']}"
+
+        self.values = self._map("values.f32", np.float32, (n_rows, n_features))
+        self.base_values = self._map("base_values.f32", np.float32, (n_rows,))
+        self.data = self._map("data.f32", np.float32, (n_rows, n_features)) if self.meta["has_data"] else None
+        self._ids = self._map("ids.bin", id_dtype, (n_rows,))
+        self._index_ids = self._map("index_ids.bin", id_dtype, (n_rows,))
+        self._index_rows = self._map("index_rows.i64", np.int64, (n_rows,))
+
+    def _map(self, name, dtype, shape):
+        if shape[0] == 0:
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(os.path.join(self.store_dir, name), dtype=dtype, mode="r", shape=shape)
+
+    def __len__(self):
+        return self.meta["n_rows"]
+
+    def row_index(self, transaction_id) -> int:
+        """
+        Return the row number for a transaction id (binary search in each sorted
+        index segment; a single-shot store has exactly one segment).
+        """
+        if not fits_id_width(transaction_id, self.meta["id_width"]):
+            raise KeyError(f"transaction_id {transaction_id} not found in SHAP store")
+        key = encode_ids([transaction_id], self.meta["id_width"])[0]
+        for start, end in self.meta.get("index_segments", [[0, len(self)]]):
+            segment = self._index_ids[start:end]
+            pos = int(np.searchsorted(segment, key))
+            if pos < len(segment) and segment[pos] == key:
+                return int(self._index_rows[start + pos])
+        raise KeyError(f"transaction_id {transaction_id} not found in SHAP store")
+
+    def transaction_id(self, row: int) -> str:
+        return self._ids[row].decode("utf-8")
+
+    def explanation(self, transaction_id) -> shap.Explanation:
+        """
+        Build a single-row shap.Explanation from disk, suitable for waterfall plots.
+        """
+        row = self.row_index(transaction_id)
+        return shap.Explanation(
+            values=np.array(self.values[row]),
+            base_values=float(self.base_values[row]),
+            data=np.array(self.data[row]) if self.data is not None else None,
+            feature_names=self.feature_names,
+        )
+
+    def top_features(self, transaction_id, top_n: int = 5) -> list:
+        """
+        Return the top N (feature, SHAP value) pairs for one transaction.
+        """
+        sv = np.asarray(self.values[self.row_index(transaction_id)])
+        order = np.argsort(-np.abs(sv))[:top_n]
+        return [(self.feature_names[i], float(sv[i])) for i in order]
+
+    def feature_values(self, feature: str) -> np.ndarray:
+        """
+        Return the SHAP column for one feature as a memory-mapped (strided) view.
+        """
+        return self.values[:, self.feature_names.index(feature)]
+
+    def mean_abs_shap(self, chunk_rows: int = 1_000_000) -> dict:
+        """
+        Mean absolute SHAP value per feature, computed chunk by chunk so memory
+        stays bounded regardless of the number of rows.
+        """
+        totals = np.zeros(len(self.feature_names), dtype=np.float64)
+        for start in range(0, len(self), chunk_rows):
+            totals += np.abs(self.values[start:start + chunk_rows]).sum(axis=0, dtype=np.float64)
+        means = totals / max(len(self), 1)
+        return dict(zip(self.feature_names, means.tolist()))
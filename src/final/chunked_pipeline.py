@@ -0,0 +1,225 @@
+# src/final/chunked_pipeline.py
+"""
+Constant-memory execution mode for the fraud explanation pipeline.
+
+Each validated batch flows through rules, explanation, SHAP and assembly and
+is appended to the output files before the next batch is read. Report
+aggregates and feedback metrics are accumulated along the way and the report
+plots are rendered from the aggregates, so peak memory depends on chunk size,
+not input size.
+
+Usage:
+    python -m src.final.pipeline --chunk-rows 100000
+"""
+
+import os
+import time
+import pickle
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+
+from src.data_loader.load_fraud_output import ValidatedFrame, iter_validated_chunks
+from src.explanation.compact import readable_columns
+from src.explanation.rules import compute_reason_mask
+from src.final.explained_dataset import llm_explanations, assemble_explained_dataset, write_explained_dataset
+from src.data_process.report_aggregates import ReportAggregates
+from src.metrics import METRICS, RssSampler, peak_rss_bytes
+
+RATING_COLUMNS = ["clarity_rating", "accuracy_rating", "actionability_rating"]
+
+
+class RunAborted(RuntimeError):
+    """The caller's stop event was set; the run stopped between batches."""
+
+
+class _ShapBatcher:
+    """
+    Holds the model, encoders and explainer across batches and appends each
+    batch's SHAP values to the on-disk store.
+    """
+
+    def __init__(self, config, chunk_rows: int):
+        from src.explanation.shap_store import ShapStoreWriter
+        from src.explanation.feature_matrix import FeatureMatrixBuilder, ENCODER_PATH, fit_builder_from_csv
+
+        self.config = config
+        with open(config.shap_model_path, "rb") as f:
+            self.model = pickle.load(f)
+        self.encoder_path = config.encoder_path or ENCODER_PATH
+        # Vocabularies come from a pass over the whole input, not the first batch
+        self.builder = fit_builder_from_csv(config.raw_csv, self.encoder_path, chunk_rows)
+        self.explainer = None
+        feature_names = FeatureMatrixBuilder().feature_names
+        self.writer = ShapStoreWriter(config.shap_store_dir, feature_names) if config.shap_store_dir else None
+
+    def top_features(self, frame: ValidatedFrame) -> pd.DataFrame:
+        from src.explanation.shap_cache import load_or_build_explainer
+        from src.explanation.shap_integration import top_features_from_values
+
+        features = self.builder.transform(frame.df)
+        X = features.to_frame()
+        if self.explainer is None:
+            self.explainer, _ = load_or_build_explainer(
+                self.model, X, cache_dir=self.config.shap_cache_dir, model_path=self.config.shap_model_path,
+                vocabulary=features.vocabulary,
+            )
+        shap_values = self.explainer(X)
+        if self.writer is not None:
+            self.writer.append(shap_values, features.transaction_ids)
+        top = top_features_from_values(shap_values.values, features.feature_names, self.config.top_n_shap)
+        top.insert(0, "transaction_id", features.transaction_ids)
+        return top.drop(columns=["transaction_index"])
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+def _compact_writer(config):
+    from src.explanation.compact import CompactStoreWriter
+    from src.explanation.feature_matrix import FeatureMatrixBuilder
+    top_n = config.top_n_shap if config.shap_model_path else 0
+    return CompactStoreWriter(config.compact_dir, FeatureMatrixBuilder().feature_names, top_n=top_n)
+
+
+def _append_csv(df: pd.DataFrame, path: str, first: bool):
+    df.to_csv(path, mode="w" if first else "a", header=first, index=False, columns=readable_columns(df))
+
+
+@contextmanager
+def _timed(stage_seconds: dict, stage_peaks: dict, name: str, rss_interval: float = None):
+    """
+    Add the block's wall time to stage_seconds[name] and keep the highest RSS
+    seen while any batch was in that stage.
+    """
+    with RssSampler(rss_interval) as rss:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            stage_seconds[name] = stage_seconds.get(name, 0.0) + time.perf_counter() - start
+    stage_peaks[name] = max(stage_peaks.get(name, 0), rss.peak)
+
+
+def run_chunked_pipeline(config, chunk_rows: int = 100_000, stop_event=None) -> dict:
+    """
+    Run Tasks 1-7 batch by batch with bounded memory.
+
+    Args:
+        config (PipelineConfig): Pipeline settings (same fields as the stage-graph runner)
+        chunk_rows (int): Rows per batch
+        stop_event (threading.Event): Checked before each batch; once set, the run
+            raises RunAborted (e.g. a shard worker that lost its lease)
+
+    Returns:
+        dict: Row count, report aggregates path and feedback summary metrics
+    """
+    from src.data_process.feedback_system import collect_sme_feedback, integrate_feedback
+
+    METRICS.reset()
+    for path in filter(None, (config.processed_csv, config.feedback_csv, config.final_feedback_csv,
+                              config.aggregates_path)):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    from src.data_process.feedback_store import FeedbackStore
+
+    from src.explanation.explanation_cache import ExplanationCache
+
+    feedback_store = FeedbackStore(config.feedback_db)
+    explanation_cache = ExplanationCache(config.explanation_cache_db) if config.explanation_cache_db else None
+    shap_batcher = _ShapBatcher(config, chunk_rows) if config.shap_model_path else None
+    compact_writer = _compact_writer(config) if config.compact_dir else None
+    aggregates = ReportAggregates()
+    rating_sums = dict.fromkeys(RATING_COLUMNS, 0)
+    rating_high = dict.fromkeys(RATING_COLUMNS, 0)
+    stage_seconds = dict.fromkeys(["load", "rules", "llm", "shap", "assemble", "feedback"], 0.0)
+    stage_peaks = {}
+    total_rows = 0
+    run_start = time.perf_counter()
+
+    try:
+        chunks = iter_validated_chunks(config.raw_csv, chunk_rows)
+        batch_index = 0
+        while True:
+            if stop_event is not None and stop_event.is_set():
+                raise RunAborted(f"Stopped after {batch_index} batches")
+            with _timed(stage_seconds, stage_peaks, "load", config.rss_sample_interval):
+                chunk = next(chunks, None)
+            if chunk is None:
+                break
+            if chunk.empty:
+                continue
+            first = batch_index == 0
+
+            # Task 2: reason codes, computed once per batch and carried by the frame
+            with _timed(stage_seconds, stage_peaks, "rules", config.rss_sample_interval):
+                reason_mask = compute_reason_mask(chunk)
+            frame = ValidatedFrame(chunk, reason_mask)
+
+            # Task 3: explanations (prompts use the frame's reason codes)
+            with _timed(stage_seconds, stage_peaks, "llm", config.rss_sample_interval):
+                explanations = llm_explanations(frame, model=config.openai_model, max_workers=config.llm_workers,
+                                                cache=explanation_cache)
+
+            # Task 4: SHAP top features
+            top = None
+            if shap_batcher is not None:
+                with _timed(stage_seconds, stage_peaks, "shap", config.rss_sample_interval):
+                    top = shap_batcher.top_features(frame)
+
+            # Task 5: assemble and append
+            with _timed(stage_seconds, stage_peaks, "assemble", config.rss_sample_interval):
+                chunk = assemble_explained_dataset(frame, explanations, top)
+                write_explained_dataset(chunk, config.processed_csv, append=not first, compact_writer=compact_writer)
+
+            # Task 7: feedback for this batch
+            with _timed(stage_seconds, stage_peaks, "feedback", config.rss_sample_interval):
+                feedback = collect_sme_feedback(chunk, feedback_csv=config.feedback_csv, append=not first)
+                final = integrate_feedback(chunk, feedback, store=feedback_store)
+                for col in RATING_COLUMNS:
+                    ratings = final[col].to_numpy()
+                    rating_sums[col] += int(ratings.sum())
+                    rating_high[col] += int((ratings >= 4).sum())
+                _append_csv(final, config.final_feedback_csv, first)
+
+            # Report aggregates include the ratings and the dashboard sample
+            with _timed(stage_seconds, stage_peaks, "assemble", config.rss_sample_interval):
+                aggregates.update(final, frame.reason_mask)
+
+            total_rows += len(chunk)
+            batch_index += 1
+            print(f"Batch {batch_index}: {total_rows:,} rows processed (peak RSS {peak_rss_bytes() / 2**20:.0f} MiB)")
+            del frame, chunk, feedback, final
+    finally:
+        if shap_batcher is not None:
+            shap_batcher.close()
+        if compact_writer is not None:
+            compact_writer.close()
+
+    aggregates.save(config.aggregates_path)
+    if config.report_dir:
+        from src.data_process.vizualization_reporting import render_reports
+        from src.data_process.dashboard import build_dashboard, DASHBOARD_FILE
+        with _timed(stage_seconds, stage_peaks, "report", config.rss_sample_interval):
+            render_reports(aggregates, config.report_dir)
+            build_dashboard(aggregates, os.path.join(config.report_dir, DASHBOARD_FILE))
+
+    summary_metrics = {}
+    for col in RATING_COLUMNS:
+        summary_metrics[f"{col}_avg"] = rating_sums[col] / total_rows if total_rows else np.nan
+        summary_metrics[f"{col}_>=4_pct"] = rating_high[col] / total_rows * 100 if total_rows else np.nan
+    print("SME Feedback Summary:")
+    for k, v in summary_metrics.items():
+        print(f"{k}: {v:.2f}")
+
+    for name, seconds in stage_seconds.items():
+        METRICS.record_stage(name, seconds, rows=total_rows, peak_rss=stage_peaks.get(name))
+    METRICS.record_stage("total", time.perf_counter() - run_start, rows=total_rows, peak_rss=peak_rss_bytes())
+    if config.metrics_dir:
+        METRICS.write(config.metrics_dir, fmt=config.metrics_format)
+
+    if config.processed_csv:
+        print(f"Processed dataset saved at {config.processed_csv}")
+    print(f"Final dataset with SME feedback saved at {config.final_feedback_csv}")
+    return {"rows": total_rows, "aggregates_path": config.aggregates_path, "feedback_summary": summary_metrics}
@@ -0,0 +1,147 @@
+# src/final/explained_dataset.py
+"""
+Library API for the final explained dataset (Tasks 1-5).
+
+Every step takes the same ValidatedFrame, which carries the validated rows
+and their rule reason codes. Steps read the frame without copying it and
+never evaluate the rules again:
+
+    frame = load_validated_frame("data/raw/fraud_model_output.csv")
+    explanations = llm_explanations(frame, model="gpt-4o-mini")
+    top = shap_top_features(frame, shap_model)           # optional
+    df = assemble_explained_dataset(frame, explanations, top)
+    write_explained_dataset(df, "data/processed/fraud_model_processed.csv")
+
+or, in one call, `explain_dataset(frame, ...)`. The stage-graph, chunked
+and sharded runners and create_final_explained_dataset are thin wrappers
+over these functions.
+"""
+
+import os
+import numpy as np
+import pandas as pd
+
+from src.config import DEFAULT_MODEL
+from src.data_loader.load_fraud_output import ValidatedFrame
+from src.explanation.compact import readable_columns, write_compact_store
+
+LEADING_COLUMNS = ["transaction_id", "fraud_score", "fraud_prediction", "explanation", "rule_based_factors"]
+
+
+def llm_explanations(frame: ValidatedFrame, model: str = DEFAULT_MODEL, max_workers: int = 8,
+                     prompt_variant: str = "default", cache=None) -> pd.Categorical:
+    """
+    Task 3: one explanation per row, as codes into the distinct texts (most
+    rows share a few fixed messages). Prompts use the frame's reason codes.
+
+    Args:
+        frame (ValidatedFrame): Validated transactions
+        model (str): OpenAI model
+        max_workers (int): Concurrent API calls
+        prompt_variant (str): Key into PROMPT_VARIANTS
+        cache (ExplanationCache): Optional explanation cache; hits skip the API call
+    """
+    # Imported lazily: the OpenAI client requires an API key at import time
+    from src.explanation.llm_narrative_openai import generate_explanation_series
+    explanations = generate_explanation_series(frame.df, model=model, max_workers=max_workers,
+                                               prompt_variant=prompt_variant, cache=cache,
+                                               reason_mask=frame.reason_mask)
+    return pd.Categorical(explanations.to_numpy())
+
+
+def shap_top_features(frame: ValidatedFrame, shap_model, top_n: int = 5, encoder_path: str = None,
+                      cache_dir: str = None, model_path: str = None, store_dir: str = None) -> pd.DataFrame:
+    """
+    Task 4: top SHAP features per row.
+
+    Args:
+        frame (ValidatedFrame): Validated transactions
+        shap_model: Model trained on the FeatureMatrixBuilder matrix
+        top_n (int): Number of top features per transaction
+        encoder_path (str): Persisted categorical encoders (fitted on first use)
+        cache_dir (str): SHAP explainer cache directory (None disables caching)
+        model_path (str): Model artifact path used to fingerprint the explainer cache
+        store_dir (str): Directory for the full memory-mapped SHAP matrix (None skips it)
+
+    Returns:
+        pd.DataFrame: transaction_id plus top_feature_i (Categorical) and
+        top_feature_value_i (float32) columns, in frame order
+    """
+    from src.explanation.feature_matrix import build_feature_matrix, ENCODER_PATH
+    from src.explanation.shap_integration import compute_shap_values, top_features_from_values
+    from src.explanation.shap_store import write_shap_store
+
+    features = build_feature_matrix(frame.df, encoder_path=encoder_path or ENCODER_PATH)
+    X = features.to_frame()
+    shap_values = compute_shap_values(shap_model, X, cache_dir=cache_dir, model_path=model_path,
+                                      vocabulary=features.vocabulary)
+    if store_dir:
+        write_shap_store(shap_values, features.transaction_ids, features.feature_names, store_dir=store_dir)
+    top = top_features_from_values(shap_values.values, features.feature_names, top_n)
+    top.insert(0, "transaction_id", features.transaction_ids)
+    return top.drop(columns=["transaction_index"])
+
+
+def assemble_explained_dataset(frame: ValidatedFrame, explanations, top_features: pd.DataFrame = None) -> pd.DataFrame:
+    """
+    Task 5: combine the step outputs, columns ordered for readability.
+
+    Outputs are attached by position (every step emits rows in frame order;
+    the SHAP ids are checked), so there is no join and no intermediate copy.
+    The result stays compact: reason_mask is the uint16 bitmask and the
+    explanation, rule factor and top feature columns are Categoricals.
+
+    Args:
+        frame (ValidatedFrame): Validated transactions
+        explanations: Explanation per row (array-like, frame order)
+        top_features (pd.DataFrame): shap_top_features output, or None without SHAP
+    """
+    df = frame.df
+    if len(explanations) != len(df):
+        raise ValueError("explanations must have one entry per row of the frame")
+    parts = {c: df[c].array for c in LEADING_COLUMNS[:3]}
+    parts["explanation"] = explanations
+    parts["rule_based_factors"] = frame.rule_based_factors()
+    if top_features is not None:
+        if not np.array_equal(top_features["transaction_id"].to_numpy(), frame.transaction_ids):
+            raise ValueError("SHAP features are not aligned with the frame's transactions")
+        parts.update((c, top_features[c].array) for c in top_features.columns if "top_feature" in c)
+    parts.update((c, df[c].array) for c in df.columns if c not in parts)
+    parts["reason_mask"] = frame.reason_mask
+    return pd.DataFrame(parts)
+
+
+def write_explained_dataset(df: pd.DataFrame, csv_path: str, compact_dir: str = None, append: bool = False,
+                            compact_writer=None):
+    """
+    Export an assembled dataset: readable CSV (unless csv_path is None), plus
+    the compact store when compact_dir (one-shot) or compact_writer (chunked
+    appends) is given.
+    """
+    if csv_path:
+        os.makedirs(os.path.dirname(csv_path) or ".", exist_ok=True)
+        df.to_csv(csv_path, mode="a" if append else "w", header=not append, index=False,
+                  columns=readable_columns(df))
+    if compact_writer is not None:
+        compact_writer.append(df)
+    elif compact_dir:
+        from src.explanation.feature_matrix import FeatureMatrixBuilder
+        top_n = sum(c.startswith("top_feature_value_") for c in df.columns)
+        write_compact_store(df, compact_dir, FeatureMatrixBuilder().feature_names, top_n=top_n)
+
+
+def explain_dataset(frame: ValidatedFrame, model: str = DEFAULT_MODEL, llm_workers: int = 8,
+                    prompt_variant: str = "default", cache=None, shap_model=None, top_n_shap: int = 5,
+                    encoder_path: str = None, shap_cache_dir: str = None, shap_model_path: str = None,
+                    shap_store_dir: str = None) -> pd.DataFrame:
+    """
+    Tasks 2-5 in one call: LLM explanations, optional SHAP features, assembly.
+    See the step functions for the arguments.
+    """
+    explanations = llm_explanations(frame, model=model, max_workers=llm_workers, prompt_variant=prompt_variant,
+                                    cache=cache)
+    top = None
+    if shap_model is not None:
+        top = shap_top_features(frame, shap_model, top_n=top_n_shap, encoder_path=encoder_path,
+                                cache_dir=shap_cache_dir, model_path=shap_model_path, store_dir=shap_store_dir)
+    return assemble_explained_dataset(frame, explanations, top)
@@ -0,0 +1,584 @@
+# src/final/pipeline.py
+"""
+Stage-graph runner for the fraud explanation pipeline (Tasks 1-7).
+
+Each stage declares its upstream stages, the config fields it reads and the
+input files it consumes. A stage's cache key is a hash of those, so changing
+e.g. the report directory only re-runs the report stage, while a new raw CSV
+invalidates everything downstream of `load`. Stages that write files also
+declare them; a cached result is only reused while those files are unchanged.
+
+Usage:
+    python -m src.final.pipeline                       # run every stage
+    python -m src.final.pipeline --stages report       # report + (cached) deps
+    python -m src.final.pipeline --stages llm --force llm
+    python -m src.final.pipeline --list
+    python -m src.final.pipeline --chunk-rows 100000   # constant-memory batch mode
+    python -m src.final.pipeline --shards 16 --workers 4   # hash-sharded worker pool
+
+Stages whose dependencies are satisfied run concurrently: I/O-bound stages
+(LLM calls) on threads, CPU-bound stages (SHAP) in worker processes. Report
+plots are rendered from aggregates in their own process pool.
+End-to-end time therefore tracks the slowest branch rather than the sum.
+"""
+
+import os
+import json
+import time
+import pickle
+import hashlib
+import argparse
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass, asdict
+from typing import Callable, Dict, List, Optional
+import numpy as np
+import pandas as pd
+
+from src.config import DEFAULT_MODEL
+from src.metrics import METRICS, METRICS_DIR, RssSampler, peak_rss_bytes
+from src.data_loader.load_fraud_output import ValidatedFrame
+
+PIPELINE_CACHE_DIR = os.path.join("data", "cache", "pipeline")
+
+
+# -----------------------------
+# Configuration
+# -----------------------------
+@dataclass
+class PipelineConfig:
+    raw_csv: str = "data/raw/fraud_model_output.csv"
+    processed_csv: Optional[str] = "data/processed/fraud_model_processed.csv"  # None: compact store only
+    feedback_csv: str = "data/final/fraud_explainability_feedback.csv"
+    final_feedback_csv: str = "data/final/fraud_explainability.csv"
+    feedback_db: str = "data/final/feedback.db"   # SQLite feedback store (history + latest rating)
+    explanation_cache_db: Optional[str] = "data/cache/explanations.db"  # LLM output cache; None disables
+    openai_model: str = DEFAULT_MODEL
+    llm_workers: int = 8                    # Concurrent OpenAI calls inside the LLM stage
+    shap_model_path: Optional[str] = None   # Pickled ML model; SHAP is skipped when unset
+    top_n_shap: int = 5
+    shap_cache_dir: str = "data/cache/shap"
+    shap_store_dir: str = "data/processed/shap_store"
+    compact_dir: Optional[str] = "data/processed/compact"  # Columnar explanation store; None disables
+    encoder_path: str = "data/cache/feature_encoders.json"
+    report_dir: str = "reports"
+    aggregates_path: str = "data/processed/report_aggregates.json"
+    cache_dir: str = PIPELINE_CACHE_DIR
+    max_parallel_stages: int = 4
+    metrics_dir: Optional[str] = METRICS_DIR  # One metrics file per run; None disables export
+    metrics_format: str = "json"            # "json", "prometheus" or "both"
+    rss_sample_interval: Optional[float] = None  # Seconds between RSS polls per stage; None: getrusage only
+
+
+@dataclass
+class Stage:
+    """
+    One node of the pipeline graph.
+
+    func is called as func(config, **outputs_of_deps) and must be a module-level
+    function so it can be cached and dispatched by name.
+    """
+    name: str
+    func: Callable
+    deps: tuple = ()
+    config_keys: tuple = ()
+    input_files: tuple = ()     # Config fields holding paths whose contents feed the key
+    executor: str = "inline"    # "inline", "thread" (I/O-bound) or "process" (CPU-bound)
+    version: str = "1"          # Bump when the stage logic changes
+    description: str = ""
+    outputs: Optional[Callable] = None      # (config, result) -> files written; cache valid while unchanged
+    fingerprint: Optional[Callable] = None  # config -> state outside config and input files that feeds the key
+
+
+# -----------------------------
+# Stage implementations
+# -----------------------------
+def stage_load(config: PipelineConfig) -> ValidatedFrame:
+    from src.data_loader.load_fraud_output import load_validated_frame
+    # Rows are validated and their rule reason codes computed once, here (Tasks 1-2)
+    return load_validated_frame(config.raw_csv)
+
+
+def stage_llm(config: PipelineConfig, load: ValidatedFrame) -> pd.DataFrame:
+    from src.final.explained_dataset import llm_explanations
+    from src.explanation.explanation_cache import ExplanationCache
+    cache = ExplanationCache(config.explanation_cache_db) if config.explanation_cache_db else None
+    explanations = llm_explanations(load, model=config.openai_model, max_workers=config.llm_workers, cache=cache)
+    return pd.DataFrame({"transaction_id": load.transaction_ids, "explanation": explanations})
+
+
+def stage_shap(config: PipelineConfig, load: ValidatedFrame) -> Optional[pd.DataFrame]:
+    if not config.shap_model_path:
+        print("No SHAP model configured; skipping SHAP attribution.")
+        return None
+
+    from src.final.explained_dataset import shap_top_features
+    with open(config.shap_model_path, "rb") as f:
+        model = pickle.load(f)
+    return shap_top_features(load, model, top_n=config.top_n_shap, encoder_path=config.encoder_path,
+                             cache_dir=config.shap_cache_dir, model_path=config.shap_model_path,
+                             store_dir=config.shap_store_dir)
+
+
+def stage_assemble(config: PipelineConfig, load: ValidatedFrame, llm: pd.DataFrame,
+                   shap: Optional[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Combine stage outputs and order columns for readability (Task 5). The
+    result keeps the compact column types; the CSV is the readable export.
+    """
+    from src.final.explained_dataset import assemble_explained_dataset, write_explained_dataset
+
+    if not np.array_equal(llm["transaction_id"].to_numpy(), load.transaction_ids):
+        raise ValueError("LLM explanations are not aligned with the loaded transactions")
+    df_final = assemble_explained_dataset(load, llm["explanation"].array, shap)
+    write_explained_dataset(df_final, config.processed_csv, compact_dir=config.compact_dir)
+    if config.processed_csv:
+        print(f"Processed dataset saved at {config.processed_csv}")
+    return df_final
+
+
+def stage_report(config: PipelineConfig, assemble: pd.DataFrame) -> dict:
+    from src.data_process.vizualization_reporting import generate_reports
+    # Aggregation is one vectorized pass; plot rendering fans out to processes itself
+    files = generate_reports(assemble, report_dir=config.report_dir)
+    return {"report_dir": config.report_dir, "files": files}
+
+
+def stage_feedback(config: PipelineConfig, assemble: pd.DataFrame) -> dict:
+    from src.data_process.feedback_system import collect_sme_feedback, summarize_feedback, integrate_feedback
+    from src.data_process.report_aggregates import ReportAggregates
+    from src.data_process.feedback_store import FeedbackStore
+    from src.explanation.compact import readable_columns
+
+    os.makedirs(os.path.dirname(config.feedback_csv) or ".", exist_ok=True)
+    store = FeedbackStore(config.feedback_db)
+    # Simulated ratings stay in the CSV; recorded SME ratings come from the store and take precedence
+    feedback_df = collect_sme_feedback(assemble, feedback_csv=config.feedback_csv)
+    df_final_with_feedback = integrate_feedback(assemble, feedback_df, store=store)
+    summary_metrics = summarize_feedback(df_final_with_feedback)
+
+    os.makedirs(os.path.dirname(config.final_feedback_csv) or ".", exist_ok=True)
+    df_final_with_feedback.to_csv(config.final_feedback_csv, index=False,
+                                  columns=readable_columns(df_final_with_feedback))
+    print(f"Final dataset with SME feedback saved at {config.final_feedback_csv}")
+    # Aggregated from the merged frame so the dashboard's rating panel has the ratings
+    return {"summary": summary_metrics, "aggregates": ReportAggregates.from_frame(df_final_with_feedback)}
+
+
+def stage_dashboard(config: PipelineConfig, feedback: dict) -> dict:
+    from src.data_process.dashboard import build_dashboard, DASHBOARD_FILE
+
+    output_path = os.path.join(config.report_dir, DASHBOARD_FILE)
+    build_dashboard(feedback["aggregates"], output_path, feedback_summary=feedback["summary"])
+    return {"dashboard": output_path}
+
+
+# -----------------------------
+# Declared outputs and external state
+# -----------------------------
+def _files_under(path: Optional[str]) -> List[str]:
+    if not path or not os.path.isdir(path):
+        return []
+    return sorted(os.path.join(root, f) for root, _, files in os.walk(path) for f in files)
+
+
+def _shap_outputs(config: PipelineConfig, result) -> List[str]:
+    return _files_under(config.shap_store_dir) if result is not None else []
+
+
+def _assemble_outputs(config: PipelineConfig, result) -> List[str]:
+    return [p for p in [config.processed_csv] if p] + _files_under(config.compact_dir)
+
+
+def _report_outputs(config: PipelineConfig, result) -> List[str]:
+    return result["files"]
+
+
+def _feedback_outputs(config: PipelineConfig, result) -> List[str]:
+    return [config.feedback_csv, config.final_feedback_csv]
+
+
+def _dashboard_outputs(config: PipelineConfig, result) -> List[str]:
+    return [result["dashboard"]]
+
+
+def _llm_fingerprint(config: PipelineConfig):
+    # Regenerated explanations (overrides) change the stage's output without touching its inputs
+    if not config.explanation_cache_db:
+        return None
+    from src.explanation.explanation_cache import ExplanationCache
+    return ExplanationCache(config.explanation_cache_db).overrides_version()
+
+
+
+def _feedback_fingerprint(config: PipelineConfig):
+    # SME ratings recorded after a run change the merged output without touching the stage's inputs
+    if not config.feedback_db:
+        return None
+    from src.data_process.feedback_store import FeedbackStore
+    return FeedbackStore(config.feedback_db).version()
+
+
+STAGES = [
+    # The validated frame carries the rule reason codes, so no later stage re-evaluates them
+    Stage("load", stage_load, input_files=("raw_csv",), version="2",
+          description="Tasks 1-2: load & validate raw fraud model output, rule reason codes"),
+    Stage("llm", stage_llm, deps=("load",), config_keys=("openai_model",), executor="thread", version="3",
+          description="Task 3: LLM narrative explanations", fingerprint=_llm_fingerprint),
+    Stage("shap", stage_shap, deps=("load",),
+          config_keys=("top_n_shap", "encoder_path", "shap_store_dir"), input_files=("shap_model_path",),
+          executor="process", version="3", description="Task 4: SHAP top features", outputs=_shap_outputs),
+    Stage("assemble", stage_assemble, deps=("load", "llm", "shap"), config_keys=("processed_csv", "compact_dir"),
+          version="3", description="Task 5: final explained dataset", outputs=_assemble_outputs),
+    # The stage only aggregates; plots render in their own process pool
+    Stage("report", stage_report, deps=("assemble",), config_keys=("report_dir",), executor="thread", version="3",
+          description="Task 6: visualization & reporting", outputs=_report_outputs),
+    Stage("feedback", stage_feedback, deps=("assemble",), config_keys=("feedback_csv", "final_feedback_csv", "feedback_db"),
+          executor="thread", version="5", description="Task 7: SME feedback & evaluation loop",
+          outputs=_feedback_outputs, fingerprint=_feedback_fingerprint),
+    Stage("dashboard", stage_dashboard, deps=("feedback",), config_keys=("report_dir",),
+          executor="thread", version="2", description="Task 6: interactive HTML dashboard", outputs=_dashboard_outputs),
+]
+
+
+# -----------------------------
+# Runner
+# -----------------------------
+def _hash_file(path: str) -> str:
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def _timed_call(func: Callable, config: PipelineConfig, dep_outputs: dict, parent_pid: int):
+    """
+    Run one stage and time it. Module-level so worker processes can unpickle it.
+    In a worker process the metrics collected during the stage are returned so
+    the parent can merge them.
+    """
+    in_worker = os.getpid() != parent_pid
+    if in_worker:
+        METRICS.reset()
+    with RssSampler(config.rss_sample_interval) as rss:
+        start = time.perf_counter()
+        result = func(config, **dep_outputs)
+        seconds = time.perf_counter() - start
+    stats = {
+        "seconds": seconds,
+        "peak_rss": rss.peak,
+        "metrics": METRICS.snapshot() if in_worker else None,
+    }
+    return result, stats
+
+
+class PipelineRunner:
+    """
+    Execute a stage graph, reusing cached stage outputs whose key still matches
+    and running independent stages concurrently.
+    """
+
+    def __init__(self, config: PipelineConfig, stages: List[Stage] = None, use_cache: bool = True):
+        self.config = config
+        self.stages: Dict[str, Stage] = {s.name: s for s in (stages or STAGES)}
+        self.use_cache = use_cache
+        self._keys: Dict[str, str] = {}
+        self._outputs: Dict[str, object] = {}
+        self.status: Dict[str, dict] = {}
+        self.wall_seconds = 0.0
+        self._thread_pool = None
+        self._process_pool = None
+
+    # ---- graph helpers ----
+    def resolve(self, targets: List[str]) -> List[str]:
+        """
+        Return targets plus all their upstream stages, in dependency order.
+        """
+        ordered, visiting = [], set()
+
+        def visit(name):
+            if name not in self.stages:
+                raise ValueError(f"Unknown stage '{name}'. Available: {list(self.stages)}")
+            if name in ordered:
+                return
+            if name in visiting:
+                raise ValueError(f"Dependency cycle detected at stage '{name}'")
+            visiting.add(name)
+            for dep in self.stages[name].deps:
+                visit(dep)
+            visiting.discard(name)
+            ordered.append(name)
+
+        for target in targets:
+            visit(target)
+        return ordered
+
+    def stage_key(self, name: str) -> str:
+        """
+        Hash of stage name/version, the config fields it reads, the contents of its
+        input files and the keys of its upstream stages.
+        """
+        if name in self._keys:
+            return self._keys[name]
+        stage = self.stages[name]
+        config = asdict(self.config)
+        payload = {
+            "stage": name,
+            "version": stage.version,
+            "config": {k: config[k] for k in stage.config_keys},
+            "files": {
+                k: _hash_file(config[k]) if config[k] and os.path.exists(config[k]) else config[k]
+                for k in stage.input_files
+            },
+            "deps": {dep: self.stage_key(dep) for dep in stage.deps},
+            "fingerprint": stage.fingerprint(self.config) if stage.fingerprint else None,
+        }
+        key = hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:20]
+        self._keys[name] = key
+        return key
+
+    def _cache_path(self, name: str) -> str:
+        return os.path.join(self.config.cache_dir, f"{name}-{self.stage_key(name)}.pkl")
+
+    def _manifest_path(self, name: str) -> str:
+        return os.path.join(self.config.cache_dir, f"{name}-{self.stage_key(name)}.outputs.json")
+
+    @staticmethod
+    def _file_state(path: str):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def _is_cached(self, name: str) -> bool:
+        """
+        A cached output is reused only if the files the stage wrote alongside it
+        are still there, unmodified (same size and mtime).
+        """
+        if not self.use_cache or not os.path.exists(self._cache_path(name)):
+            return False
+        if self.stages[name].outputs is None:
+            return True
+        try:
+            with open(self._manifest_path(name)) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return False
+        return all(self._file_state(path) == state for path, state in manifest.items())
+
+    def _write_cache(self, name: str, output):
+        os.makedirs(self.config.cache_dir, exist_ok=True)
+        stage = self.stages[name]
+        if stage.outputs is not None:
+            manifest = {path: self._file_state(path) for path in stage.outputs(self.config, output)}
+            with open(self._manifest_path(name), "w") as f:
+                json.dump(manifest, f)
+        path = self._cache_path(name)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(output, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    def output(self, name: str):
+        """
+        Return a stage output, loading it from the cache on first access.
+        """
+        if name not in self._outputs:
+            with open(self._cache_path(name), "rb") as f:
+                self._outputs[name] = pickle.load(f)
+        return self._outputs[name]
+
+    def _record(self, name: str, result, stats: dict, dep_outputs: dict):
+        self._outputs[name] = result
+        if self.use_cache:
+            self._write_cache(name, result)
+        self.status[name] = {"state": "executed", "seconds": round(stats["seconds"], 3), "key": self.stage_key(name)}
+
+        if isinstance(result, (pd.DataFrame, ValidatedFrame)):
+            rows = len(result)
+        else:
+            rows = next((len(v) for v in dep_outputs.values() if isinstance(v, (pd.DataFrame, ValidatedFrame))), None)
+        METRICS.record_stage(name, stats["seconds"], rows=rows, peak_rss=stats["peak_rss"])
+        if stats["metrics"]:
+            METRICS.merge(stats["metrics"])
+
+    def _executor_for(self, stage: Stage):
+        if stage.executor == "process":
+            if self._process_pool is None:
+                # spawn: forking while LLM threads hold locks is unsafe
+                self._process_pool = ProcessPoolExecutor(
+                    max_workers=self.config.max_parallel_stages,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._process_pool
+        if self._thread_pool is None:
+            self._thread_pool = ThreadPoolExecutor(max_workers=self.config.max_parallel_stages)
+        return self._thread_pool
+
+    def execute(self, name: str):
+        """
+        Run a single stage in the calling thread.
+        """
+        stage = self.stages[name]
+        dep_outputs = {dep: self.output(dep) for dep in stage.deps}
+        print(f"🔹 {stage.description or name}...")
+        result, stats = _timed_call(stage.func, self.config, dep_outputs, os.getpid())
+        self._record(name, result, stats, dep_outputs)
+
+    # ---- main entry ----
+    def run(self, targets: List[str] = None, force: List[str] = ()) -> dict:
+        """
+        Run the requested stages (default: all), executing only stages whose
+        cache key changed, that have no cached output, or that are forced.
+        Anything downstream of an executed stage gets a new key and re-runs too.
+        Stages run as soon as their dependencies finish, concurrently where the
+        graph allows.
+
+        Returns:
+            dict: Outputs of the target stages
+        """
+        targets = targets or list(self.stages)
+        force = set(self.stages) if "all" in force else set(force)
+        order = self.resolve(targets)
+
+        # A stage whose upstream is forced must also re-run
+        for name in order:
+            if any(dep in force for dep in self.stages[name].deps):
+                force.add(name)
+
+        METRICS.reset()
+        done, pending = set(), []
+        for name in order:
+            # A stage re-running for a missing output re-runs its downstream stages as well
+            upstream_runs = any(dep in pending for dep in self.stages[name].deps)
+            if name not in force and not upstream_runs and self._is_cached(name):
+                self.status[name] = {"state": "cached", "seconds": 0.0, "key": self.stage_key(name)}
+                print(f"✔ {name}: cached ({self.stage_key(name)})")
+                METRICS.cache("pipeline_stage", hit=True)
+                METRICS.record_stage(name, 0.0, state="cached")
+                done.add(name)
+            else:
+                if self.use_cache:
+                    METRICS.cache("pipeline_stage", hit=False)
+                pending.append(name)
+
+        start = time.perf_counter()
+        self._thread_pool, self._process_pool = None, None
+        running = {}
+        try:
+            while pending or running:
+                ready = [n for n in pending if all(d in done for d in self.stages[n].deps)]
+                for name in ready:
+                    pending.remove(name)
+                    stage = self.stages[name]
+                    if stage.executor == "inline":
+                        self.execute(name)
+                        done.add(name)
+                        continue
+                    dep_outputs = {dep: self.output(dep) for dep in stage.deps}
+                    print(f"🔹 {stage.description or name} [{stage.executor}]...")
+                    future = self._executor_for(stage).submit(
+                        _timed_call, stage.func, self.config, dep_outputs, os.getpid()
+                    )
+                    running[future] = (name, dep_outputs)
+
+                if not running:
+                    if pending and not ready:
+                        raise RuntimeError(f"Stages {pending} can never become ready")
+                    continue
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name, dep_outputs = running.pop(future)
+                    result, stats = future.result()
+                    self._record(name, result, stats, dep_outputs)
+                    done.add(name)
+        finally:
+            for pool in (self._thread_pool, self._process_pool):
+                if pool is not None:
+                    pool.shutdown(wait=True, cancel_futures=True)
+        self.wall_seconds = time.perf_counter() - start
+        METRICS.record_stage("total", self.wall_seconds, peak_rss=peak_rss_bytes())
+        if self.config.metrics_dir:
+            METRICS.write(self.config.metrics_dir, fmt=self.config.metrics_format)
+
+        return {name: self.output(name) for name in targets}
+
+    def summary(self) -> str:
+        lines = [f"{name:<10} {info['state']:<9} {info['seconds']:>8.3f}s  {info['key']}"
+                 for name, info in self.status.items()]
+        stage_total = sum(info["seconds"] for info in self.status.values())
+        lines.append(f"{'wall':<10} {'':<9} {getattr(self, 'wall_seconds', 0.0):>8.3f}s  (sum of stages {stage_total:.3f}s)")
+        return "\n".join(lines)
+
+
+# -----------------------------
+# CLI
+# -----------------------------
+def _split(value: str) -> List[str]:
+    return [v.strip() for v in value.split(",") if v.strip()] if value else []
+
+
+def main(argv: List[str] = None, default_config: PipelineConfig = None):
+    config = default_config or PipelineConfig()
+    parser = argparse.ArgumentParser(description="Run the fraud explanation pipeline stage graph.")
+    parser.add_argument("--stages", default="", help="Comma-separated target stages (default: all)")
+    parser.add_argument("--force", default="", help="Comma-separated stages to re-run regardless of cache, or 'all'")
+    parser.add_argument("--no-cache", action="store_true", help="Disable reading and writing stage caches")
+    parser.add_argument("--list", action="store_true", help="List stages and their dependencies, then exit")
+    parser.add_argument("--raw-csv", default=config.raw_csv)
+    parser.add_argument("--openai-model", default=config.openai_model)
+    parser.add_argument("--shap-model", default=config.shap_model_path, help="Path to a pickled model for SHAP")
+    parser.add_argument("--report-dir", default=config.report_dir)
+    parser.add_argument("--chunk-rows", type=int, default=None,
+                        help="Run in constant-memory chunked mode with this many rows per batch")
+    parser.add_argument("--shards", type=int, default=None,
+                        help="Split input by transaction_id hash into this many shards and process them with --workers")
+    parser.add_argument("--workers", type=int, default=4, help="Local worker processes for --shards")
+    parser.add_argument("--reset", action="store_true",
+                        help="With --shards: re-partition the input and discard queue state")
+    parser.add_argument("--no-processed-csv", action="store_true",
+                        help="Skip the readable processed CSV; the compact store keeps the rows")
+    parser.add_argument("--metrics-format", default=config.metrics_format, choices=["json", "prometheus", "both"])
+    parser.add_argument("--rss-interval", type=float, default=config.rss_sample_interval,
+                        help="Also poll RSS every this many seconds for per-stage peaks (default: getrusage only)")
+    parser.add_argument("--max-parallel", type=int, default=config.max_parallel_stages,
+                        help="Worker slots per thread/process pool")
+    args = parser.parse_args(argv)
+
+    config.raw_csv = args.raw_csv
+    config.openai_model = args.openai_model
+    config.shap_model_path = args.shap_model
+    config.report_dir = args.report_dir
+    config.max_parallel_stages = args.max_parallel
+    config.metrics_format = args.metrics_format
+    config.rss_sample_interval = args.rss_interval
+    if args.no_processed_csv:
+        config.processed_csv = None
+
+    if args.shards:
+        from src.final.sharded_runner import run_sharded_pipeline
+        return run_sharded_pipeline(config, n_shards=args.shards, n_workers=args.workers,
+                                    chunk_rows=args.chunk_rows or 100_000, reset=args.reset)
+
+    if args.chunk_rows:
+        from src.final.chunked_pipeline import run_chunked_pipeline
+        return run_chunked_pipeline(config, chunk_rows=args.chunk_rows)
+
+    runner = PipelineRunner(config, use_cache=not args.no_cache)
+    if args.list:
+        for stage in runner.stages.values():
+            deps = ", ".join(stage.deps) or "-"
+            print(f"{stage.name:<10} deps: {deps:<28} {stage.description}")
+        return runner
+
+    runner.run(targets=_split(args.stages) or None, force=_split(args.force))
+    print("\nStage summary:")
+    print(runner.summary())
+    return runner
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,567 @@
+# src/final/sharded_runner.py
+"""
+Hash-sharded execution of the fraud explanation pipeline.
+
+The raw input is split by a stable hash of transaction_id into N shard files,
+and each shard becomes a task in a SQLite work queue. Worker processes (on
+this host, or on other hosts that share the work directory) claim shards
+under a time-limited lease, run the constant-memory chunked pipeline on them
+and mark them done. Leases are renewed by a heartbeat; a crashed worker's
+lease expires and its shard is picked up again, so only that shard is rerun.
+Each attempt writes to its own directory, which replaces the shard's output
+directory only if the worker still holds the lease when it completes. A
+worker that loses its lease stops between batches.
+Finished shards are merged in shard order, so the merged output does not
+depend on which worker processed what.
+
+Usage:
+    python -m src.final.sharded_runner run --shards 16 --workers 4 --raw-csv data/raw/fraud_10m.csv
+    python -m src.final.sharded_runner plan --shards 16 --raw-csv data/raw/fraud_10m.csv
+    python -m src.final.sharded_runner worker --work-dir data/shards      # on any host sharing data/shards
+    python -m src.final.sharded_runner status --work-dir data/shards
+    python -m src.final.sharded_runner merge --work-dir data/shards
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import sqlite3
+import argparse
+import threading
+import traceback
+import multiprocessing
+from contextlib import closing
+from dataclasses import replace, asdict
+import numpy as np
+import pandas as pd
+
+SHARD_WORK_DIR = os.path.join("data", "shards")
+QUEUE_DB = "queue.db"
+DEFAULT_LEASE_SECONDS = 300
+DEFAULT_MAX_ATTEMPTS = 3
+
+PENDING, RUNNING, DONE, FAILED = "pending", "running", "done", "failed"
+
+
+def shard_of(transaction_ids, n_shards: int) -> np.ndarray:
+    """
+    Shard number per transaction id. pandas' hash_array uses a fixed key, so
+    the assignment is identical across runs, processes and hosts.
+    """
+    ids = np.asarray(transaction_ids, dtype=object).astype(str).astype(object)
+    return (pd.util.hash_array(ids) % np.uint64(n_shards)).astype(np.int64)
+
+
+def _shard_name(shard: int) -> str:
+    return f"shard-{shard:05d}"
+
+
+# -----------------------------
+# Durable work queue (SQLite)
+# -----------------------------
+class ShardQueue:
+    """
+    SQLite-backed task table. Every state change is a short IMMEDIATE
+    transaction, so several processes can share one queue file. The default
+    rollback journal is kept (not WAL), since WAL needs shared memory and does
+    not work for workers on other hosts.
+    """
+
+    def __init__(self, db_path: str, timeout: float = 60.0):
+        self.db_path = db_path
+        self.timeout = timeout
+        with closing(self._connect()) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS tasks (
+                    shard INTEGER PRIMARY KEY,
+                    input_path TEXT NOT NULL,
+                    output_dir TEXT NOT NULL,
+                    rows INTEGER NOT NULL DEFAULT 0,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    worker TEXT,
+                    lease_expires REAL,
+                    error TEXT,
+                    updated_at REAL
+                )""")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=self.timeout, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _transaction(self, fn):
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(conn)
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+            return result
+        finally:
+            conn.close()
+
+    # Setup
+    def get_meta(self) -> dict:
+        with closing(self._connect()) as conn:
+            return {row["key"]: json.loads(row["value"]) for row in conn.execute("SELECT key, value FROM meta")}
+
+    def initialize(self, tasks: list, meta: dict):
+        """Replace the task table with fresh pending tasks."""
+        def fn(conn):
+            conn.execute("DELETE FROM tasks")
+            conn.execute("DELETE FROM meta")
+            conn.executemany(
+                "INSERT INTO tasks (shard, input_path, output_dir, rows, updated_at) VALUES (?, ?, ?, ?, ?)",
+                [(t["shard"], t["input_path"], t["output_dir"], t["rows"], time.time()) for t in tasks],
+            )
+            conn.executemany("INSERT INTO meta (key, value) VALUES (?, ?)",
+                             [(k, json.dumps(v)) for k, v in meta.items()])
+        self._transaction(fn)
+
+    # Worker protocol
+    def claim(self, worker: str, lease_seconds: float, max_attempts: int):
+        """
+        Claim the lowest pending shard, or a running shard whose lease has
+        expired (its worker died). Returns the task row or None.
+        """
+        def fn(conn):
+            now = time.time()
+            row = conn.execute(
+                """SELECT * FROM tasks
+                   WHERE attempts < ? AND (status = ? OR (status = ? AND lease_expires < ?))
+                   ORDER BY shard LIMIT 1""",
+                (max_attempts, PENDING, RUNNING, now),
+            ).fetchone()
+            if row is None:
+                # Expired leases that used up their attempts are failures, not work
+                conn.execute(
+                    "UPDATE tasks SET status = ?, error = COALESCE(error, 'lease expired'), updated_at = ? "
+                    "WHERE status = ? AND lease_expires < ? AND attempts >= ?",
+                    (FAILED, now, RUNNING, now, max_attempts),
+                )
+                return None
+            conn.execute(
+                "UPDATE tasks SET status = ?, attempts = attempts + 1, worker = ?, lease_expires = ?, updated_at = ? "
+                "WHERE shard = ?",
+                (RUNNING, worker, now + lease_seconds, now, row["shard"]),
+            )
+            return dict(row, attempts=row["attempts"] + 1)
+        return self._transaction(fn)
+
+    def heartbeat(self, shard: int, worker: str, lease_seconds: float) -> bool:
+        """Extend the lease; False means the shard was reclaimed by another worker."""
+        def fn(conn):
+            cur = conn.execute(
+                "UPDATE tasks SET lease_expires = ?, updated_at = ? WHERE shard = ? AND worker = ? AND status = ?",
+                (time.time() + lease_seconds, time.time(), shard, worker, RUNNING),
+            )
+            return cur.rowcount == 1
+        return self._transaction(fn)
+
+    def complete(self, shard: int, worker: str, attempt_dir: str = None, output_dir: str = None) -> bool:
+        """
+        Mark the shard done if this worker still holds it, and in the same
+        transaction move attempt_dir into place as output_dir. False means the
+        shard was reclaimed; nothing is published then.
+        """
+        def fn(conn):
+            cur = conn.execute(
+                "UPDATE tasks SET status = ?, error = NULL, lease_expires = NULL, updated_at = ? "
+                "WHERE shard = ? AND worker = ? AND status = ?",
+                (DONE, time.time(), shard, worker, RUNNING),
+            )
+            if cur.rowcount != 1:
+                return False
+            if attempt_dir:
+                # Other workers' completions wait on this transaction, so the swap cannot race
+                if os.path.exists(output_dir):
+                    shutil.rmtree(output_dir)
+                os.rename(attempt_dir, output_dir)
+            return True
+        return self._transaction(fn)
+
+    def fail(self, shard: int, worker: str, error: str, max_attempts: int):
+        """Return the shard to the queue, or mark it failed once attempts are used up."""
+        def fn(conn):
+            conn.execute(
+                "UPDATE tasks SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END, "
+                "error = ?, lease_expires = NULL, updated_at = ? WHERE shard = ? AND worker = ?",
+                (max_attempts, FAILED, PENDING, error, time.time(), shard, worker),
+            )
+        self._transaction(fn)
+
+    def reset_failed(self) -> int:
+        """Give failed shards a fresh set of attempts."""
+        return self._transaction(lambda conn: conn.execute(
+            "UPDATE tasks SET status = ?, attempts = 0, updated_at = ? WHERE status = ?",
+            (PENDING, time.time(), FAILED),
+        ).rowcount)
+
+    # Inspection
+    def tasks(self) -> list:
+        with closing(self._connect()) as conn:
+            return [dict(row) for row in conn.execute("SELECT * FROM tasks ORDER BY shard")]
+
+    def counts(self) -> dict:
+        with closing(self._connect()) as conn:
+            counts = dict.fromkeys([PENDING, RUNNING, DONE, FAILED], 0)
+            for row in conn.execute("SELECT status, COUNT(*) AS n FROM tasks GROUP BY status"):
+                counts[row["status"]] = row["n"]
+            return counts
+
+
+# -----------------------------
+# Planning: partition the input
+# -----------------------------
+def _file_signature(path: str) -> dict:
+    stat = os.stat(path)
+    return {"path": os.path.abspath(path), "size": stat.st_size, "mtime": stat.st_mtime}
+
+
+def plan_shards(config, work_dir: str = SHARD_WORK_DIR, n_shards: int = 8,
+                chunk_rows: int = 250_000, reset: bool = False) -> ShardQueue:
+    """
+    Split config.raw_csv into n_shards files by hash of transaction_id and
+    register one queue task per shard. If the same input was already planned
+    with the same shard count, the existing queue is kept, so a rerun resumes
+    where the previous one stopped. Workers run with the planned config, so
+    a plan whose config differs is not reused; pass reset=True to re-plan.
+    """
+    os.makedirs(work_dir, exist_ok=True)
+    queue = ShardQueue(os.path.join(work_dir, QUEUE_DB))
+    # Round-tripped through JSON so it compares equal to the stored meta
+    meta = json.loads(json.dumps({"input": _file_signature(config.raw_csv), "n_shards": n_shards,
+                                  "config": asdict(config)}))
+
+    existing = queue.get_meta()
+    if not reset and existing.get("input") == meta["input"] and existing.get("n_shards") == n_shards:
+        changed = sorted(k for k in set(meta["config"]) | set(existing.get("config", {}))
+                         if meta["config"].get(k) != existing.get("config", {}).get(k))
+        if changed:
+            raise ValueError(f"Shard plan in {work_dir} was made with a different config ({', '.join(changed)}); "
+                             "rerun with --reset to re-plan")
+        print(f"Reusing shard plan in {work_dir}: {queue.counts()}")
+        return queue
+
+    input_dir = os.path.join(work_dir, "input")
+    os.makedirs(input_dir, exist_ok=True)
+    paths = [os.path.join(input_dir, f"{_shard_name(s)}.csv") for s in range(n_shards)]
+    rows = [0] * n_shards
+
+    # Shared encoders are fitted (or extended) over the whole input here, so shards encode identically
+    from src.explanation.feature_matrix import CATEGORICAL_FEATURES, update_encoders
+    fit_encoders = bool(config.shap_model_path)
+    vocab = {col: set() for col in CATEGORICAL_FEATURES}
+
+    first = True
+    for chunk in pd.read_csv(config.raw_csv, chunksize=chunk_rows, dtype={"transaction_id": str}):
+        if first:
+            header = chunk.iloc[:0]
+            for path in paths:
+                header.to_csv(path, index=False)
+            first = False
+        shards = shard_of(chunk["transaction_id"].to_numpy(), n_shards)
+        order = np.argsort(shards, kind="stable")
+        bounds = np.searchsorted(shards[order], np.arange(n_shards + 1))
+        for shard in range(n_shards):
+            part = chunk.iloc[order[bounds[shard]:bounds[shard + 1]]]
+            if len(part):
+                part.to_csv(paths[shard], mode="a", header=False, index=False)
+                rows[shard] += len(part)
+        if fit_encoders:
+            for col in CATEGORICAL_FEATURES:
+                if col in chunk.columns:
+                    vocab[col].update(chunk[col].astype(str).unique())
+
+    if fit_encoders:
+        update_encoders(vocab, config.encoder_path)
+
+    tasks = [
+        {"shard": s, "input_path": paths[s], "output_dir": os.path.join(work_dir, "output", _shard_name(s)), "rows": rows[s]}
+        for s in range(n_shards)
+    ]
+    queue.initialize(tasks, meta)
+    print(f"Planned {n_shards} shards in {work_dir} ({sum(rows):,} rows, largest shard {max(rows):,})")
+    return queue
+
+
+# -----------------------------
+# Worker
+# -----------------------------
+def _attempt_dir(task: dict) -> str:
+    return f"{task['output_dir']}.attempt-{task['attempts']}"
+
+
+def shard_config(config, task: dict, output_dir: str = None):
+    """
+    Per-shard copy of the pipeline config with every output inside the shard
+    directory (or output_dir, the directory of one attempt).
+    """
+    out = output_dir or task["output_dir"]
+    cache_dir = os.path.join(os.path.dirname(task["output_dir"]), "cache")
+    return replace(
+        config,
+        raw_csv=task["input_path"],
+        processed_csv=os.path.join(out, "processed.csv") if config.processed_csv else None,
+        feedback_csv=os.path.join(out, "feedback.csv"),
+        final_feedback_csv=os.path.join(out, "final.csv"),
+        # Per shard but outside the attempt directories, so a retry reuses the explanations a failed attempt paid for
+        explanation_cache_db=(os.path.join(cache_dir, f"{_shard_name(task['shard'])}.explanations.db")
+                              if config.explanation_cache_db else None),
+        aggregates_path=os.path.join(out, "report_aggregates.json"),
+        shap_store_dir=os.path.join(out, "shap_store") if config.shap_store_dir else None,
+        compact_dir=os.path.join(out, "compact") if config.compact_dir else None,
+        metrics_dir=os.path.join(out, "metrics") if config.metrics_dir else None,
+        report_dir=None,  # Reports are rendered once, from the merged aggregates
+    )
+
+
+class _Heartbeat(threading.Thread):
+    """Renews the lease; sets `lost` when another worker has taken the shard over."""
+
+    def __init__(self, queue: ShardQueue, shard: int, worker: str, lease_seconds: float):
+        super().__init__(daemon=True)
+        self.queue, self.shard, self.worker, self.lease_seconds = queue, shard, worker, lease_seconds
+        self._stopped = threading.Event()
+        self.lost = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.lease_seconds / 3):
+            try:
+                if not self.queue.heartbeat(self.shard, self.worker, self.lease_seconds):
+                    print(f"[{self.worker}] lost lease on shard {self.shard}")
+                    self.lost.set()
+                    return
+            except sqlite3.Error as e:
+                print(f"[{self.worker}] heartbeat failed: {e}")
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+def run_worker(work_dir: str = SHARD_WORK_DIR, chunk_rows: int = 100_000,
+               lease_seconds: float = DEFAULT_LEASE_SECONDS, max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+               poll_seconds: float = 2.0, worker_id: str = None) -> int:
+    """
+    Claim and process shards until none are left. Waits while other workers
+    still hold leases, so shards of a crashed worker are picked up once their
+    lease expires. Returns the number of shards this worker completed.
+    """
+    from src.final.pipeline import PipelineConfig
+    from src.final.chunked_pipeline import run_chunked_pipeline, RunAborted
+
+    queue = ShardQueue(os.path.join(work_dir, QUEUE_DB))
+    config = PipelineConfig(**queue.get_meta()["config"])
+    worker = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    completed = 0
+
+    while True:
+        task = queue.claim(worker, lease_seconds, max_attempts)
+        if task is None:
+            counts = queue.counts()
+            if counts[RUNNING] == 0:
+                break
+            time.sleep(poll_seconds)
+            continue
+
+        shard = task["shard"]
+        print(f"[{worker}] shard {shard} ({task['rows']:,} rows, attempt {task['attempts']})")
+        attempt_dir = _attempt_dir(task)
+        heartbeat = _Heartbeat(queue, shard, worker, lease_seconds)
+        heartbeat.start()
+        try:
+            if os.path.exists(attempt_dir):
+                shutil.rmtree(attempt_dir)
+            os.makedirs(attempt_dir)
+            run_chunked_pipeline(shard_config(config, task, attempt_dir), chunk_rows=chunk_rows,
+                                 stop_event=heartbeat.lost)
+        except RunAborted:
+            heartbeat.stop()
+            print(f"[{worker}] abandoned shard {shard} after losing its lease")
+            shutil.rmtree(attempt_dir, ignore_errors=True)
+            continue
+        except Exception as e:
+            heartbeat.stop()
+            print(f"[{worker}] shard {shard} failed: {type(e).__name__}: {e}")
+            queue.fail(shard, worker, traceback.format_exc(), max_attempts)
+            shutil.rmtree(attempt_dir, ignore_errors=True)
+            continue
+        heartbeat.stop()
+        if queue.complete(shard, worker, attempt_dir, task["output_dir"]):
+            completed += 1
+        else:
+            print(f"[{worker}] shard {shard} was reclaimed; discarding this attempt")
+            shutil.rmtree(attempt_dir, ignore_errors=True)
+
+    print(f"[{worker}] exiting after {completed} shards")
+    return completed
+
+
+def _worker_process(work_dir, chunk_rows, lease_seconds, max_attempts):
+    run_worker(work_dir, chunk_rows=chunk_rows, lease_seconds=lease_seconds, max_attempts=max_attempts)
+
+
+# -----------------------------
+# Merge
+# -----------------------------
+def _concat_csv(paths: list, out_path: str):
+    """Concatenate CSVs that share a header, keeping the first header only."""
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    wrote_header = False
+    with open(out_path, "w", newline="") as out:
+        for path in paths:
+            if not os.path.exists(path):
+                continue
+            with open(path, newline="") as src:
+                header = src.readline()
+                if not header:
+                    continue
+                if not wrote_header:
+                    out.write(header)
+                    wrote_header = True
+                while True:
+                    block = src.read(1 << 22)
+                    if not block:
+                        break
+                    out.write(block)
+
+
+def merge_shards(work_dir: str = SHARD_WORK_DIR) -> dict:
+    """
+    Merge per-shard outputs in shard order into the configured output paths.
+    Shard order (not completion order) makes the result deterministic.
+    """
+    from src.final.pipeline import PipelineConfig
+    from src.data_process.report_aggregates import ReportAggregates
+    from src.explanation.shap_store import merge_shap_stores
+    from src.explanation.compact import merge_compact_stores
+
+    queue = ShardQueue(os.path.join(work_dir, QUEUE_DB))
+    config = PipelineConfig(**queue.get_meta()["config"])
+    tasks = queue.tasks()
+    unfinished = [t["shard"] for t in tasks if t["status"] != DONE]
+    if unfinished:
+        raise RuntimeError(f"Cannot merge: shards not done: {unfinished}")
+
+    shard_configs = [shard_config(config, t) for t in tasks]
+    if config.processed_csv:
+        _concat_csv([c.processed_csv for c in shard_configs], config.processed_csv)
+    _concat_csv([c.feedback_csv for c in shard_configs], config.feedback_csv)
+    _concat_csv([c.final_feedback_csv for c in shard_configs], config.final_feedback_csv)
+
+    aggregates = ReportAggregates()
+    for c in shard_configs:
+        if os.path.exists(c.aggregates_path):
+            aggregates.merge(ReportAggregates.load(c.aggregates_path))
+    aggregates.save(config.aggregates_path)
+    if config.report_dir:
+        from src.data_process.vizualization_reporting import render_reports
+        from src.data_process.dashboard import build_dashboard, DASHBOARD_FILE
+        render_reports(aggregates, config.report_dir)
+        build_dashboard(aggregates, os.path.join(config.report_dir, DASHBOARD_FILE))
+
+    stores = [c.shap_store_dir for c in shard_configs
+              if c.shap_store_dir and os.path.exists(os.path.join(c.shap_store_dir, "meta.json"))]
+    if stores:
+        merge_shap_stores(stores, config.shap_store_dir)
+    compact_stores = [c.compact_dir for c in shard_configs
+                      if c.compact_dir and os.path.exists(os.path.join(c.compact_dir, "meta.json"))]
+    if compact_stores:
+        merge_compact_stores(compact_stores, config.compact_dir)
+
+    print(f"Merged {len(tasks)} shards ({aggregates.rows:,} rows) into {config.final_feedback_csv}")
+    return {"shards": len(tasks), "rows": aggregates.rows, "aggregates_path": config.aggregates_path}
+
+
+# -----------------------------
+# Local driver
+# -----------------------------
+def run_sharded_pipeline(config, n_shards: int = 8, n_workers: int = 4, work_dir: str = SHARD_WORK_DIR,
+                         chunk_rows: int = 100_000, lease_seconds: float = DEFAULT_LEASE_SECONDS,
+                         max_attempts: int = DEFAULT_MAX_ATTEMPTS, reset: bool = False) -> dict:
+    """
+    Plan (or resume) the shard queue, process it with a local pool of worker
+    processes and merge the results. Workers started on other hosts against
+    the same work_dir simply join in.
+    """
+    queue = plan_shards(config, work_dir, n_shards, reset=reset)
+    if not reset and queue.counts()[FAILED]:
+        print(f"Retrying {queue.reset_failed()} previously failed shards")
+
+    start = time.perf_counter()
+    ctx = multiprocessing.get_context("spawn")
+    workers = [
+        ctx.Process(target=_worker_process, args=(work_dir, chunk_rows, lease_seconds, max_attempts))
+        for _ in range(n_workers)
+    ]
+    for proc in workers:
+        proc.start()
+    for proc in workers:
+        proc.join()
+
+    counts = queue.counts()
+    print(f"Shard queue after {time.perf_counter() - start:.1f}s with {n_workers} workers: {counts}")
+    if counts[FAILED] or counts[PENDING] or counts[RUNNING]:
+        for task in queue.tasks():
+            if task["status"] != DONE:
+                print(f"  shard {task['shard']}: {task['status']} after {task['attempts']} attempts")
+        raise RuntimeError("Some shards did not complete; rerun to retry them")
+    return merge_shards(work_dir)
+
+
+def _print_status(work_dir: str):
+    queue = ShardQueue(os.path.join(work_dir, QUEUE_DB))
+    print(queue.counts())
+    for task in queue.tasks():
+        lease = f" lease {task['lease_expires'] - time.time():.0f}s" if task["status"] == RUNNING else ""
+        print(f"  shard {task['shard']:>5} {task['status']:<8} rows {task['rows']:>10,} "
+              f"attempts {task['attempts']} {task['worker'] or ''}{lease}")
+
+
+def main(argv=None, default_config=None):
+    from src.final.pipeline import PipelineConfig
+
+    parser = argparse.ArgumentParser(description="Hash-sharded fraud explanation pipeline.")
+    parser.add_argument("command", choices=["run", "plan", "worker", "merge", "status"])
+    parser.add_argument("--work-dir", default=SHARD_WORK_DIR, help="Shared directory with the queue and shard files")
+    parser.add_argument("--raw-csv", default=None)
+    parser.add_argument("--shap-model", default=None)
+    parser.add_argument("--shards", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--chunk-rows", type=int, default=100_000)
+    parser.add_argument("--lease-seconds", type=float, default=DEFAULT_LEASE_SECONDS)
+    parser.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS)
+    parser.add_argument("--reset", action="store_true", help="Re-partition the input and discard queue state")
+    args = parser.parse_args(argv)
+
+    config = default_config or PipelineConfig()
+    if args.raw_csv:
+        config.raw_csv = args.raw_csv
+    if args.shap_model:
+        config.shap_model_path = args.shap_model
+
+    if args.command == "plan":
+        plan_shards(config, args.work_dir, args.shards, reset=args.reset)
+    elif args.command == "worker":
+        run_worker(args.work_dir, args.chunk_rows, args.lease_seconds, args.max_attempts)
+    elif args.command == "merge":
+        merge_shards(args.work_dir)
+    elif args.command == "status":
+        _print_status(args.work_dir)
+    else:
+        run_sharded_pipeline(config, args.shards, args.workers, args.work_dir, args.chunk_rows,
+                             args.lease_seconds, args.max_attempts, reset=args.reset)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
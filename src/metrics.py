@@ -0,0 +1,303 @@
+# src/metrics.py
+"""
+Lightweight run instrumentation.
+
+Collection is a perf_counter read, an RSS read and a reservoir update/dict
+increment under a lock, so it is cheap enough to leave on in production.
+Latency series keep a count, a sum and a fixed-size sample, so memory does
+not grow with the number of requests a long-running service serves.
+Stage peaks come from RssSampler: the getrusage peak when a stage raises it,
+otherwise the RSS at the stage's start and end, plus optional polling.
+Stages, the LLM client and the caches all report into the module-level
+METRICS registry; the pipeline runner writes one JSON and/or Prometheus text
+file per run.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import resource
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+import numpy as np
+
+METRICS_DIR = os.path.join("data", "metrics")
+LATENCY_QUANTILES = (0.5, 0.9, 0.99)
+RESERVOIR_SIZE = 10_000  # Latency samples kept per series; quantiles are exact up to this many observations
+
+
+def peak_rss_bytes() -> int:
+    """
+    Peak resident set size of the current process over its whole lifetime.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return int(peak if sys.platform == "darwin" else peak * 1024)
+
+
+class RssSampler:
+    """
+    Peak RSS of a block of code. When the block raises the process's
+    getrusage peak, that new peak is exact, short spikes included. Otherwise
+    the peak lies below an earlier high that getrusage cannot attribute; it
+    is then the larger of the RSS at entry and exit, or, when interval is
+    set, of current RSS polled every interval seconds on a background thread.
+    Without /proc/self/statm (e.g. macOS) current RSS falls back to the
+    lifetime peak.
+    """
+
+    def __init__(self, interval: float = None):
+        self.interval = interval
+        self.peak = 0
+        self._thread = None
+        self._stop = threading.Event()
+        self._page_size = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+    def _current(self) -> int:
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * self._page_size
+        except OSError:
+            return peak_rss_bytes()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, self._current())
+
+    def __enter__(self):
+        self._lifetime_peak = peak_rss_bytes()
+        self.peak = self._current()
+        if self.interval:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+        lifetime_peak = peak_rss_bytes()
+        if lifetime_peak > self._lifetime_peak:
+            self.peak = lifetime_peak
+        else:
+            self.peak = max(self.peak, self._current())
+
+
+class LatencyReservoir:
+    """
+    Count, sum and a uniform random sample (Vitter's algorithm R) of one
+    latency series. Quantiles are estimated from the sample.
+    """
+
+    def __init__(self, size: int = RESERVOIR_SIZE, seed: int = 0):
+        self.size = size
+        self.count = 0
+        self.sum = 0.0
+        self.samples = []
+        self._rng = random.Random(seed)
+
+    def add(self, value: float):
+        self.count += 1
+        self.sum += value
+        if len(self.samples) < self.size:
+            self.samples.append(value)
+        else:
+            slot = self._rng.randrange(self.count)
+            if slot < self.size:
+                self.samples[slot] = value
+
+    def merge(self, state: dict):
+        """
+        Fold in another series' state(). Each sample is weighted by the
+        observations it stands for, so the merged sample stays representative.
+        """
+        samples = self.samples + list(state["samples"])
+        if len(samples) > self.size:
+            weights = np.concatenate([np.full(len(self.samples), self.count / max(len(self.samples), 1)),
+                                      np.full(len(state["samples"]), state["count"] / max(len(state["samples"]), 1))])
+            keep = np.random.default_rng(self.count + state["count"]).choice(
+                len(samples), self.size, replace=False, p=weights / weights.sum())
+            samples = [samples[i] for i in keep]
+        self.samples = samples
+        self.count += state["count"]
+        self.sum += state["sum"]
+
+    def state(self) -> dict:
+        return {"count": self.count, "sum": self.sum, "samples": list(self.samples)}
+
+    def summary(self) -> dict:
+        arr = np.asarray(self.samples, dtype=np.float64)
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else None,
+            **{f"p{int(q * 100)}": float(np.quantile(arr, q)) if arr.size else None for q in LATENCY_QUANTILES},
+        }
+
+
+# -----------------------------
+# Registry
+# -----------------------------
+class RunMetrics:
+    """
+    Per-run metrics: stage timings, counters, cache hit/miss tallies and
+    latency observations.
+    """
+
+    def __init__(self, run_id: str = None):
+        # Microseconds and pid, so runs started in the same second do not share a metrics file
+        self.run_id = run_id or f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-{os.getpid()}"
+        self.started_at = time.time()
+        self.stages = {}
+        self.counters = {}
+        self.caches = {}
+        self.observations = {}
+        self._lock = threading.Lock()
+
+    # ---- recording ----
+    def record_stage(self, name: str, seconds: float, rows: int = None, peak_rss: int = None, state: str = "executed"):
+        entry = {
+            "state": state,
+            "wall_seconds": round(seconds, 6),
+            "rows": rows,
+            "rows_per_second": round(rows / seconds, 1) if rows and seconds > 0 else None,
+            "peak_rss_bytes": peak_rss,
+        }
+        with self._lock:
+            self.stages[name] = entry
+
+    @contextmanager
+    def stage(self, name: str, rows: int = None, rss_interval: float = None):
+        """
+        Time a block of code as a named stage (rss_interval: see RssSampler).
+        """
+        with RssSampler(rss_interval) as rss:
+            start = time.perf_counter()
+            try:
+                yield
+            finally:
+                seconds = time.perf_counter() - start
+        self.record_stage(name, seconds, rows=rows, peak_rss=rss.peak)
+
+    def incr(self, name: str, value: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def cache(self, name: str, hit: bool):
+        with self._lock:
+            tally = self.caches.setdefault(name, {"hits": 0, "misses": 0})
+            tally["hits" if hit else "misses"] += 1
+
+    def observe(self, name: str, value: float):
+        with self._lock:
+            series = self.observations.get(name)
+            if series is None:
+                series = self.observations[name] = LatencyReservoir()
+            series.add(value)
+
+    # ---- cross-process merge ----
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "caches": {k: dict(v) for k, v in self.caches.items()},
+                "observations": {k: v.state() for k, v in self.observations.items()},
+            }
+
+    def merge(self, snapshot: dict):
+        """
+        Fold in metrics collected in a worker process.
+        """
+        for name, value in snapshot.get("counters", {}).items():
+            self.incr(name, value)
+        with self._lock:
+            for name, tally in snapshot.get("caches", {}).items():
+                mine = self.caches.setdefault(name, {"hits": 0, "misses": 0})
+                mine["hits"] += tally["hits"]
+                mine["misses"] += tally["misses"]
+            for name, state in snapshot.get("observations", {}).items():
+                self.observations.setdefault(name, LatencyReservoir()).merge(state)
+
+    def reset(self, run_id: str = None):
+        self.__init__(run_id)
+
+    # ---- export ----
+    def to_dict(self) -> dict:
+        with self._lock:
+            latencies = {name: series.summary() for name, series in self.observations.items()}
+            caches = {
+                name: {**tally, "hit_rate": tally["hits"] / (tally["hits"] + tally["misses"])
+                       if tally["hits"] + tally["misses"] else None}
+                for name, tally in self.caches.items()
+            }
+            return {
+                "run_id": self.run_id,
+                "started_at": datetime.fromtimestamp(self.started_at).isoformat(timespec="seconds"),
+                "elapsed_seconds": round(time.time() - self.started_at, 3),
+                "peak_rss_bytes": peak_rss_bytes(),
+                "stages": dict(self.stages),
+                "counters": dict(self.counters),
+                "caches": caches,
+                "latencies": latencies,
+            }
+
+    def to_prometheus(self, prefix: str = "fraud_pipeline") -> str:
+        data = self.to_dict()
+        lines = []
+
+        def metric(name, kind, samples):
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            for labels, value in samples:
+                if value is None:
+                    continue
+                label_text = ",".join(f'{k}="{v}"' for k, v in labels.items())
+                lines.append(f"{prefix}_{name}{{{label_text}}} {value}" if label_text else f"{prefix}_{name} {value}")
+
+        stages = data["stages"]
+        metric("stage_wall_seconds", "gauge", [({"stage": s}, v["wall_seconds"]) for s, v in stages.items()])
+        metric("stage_rows", "gauge", [({"stage": s}, v["rows"]) for s, v in stages.items()])
+        metric("stage_rows_per_second", "gauge", [({"stage": s}, v["rows_per_second"]) for s, v in stages.items()])
+        metric("stage_peak_rss_bytes", "gauge", [({"stage": s}, v["peak_rss_bytes"]) for s, v in stages.items()])
+        metric("stage_cached", "gauge", [({"stage": s}, int(v["state"] == "cached")) for s, v in stages.items()])
+        metric("peak_rss_bytes", "gauge", [({}, data["peak_rss_bytes"])])
+        for name, value in data["counters"].items():
+            metric(f"{name}_total", "counter", [({}, value)])
+        metric("cache_hits_total", "counter", [({"cache": c}, v["hits"]) for c, v in data["caches"].items()])
+        metric("cache_misses_total", "counter", [({"cache": c}, v["misses"]) for c, v in data["caches"].items()])
+        metric("cache_hit_ratio", "gauge", [({"cache": c}, v["hit_rate"]) for c, v in data["caches"].items()])
+        for name, summary in data["latencies"].items():
+            samples = [({"quantile": str(q)}, summary[f"p{int(q * 100)}"]) for q in LATENCY_QUANTILES]
+            metric(name, "summary", samples)
+            lines.append(f"{prefix}_{name}_sum {summary['sum']}")
+            lines.append(f"{prefix}_{name}_count {summary['count']}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, metrics_dir: str = METRICS_DIR, fmt: str = "json") -> list:
+        """
+        Write this run's metrics. fmt is "json", "prometheus" or "both".
+
+        Returns:
+            list: Paths written
+        """
+        os.makedirs(metrics_dir, exist_ok=True)
+        paths = []
+        if fmt in ("json", "both"):
+            path = os.path.join(metrics_dir, f"run-{self.run_id}.json")
+            with open(path, "w") as f:
+                json.dump(self.to_dict(), f, indent=2)
+            paths.append(path)
+        if fmt in ("prometheus", "both"):
+            path = os.path.join(metrics_dir, f"run-{self.run_id}.prom")
+            with open(path, "w") as f:
+                f.write(self.to_prometheus())
+            paths.append(path)
+        for path in paths:
+            print(f"Run metrics saved at {path}")
+        return paths
+
+
+# Process-wide registry
+METRICS = RunMetrics()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Tests import the package as `src.*`, like the CLI entry points (python -m src....)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
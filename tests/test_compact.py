@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+
+from src.explanation.compact import CompactStore, merge_compact_stores, update_explanations, write_compact_store
+
+FEATURES = ["amount", "fraud_score"]
+
+
+def _frame(ids, explanations):
+    return pd.DataFrame({
+        "transaction_id": ids,
+        "explanation": explanations,
+        "rule_based_factors": ["High Amount"] * len(ids),
+        "top_feature_1": ["amount"] * len(ids),
+        "top_feature_value_1": np.arange(len(ids), dtype=np.float32),
+    })
+
+
+def test_store_reads_texts_by_reference(tmp_path):
+    write_compact_store(_frame(["T1", "T2", "T3"], ["a", None, "b"]), str(tmp_path), FEATURES, top_n=1)
+    store = CompactStore(str(tmp_path))
+
+    assert len(store.texts) == 2
+    assert [store.texts[0], store.texts[1]] == ["a", "b"]
+    explanation = store.frame(1, 3)["explanation"]
+    # A slice decodes only the texts it references
+    assert list(explanation.cat.categories) == ["b"]
+    assert explanation.isna().tolist() == [True, False]
+
+
+def test_update_and_merge_keep_references_valid(tmp_path):
+    first, second, merged = (str(tmp_path / name) for name in ("first", "second", "merged"))
+    write_compact_store(_frame(["T1", "T2"], ["a", "b"]), first, FEATURES, top_n=1)
+    write_compact_store(_frame(["T3", "T4"], ["b", "c"]), second, FEATURES, top_n=1)
+
+    assert update_explanations(first, {"T2": "new", "T9": "missing"}) == 1
+    merge_compact_stores([first, second], merged)
+
+    frame = CompactStore(merged).frame()
+    assert frame["transaction_id"].tolist() == ["T1", "T2", "T3", "T4"]
+    assert frame["explanation"].astype(str).tolist() == ["a", "new", "b", "c"]
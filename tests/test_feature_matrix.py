@@ -0,0 +1,54 @@
+import pandas as pd
+
+from src.explanation.feature_matrix import FeatureMatrixBuilder, fit_builder_from_csv, load_or_fit_builder
+from src.metrics import METRICS
+
+
+def _rows(merchants):
+    n = len(merchants)
+    return pd.DataFrame({
+        "transaction_id": [f"T{i}" for i in range(n)],
+        "transaction_amount": [10.0] * n,
+        "velocity_1h": [1] * n,
+        "avg_amount_30d": [10.0] * n,
+        "geo_mismatch": [False] * n,
+        "high_velocity_flag": [False] * n,
+        "device_fingerprint_changed": [False] * n,
+        "merchant_category": merchants,
+        "transaction_country": ["US"] * n,
+        "customer_country": ["US"] * n,
+        "transaction_timestamp": ["2025-01-01 10:00:00"] * n,
+    })
+
+
+def test_new_categories_extend_persisted_encoders(tmp_path):
+    path = str(tmp_path / "encoders.json")
+    first = load_or_fit_builder(_rows(["grocery", "travel"]), path)
+    second = load_or_fit_builder(_rows(["travel", "crypto"]), path)
+
+    # Existing codes keep their positions, the new category is appended
+    assert second.vocabularies["merchant_category"] == ["grocery", "travel", "crypto"]
+    assert FeatureMatrixBuilder.load(path).vocabularies == second.vocabularies
+    assert second.fingerprint != first.fingerprint
+    codes = second.transform(_rows(["crypto", "grocery"])).to_frame()["merchant_category"].tolist()
+    assert codes == [2.0, 0.0]
+
+
+def test_streaming_fit_extends_encoders(tmp_path):
+    path = str(tmp_path / "encoders.json")
+    load_or_fit_builder(_rows(["grocery"]), path)
+    csv_path = str(tmp_path / "raw.csv")
+    _rows(["grocery", "travel"]).to_csv(csv_path, index=False)
+
+    assert fit_builder_from_csv(csv_path, path, chunk_rows=1).vocabularies["merchant_category"] == \
+        ["grocery", "travel"]
+
+
+def test_unknown_categories_are_counted():
+    METRICS.reset()
+    builder = FeatureMatrixBuilder().fit(_rows(["grocery"]))
+    matrix = builder.transform(_rows(["grocery", "unseen"]))
+    builder.transform_record(_rows(["unseen"]).iloc[0].to_dict())
+
+    assert matrix.to_frame()["merchant_category"].tolist() == [0.0, -1.0]
+    assert METRICS.counters["feature_unknown_categories"] == 2
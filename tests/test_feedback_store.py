@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data_process.feedback_store import FeedbackStore, ALL, _stats_deltas
+
+
+@pytest.fixture
+def store(tmp_path):
+    return FeedbackStore(str(tmp_path / "feedback.db"))
+
+
+def test_record_upserts_latest_and_appends_history(store):
+    store.record("TX1", 2, 3, 4, reviewer="alice", signature="Geo Mismatch", model="m1", rated_at="2025-01-01T00:00:00")
+    store.record("TX1", 5, 5, 5, reviewer="bob", rated_at="2025-01-02T00:00:00")
+
+    latest = store.latest(["TX1"])
+    assert len(latest) == 1
+    row = latest.iloc[0]
+    assert (row.clarity_rating, row.accuracy_rating, row.actionability_rating) == (5, 5, 5)
+    assert row.reviewer == "bob"
+    assert store.count() == 1
+
+    full = store.latest()
+    assert full.loc[0, "rating_count"] == 2
+    # A re-rating without signature / model keeps the previous rating's group
+    assert (full.loc[0, "signature"], full.loc[0, "model"]) == ("Geo Mismatch", "m1")
+
+    history = store.history("TX1")
+    assert history["reviewer"].tolist() == ["alice", "bob"]
+    assert history["clarity_rating"].tolist() == [2, 5]
+
+
+def test_join_keeps_row_order_and_leaves_unrated_rows_missing(store):
+    store.record_frame(pd.DataFrame({
+        "transaction_id": ["TX3", "TX1"],
+        "clarity_rating": [1, 4], "accuracy_rating": [2, 4], "actionability_rating": [3, 4],
+    }), reviewer="alice")
+
+    df = pd.DataFrame({"transaction_id": ["TX1", "TX2", "TX3", "TX1"], "fraud_score": [0.1, 0.2, 0.3, 0.4]})
+    joined = store.join(df)
+
+    assert joined["transaction_id"].tolist() == df["transaction_id"].tolist()
+    assert joined["fraud_score"].tolist() == df["fraud_score"].tolist()
+    assert joined["clarity_rating"].tolist()[0] == 4
+    assert np.isnan(joined["clarity_rating"].tolist()[1])
+    assert joined["clarity_rating"].tolist()[2:] == [1, 4]
+    assert joined["reviewer"].tolist()[1] is None or pd.isna(joined["reviewer"].tolist()[1])
+
+
+def test_stats_describe_latest_ratings_only(store):
+    store.record("TX1", 2, 2, 2, signature="s", model="m", rated_at="2025-01-05T10:00:00")
+    store.record("TX2", 4, 4, 4, signature="s", model="m", rated_at="2025-01-06T10:00:00")
+    store.record("TX1", 5, 5, 5, rated_at="2025-02-01T10:00:00")
+
+    summary = store.summary()
+    assert summary["clarity_rating_count"] == 2
+    assert summary["clarity_rating_avg"] == pytest.approx(4.5)
+    assert summary["clarity_rating_>=4_pct"] == pytest.approx(100.0)
+
+    # The replaced January rating left the January windows; the new one counts in February
+    assert store.summary(window="2025-01")["clarity_rating_count"] == 1
+    assert store.summary(window="2025-02")["clarity_rating_count"] == 1
+    assert store.summary(signature="s", model="m")["clarity_rating_count"] == 2
+
+
+def test_stats_deltas_replace_previous_rating_in_every_rollup():
+    previous = [("TX1", 2, None, 5, "2025-01-05T10:00:00", "s", "m")]
+    records = [("TX1", "bob", 4, None, 1, "", "2025-01-07T10:00:00", "s", "m")]
+    deltas = {row[:4]: row[4:] for row in _stats_deltas(previous, records)}
+
+    # Same group and month: clarity 2 -> 4 moves the total and the high count only
+    for window in ("2025-01", ALL):
+        for signature in ("s", ALL):
+            for model in ("m", ALL):
+                assert deltas[("clarity_rating", signature, model, window)] == (0, 2, 1)
+                assert deltas[("actionability_rating", signature, model, window)] == (0, -4, -1)
+    # Different days: the old day loses a rating, the new day gains one
+    assert deltas[("clarity_rating", "s", "m", "2025-01-05")] == (-1, -2, 0)
+    assert deltas[("clarity_rating", "s", "m", "2025-01-07")] == (1, 4, 1)
+    # Missing ratings contribute nothing
+    assert not any(key[0] == "accuracy_rating" for key in deltas)
+
+
+def test_version_changes_when_a_rating_is_recorded(store):
+    before = store.version()
+    store.record("TX1", 3, 3, 3)
+    assert store.version() != before
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from src.metrics import LatencyReservoir, RssSampler, RunMetrics, peak_rss_bytes
+
+
+def test_latency_samples_are_bounded():
+    metrics = RunMetrics()
+    values = np.random.default_rng(0).exponential(size=50_000)
+    for value in values:
+        metrics.observe("latency_seconds", float(value))
+
+    series = metrics.observations["latency_seconds"]
+    assert len(series.samples) == series.size
+    summary = metrics.to_dict()["latencies"]["latency_seconds"]
+    assert summary["count"] == len(values)
+    assert summary["sum"] == pytest.approx(values.sum())
+    assert summary["p50"] == pytest.approx(np.quantile(values, 0.5), rel=0.05)
+    assert summary["p99"] == pytest.approx(np.quantile(values, 0.99), rel=0.1)
+
+
+def test_worker_snapshots_merge_into_counts_and_quantiles():
+    parent, worker = RunMetrics(), RunMetrics()
+    for i in range(100):
+        parent.observe("llm_latency_seconds", 1.0)
+        worker.observe("llm_latency_seconds", 3.0)
+    parent.merge(worker.snapshot())
+
+    summary = parent.to_dict()["latencies"]["llm_latency_seconds"]
+    assert summary["count"] == 200
+    assert summary["mean"] == pytest.approx(2.0)
+
+
+def test_reservoir_merge_weights_by_observations():
+    small, large = LatencyReservoir(size=100), LatencyReservoir(size=100)
+    for _ in range(100):
+        small.add(1.0)
+    for _ in range(10_000):
+        large.add(5.0)
+    small.merge(large.state())
+
+    assert len(small.samples) == 100
+    assert small.count == 10_100
+    assert small.summary()["p50"] == 5.0
+
+
+def test_prometheus_summary_has_sum_and_count():
+    metrics = RunMetrics()
+    for value in (0.5, 1.5):
+        metrics.observe("llm_latency_seconds", value)
+    text = metrics.to_prometheus(prefix="p")
+
+    assert "# TYPE p_llm_latency_seconds summary" in text
+    assert "p_llm_latency_seconds_sum 2.0" in text
+    assert "p_llm_latency_seconds_count 2" in text
+
+
+def test_rss_sampler_sees_a_short_new_peak_without_polling():
+    with RssSampler() as rss:
+        # Past the process's earlier high, and freed before the block ends
+        size = max(peak_rss_bytes() - rss.peak, 0) + 64 * 2**20
+        block = np.ones(size, dtype=np.uint8)
+        del block
+    assert rss.peak >= peak_rss_bytes() - 2**20
+    assert rss.peak > rss._current() + 32 * 2**20
@@ -0,0 +1,104 @@
+import os
+import time
+
+import pandas as pd
+import pytest
+
+from src.data_loader.generate_synthetic_fraud_data import generate_synthetic_fraud_data
+from src.data_loader.load_fraud_output import ALL_COLUMNS, load_and_validate_fraud_output
+from src.data_process.feedback_store import FeedbackStore
+from src.explanation.compact import CompactStore, write_compact_store
+from src.explanation.explanation_cache import ExplanationCache
+from src.explanation.regenerate import ERROR_PREFIX, RegenerationPlan, regenerate_explanations
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    """The LLM module with generate_explanation_series stubbed; records the ids it was asked for."""
+    monkeypatch.setenv("OPENAI_API_KEY", "offline-test")
+    import src.explanation.llm_narrative_openai as module
+    calls = []
+
+    def fake_series(rows, **kwargs):
+        ids = rows["transaction_id"].astype(str).tolist()
+        calls.extend(ids)
+        return pd.Series([f"{ERROR_PREFIX}: rate limited" if tid == fake_series.failing else f"new {tid}"
+                          for tid in ids])
+
+    fake_series.failing = None
+    monkeypatch.setattr(module, "generate_explanation_series", fake_series)
+    return fake_series, calls
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    raw = str(tmp_path / "raw.csv")
+    generate_synthetic_fraud_data(raw, 300, seed=7)
+    df = load_and_validate_fraud_output(raw)[ALL_COLUMNS]
+    df["explanation"] = "old"
+    df["rule_based_factors"] = "Geo Mismatch"
+    processed = str(tmp_path / "processed.csv")
+    final = str(tmp_path / "final.csv")
+    df.to_csv(processed, index=False)
+    df[["transaction_id", "explanation"]].to_csv(final, index=False)
+    compact_dir = str(tmp_path / "compact")
+    write_compact_store(df, compact_dir)
+    fraud_ids = df.loc[df["fraud_prediction"] == 1, "transaction_id"].astype(str).tolist()
+    assert len(fraud_ids) >= 3
+    return {"processed": processed, "final": final, "compact": compact_dir, "fraud_ids": fraud_ids,
+            "store": FeedbackStore(str(tmp_path / "feedback.db")),
+            "cache": ExplanationCache(str(tmp_path / "explanations.db"))}
+
+
+def _explanations(path):
+    df = pd.read_csv(path, dtype=str, keep_default_na=False)
+    return dict(zip(df["transaction_id"], df["explanation"]))
+
+
+def test_regenerates_in_place_and_keeps_old_text_on_failure(llm, dataset):
+    fake_series, calls = llm
+    good, failing = dataset["fraud_ids"][:2]
+    fake_series.failing = failing
+
+    summary = regenerate_explanations(
+        RegenerationPlan(transaction_ids={good, failing}), dataset["processed"], dataset["store"], dataset["cache"],
+        extra_csvs=(dataset["final"],), compact_dir=dataset["compact"], chunk_rows=50,
+    )
+
+    assert summary == {"selected": 2, "regenerated": 1, "failed": 1, "skipped": 0}
+    assert sorted(calls) == sorted([good, failing])
+    for path in (dataset["processed"], dataset["final"]):
+        texts = _explanations(path)
+        assert texts[good] == f"new {good}"
+        assert texts[failing] == "old"
+        assert sum(text == "old" for text in texts.values()) == len(texts) - 1
+    assert not os.path.exists(dataset["processed"] + ".tmp")
+
+    compact = CompactStore(dataset["compact"]).frame()
+    compact_texts = dict(zip(compact["transaction_id"].astype(str), compact["explanation"].astype(str)))
+    assert compact_texts[good] == f"new {good}"
+    assert compact_texts[failing] == "old"
+
+    # Only the successful text becomes an override
+    assert dataset["cache"].overrides([good, failing]) == {good: f"new {good}"}
+
+
+def test_skips_rows_regenerated_since_their_latest_rating(llm, dataset):
+    _, calls = llm
+    fresh, rerated, unrated = dataset["fraud_ids"][:3]
+    store, cache = dataset["store"], dataset["cache"]
+    store.record(fresh, 1, 1, 1, rated_at="2020-01-01T00:00:00+00:00")
+    cache.mark_regenerated([fresh, rerated], "gpt-4o-mini", "detailed", ["earlier", "earlier"])
+    # Rated again after its regeneration: the complaint is new
+    store.record(rerated, 1, 1, 1, rated_at=pd.Timestamp(time.time() + 60, unit="s", tz="UTC").isoformat())
+    plan = RegenerationPlan(transaction_ids={fresh, rerated, unrated})
+
+    summary = regenerate_explanations(plan, dataset["processed"], store, cache)
+    assert summary == {"selected": 2, "regenerated": 2, "failed": 0, "skipped": 1}
+    assert sorted(calls) == sorted([rerated, unrated])
+    assert _explanations(dataset["processed"])[fresh] == "old"
+
+    calls.clear()
+    forced = regenerate_explanations(plan, dataset["processed"], store, cache, force=True)
+    assert forced["selected"] == 3 and forced["skipped"] == 0
+    assert sorted(calls) == sorted([fresh, rerated, unrated])
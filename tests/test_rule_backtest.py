@@ -0,0 +1,80 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.explanation.rule_backtest import RuleBacktest
+
+AMOUNTS = [500.0, 2000.0, 4000.0]
+LARGES = [1000.0, 3000.0]
+SCORES = [0.3, 0.6, 0.9]
+VELOCITIES = [1.0, 3.0, 5.0]
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(3)
+    n = 2000
+    return pd.DataFrame({
+        # Rounded so thresholds land exactly on some values (strict vs inclusive comparisons)
+        "transaction_amount": rng.choice(np.arange(0, 5001, 250), n).astype(float),
+        "fraud_score": rng.choice(np.round(np.arange(0, 1.01, 0.1), 1), n),
+        "geo_mismatch": rng.integers(0, 2, n),
+        "device_fingerprint_changed": rng.choice(["True", "False"], n, p=[0.1, 0.9]),
+        "high_velocity_flag": rng.integers(0, 2, n),
+        "velocity_1h": rng.integers(0, 7, n).astype(float),
+        "fraud_prediction": rng.integers(0, 2, n),
+    })
+
+
+def _brute_force(df, high_amount, large_amount, high_score, velocity):
+    amount, score = df["transaction_amount"], df["fraud_score"]
+    geo = df["geo_mismatch"] == 1
+    rules = {
+        "high_transaction_amount": amount > high_amount,
+        "large_amount_geo_mismatch": (amount > large_amount) & geo,
+        "high_fraud_score": score >= high_score,
+        "high_velocity_flag": df["velocity_1h"] > velocity if velocity is not None else df["high_velocity_flag"] == 1,
+        "geo_mismatch": geo,
+        "device_fingerprint_changed": df["device_fingerprint_changed"] == "True",
+    }
+    label = df["fraud_prediction"] == 1
+    any_rule = np.logical_or.reduce(list(rules.values()))
+    expected = {f"{rule}_{kind}": value for rule, mask in rules.items()
+                for kind, value in (("flagged", mask.sum()), ("overlap", (mask & label).sum()))}
+    expected.update(any_flagged=any_rule.sum(), any_overlap=(any_rule & label).sum())
+    return expected
+
+
+@pytest.mark.parametrize("sweep_velocity", [True, False])
+def test_sweep_matches_brute_force(frame, sweep_velocity):
+    velocities = VELOCITIES if sweep_velocity else None
+    results = RuleBacktest.from_frame(frame).sweep(AMOUNTS, LARGES, SCORES, velocities)
+
+    combos = list(itertools.product(AMOUNTS, LARGES, SCORES, velocities or [None]))
+    assert len(results) == len(combos)
+    keys = ["high_amount", "large_amount", "high_score"] + (["velocity"] if sweep_velocity else [])
+    rows = results.set_index(keys)
+    for combo in combos:
+        row = rows.loc[combo if sweep_velocity else combo[:3]]
+        for column, value in _brute_force(frame, *combo).items():
+            assert row[column] == value, (combo, column)
+        assert row["precision"] == pytest.approx(row["any_overlap"] / row["any_flagged"])
+
+
+def test_text_flags_are_parsed_not_truthy(frame, tmp_path):
+    device = frame["device_fingerprint_changed"] == "True"
+    expected = int(device.sum())
+    assert 0 < expected < len(frame)
+
+    # Strings from from_frame, booleans from read_csv, and 0/1 all count the same rows
+    for column in (frame["device_fingerprint_changed"], device, device.astype(int)):
+        backtest = RuleBacktest.from_frame(frame.assign(device_fingerprint_changed=column))
+        assert backtest.sweep()["device_fingerprint_changed_flagged"].iloc[0] == expected
+
+    path = str(tmp_path / "rules.csv")
+    frame.to_csv(path, index=False)
+    from_csv = RuleBacktest.from_csv(path, chunk_rows=700)
+    pd.testing.assert_frame_equal(from_csv.sweep(AMOUNTS, LARGES, SCORES, VELOCITIES),
+                                  RuleBacktest.from_frame(frame).sweep(AMOUNTS, LARGES, SCORES, VELOCITIES))
@@ -0,0 +1,26 @@
+import os
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.tree import DecisionTreeClassifier
+
+from src.explanation.shap_cache import load_or_build_explainer
+
+
+def test_concurrent_builders_leave_one_readable_explainer(tmp_path):
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(200, 3)), columns=["a", "b", "c"])
+    model = DecisionTreeClassifier(max_depth=3, random_state=0).fit(X, X["a"] > 0)
+    cache_dir = str(tmp_path)
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        infos = list(pool.map(lambda _: load_or_build_explainer(model, X, cache_dir=cache_dir)[1], range(4)))
+
+    assert {info["fingerprint"] for info in infos} == {infos[0]["fingerprint"]}
+    assert os.listdir(cache_dir) == [os.path.basename(infos[0]["cache_path"])]
+    with open(infos[0]["cache_path"], "rb") as f:
+        assert pickle.load(f)["fingerprint"] == infos[0]["fingerprint"]
+    _, info = load_or_build_explainer(model, X, cache_dir=cache_dir)
+    assert info["cache_hit"]
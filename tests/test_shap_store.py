@@ -0,0 +1,33 @@
+import numpy as np
+
+from src.explanation.shap_store import ShapMatrixStore, ShapStoreWriter, merge_shap_stores
+
+FEATURES = ["a", "b"]
+
+
+def _write(store_dir, batches):
+    with ShapStoreWriter(store_dir, FEATURES) as writer:
+        for ids in batches:
+            writer.append(np.arange(2 * len(ids), dtype=np.float32).reshape(-1, 2), ids)
+    return ShapMatrixStore(store_dir)
+
+
+def test_batches_in_id_order_share_one_index_segment(tmp_path):
+    store = _write(str(tmp_path / "sorted"), [["T1", "T3"], ["T4", "T5"], ["T7"]])
+    assert store.meta["index_segments"] == [[0, 5]]
+    assert store.row_index("T4") == 2
+
+
+def test_out_of_order_batches_keep_separate_segments(tmp_path):
+    store = _write(str(tmp_path / "unsorted"), [["T5", "T1"], ["T2", "T9"], ["T3"]])
+    assert store.meta["index_segments"] == [[0, 2], [2, 4], [4, 5]]
+    assert [store.row_index(t) for t in ("T5", "T1", "T2", "T9", "T3")] == [0, 1, 2, 3, 4]
+
+
+def test_merge_coalesces_across_stores(tmp_path):
+    first = _write(str(tmp_path / "first"), [["T1", "T2"]]).store_dir
+    second = _write(str(tmp_path / "second"), [["T3"], ["T0"]]).store_dir
+    merged = ShapMatrixStore(merge_shap_stores([first, second], str(tmp_path / "merged")))
+
+    assert merged.meta["index_segments"] == [[0, 3], [3, 4]]
+    assert [merged.row_index(t) for t in ("T0", "T1", "T2", "T3")] == [3, 0, 1, 2]